@@ -0,0 +1,379 @@
+from typing import Any, Dict, List, Optional, Tuple
+import json, os, queue, socket, threading, time, urllib.request
+
+
+class AlertSink(object):
+
+    '''
+    Destination alerts are delivered to. Sinks receive alerts in batches and raise an exception when delivery fails, the dispatcher
+    retrying the batch later.
+    '''
+
+    # Name reported when delivery fails.
+    NAME = 'Alert Sink'
+
+    def send(self, alerts : List[Dict[str, Any]]) -> None:
+
+        '''
+        Deliver a batch of alerts.
+
+        :param: alerts - Alerts to deliver, oldest first.
+        '''
+
+        raise NotImplementedError
+
+
+class WebhookSink(AlertSink):
+
+    '''
+    Posts each batch as JSON to a HTTP endpoint. {"alerts" : [...]}
+    '''
+
+    NAME = 'Webhook'
+
+    def __init__(self, URL : str, TIMEOUT : float = 5) -> None:
+
+        # Endpoint the batches are posted to.
+        self.URL = URL
+
+        # Seconds to wait for the endpoint before the delivery counts as failed.
+        self.TIMEOUT = TIMEOUT
+
+
+    def send(self, alerts : List[Dict[str, Any]]) -> None:
+
+        request = urllib.request.Request(
+            self.URL,
+            data=json.dumps({'alerts' : alerts}).encode(),
+            headers={'Content-Type' : 'application/json'},
+            method='POST',
+        )
+
+        # Responses other than 2xx raise, so the batch is retried.
+        with urllib.request.urlopen(request, timeout=self.TIMEOUT) as response:
+            response.read()
+
+
+class FileSink(AlertSink):
+
+    '''
+    Appends each alert to a file as a line of JSON.
+    '''
+
+    NAME = 'File'
+
+    def __init__(self, PATH : str) -> None:
+
+        # File the alerts are appended to.
+        self.PATH = PATH
+
+
+    def send(self, alerts : List[Dict[str, Any]]) -> None:
+
+        with open(self.PATH, 'a') as alerts_file:
+            alerts_file.writelines(json.dumps(alert) + '\n' for alert in alerts)
+
+
+class UnixSocketSink(AlertSink):
+
+    '''
+    Writes each alert as a line of JSON to a UNIX stream socket, for local processes such as a sounder or display to listen on.
+    '''
+
+    NAME = 'UNIX Socket'
+
+    def __init__(self, PATH : str, TIMEOUT : float = 2) -> None:
+
+        # Path of the socket the listener is bound to.
+        self.PATH = PATH
+
+        # Seconds to wait for the listener before the delivery counts as failed.
+        self.TIMEOUT = TIMEOUT
+
+
+    def send(self, alerts : List[Dict[str, Any]]) -> None:
+
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as alert_socket:
+            alert_socket.settimeout(self.TIMEOUT)
+            alert_socket.connect(self.PATH)
+            alert_socket.sendall(''.join(json.dumps(alert) + '\n' for alert in alerts).encode())
+
+
+# Sinks selectable from the alerts file, keyed by the type stored.
+ALERT_SINKS = {
+    'webhook' : lambda description : WebhookSink(description['url'], description.get('timeout', 5)),
+    'file' : lambda description : FileSink(description['path']),
+    'unix' : lambda description : UnixSocketSink(description['path'], description.get('timeout', 2)),
+}
+
+
+class AlertDispatcher(object):
+
+    '''
+    Delivers alerts to the sinks on a thread of its own. The pipeline submits alerts to a bounded queue without ever waiting, alerts
+    dropping rather than stalling the frame loop when the queue is full. Alerts sharing a key, the same track or the same zone, are
+    coalesced: the first is sent straight away and later ones within COALESCE_SECONDS are counted and summarised by a single alert when
+    the window closes. Alerts are sent in batches, and batches a sink fails to take are retried with exponential backoff.
+    '''
+
+    def __init__(self, sinks : Optional[List[AlertSink]] = None, COALESCE_SECONDS : float = 30, BATCH_SIZE : int = 20, BATCH_INTERVAL : float = 1.0, MAXIMUM_RETRIES : int = 5, RETRY_BACKOFF : float = 1.0, QUEUE_SIZE : int = 1000) -> None:
+
+        # Destinations every alert is delivered to.
+        self.sinks : List[AlertSink] = sinks if sinks is not None else []
+
+        # Seconds alerts sharing a key are coalesced over.
+        self.COALESCE_SECONDS = COALESCE_SECONDS
+
+        # Most alerts sent in one batch.
+        self.BATCH_SIZE = BATCH_SIZE
+
+        # Longest time in seconds an alert waits for its batch to fill.
+        self.BATCH_INTERVAL = BATCH_INTERVAL
+
+        # Attempts made after a failed delivery before the batch is dropped.
+        self.MAXIMUM_RETRIES = MAXIMUM_RETRIES
+
+        # Seconds before the first retry, doubling with each attempt.
+        self.RETRY_BACKOFF = RETRY_BACKOFF
+
+        # Alerts submitted by the pipeline, waiting for the dispatcher thread.
+        self.alert_queue : queue.Queue = queue.Queue(maxsize=QUEUE_SIZE)
+
+        # Open coalescing windows, keyed by alert key. {key : {closes_at, latest, count}}
+        self.windows : Dict[Tuple[str, Any], Dict[str, Any]] = {}
+
+        # Alerts waiting to be sent in the next batch, and the time the oldest joined it.
+        self.batch : List[Dict[str, Any]] = []
+        self.batch_started : float = 0.0
+
+        # Failed deliveries waiting to be retried. [(due_at, attempt, sink, alerts)]
+        self.retries : List[Tuple[float, int, AlertSink, List[Dict[str, Any]]]] = []
+
+        # Delivery counters, reported by stats.
+        self.counters : Dict[str, int] = {'submitted' : 0, 'dropped' : 0, 'coalesced' : 0, 'sent' : 0, 'retried' : 0, 'failed' : 0}
+
+        # Start the dispatcher thread, only when there is somewhere to deliver to.
+        if self.sinks:
+            self.dispatcher_thread = threading.Thread(target=self.dispatch, daemon=True)
+            self.dispatcher_thread.start()
+
+
+    @staticmethod
+    def from_file(ALERTS_PATH : Optional[str]) -> 'AlertDispatcher':
+
+        '''
+        Build a dispatcher from the alerts file, one without sinks if the file is missing or invalid.
+        {"sinks" : [{"type" : "webhook", "url"}, {"type" : "file", "path"}, {"type" : "unix", "path"}], "coalesce_seconds", "batch_size", ...}
+
+        :param: ALERTS_PATH - JSON file describing the sinks and dispatcher options.
+        :return: AlertDispatcher - Dispatcher delivering to the sinks described.
+        '''
+
+        if ALERTS_PATH is None or not os.path.exists(ALERTS_PATH):
+            return AlertDispatcher()
+
+        try:
+            with open(ALERTS_PATH) as alerts_file:
+                configuration = json.load(alerts_file)
+
+            sinks = [ALERT_SINKS[description['type']](description) for description in configuration.get('sinks', [])]
+
+            return AlertDispatcher(
+                sinks,
+                COALESCE_SECONDS=configuration.get('coalesce_seconds', 30),
+                BATCH_SIZE=configuration.get('batch_size', 20),
+                BATCH_INTERVAL=configuration.get('batch_interval', 1.0),
+                MAXIMUM_RETRIES=configuration.get('maximum_retries', 5),
+                RETRY_BACKOFF=configuration.get('retry_backoff', 1.0),
+            )
+
+        except (OSError, ValueError, KeyError, TypeError) as error:
+            print(f'Could not read {ALERTS_PATH}, alerts are disabled!\n {error}')
+            return AlertDispatcher()
+
+
+    def submit(self, alert_type : str, track_ID : Optional[int] = None, threat_level : Optional[int] = None, box : Optional[Tuple[int, int, int, int]] = None, capture : Optional[str] = None) -> None:
+
+        '''
+        Queue an alert without waiting. Called from the frame loop, the alert is dropped if the queue is full.
+
+        :param: alert_type - Kind of alert, an event type such as escalated, capture or crossed:<tripwire name>.
+        :param: track_ID - ID of the detection concerned.
+        :param: threat_level - Threat level of the detection.
+        :param: box - Bounding box of the detection. (x, y, w, h)
+        :param: capture - Path of the capture taken, if any.
+        '''
+
+        if not self.sinks:
+            return
+
+        self.counters['submitted'] += 1
+
+        try:
+            self.alert_queue.put_nowait({
+                'type' : alert_type,
+                'track_id' : track_ID,
+                'threat_level' : threat_level,
+                'box' : None if box is None else [int(value) for value in box],
+                'capture' : capture,
+                'occurred_at' : time.time(),
+            })
+        except queue.Full:
+            self.counters['dropped'] += 1
+
+
+    @staticmethod
+    def coalescing_key(alert : Dict[str, Any]) -> Tuple[str, Any]:
+
+        '''
+        Key alerts are coalesced under. Tripwire and zone alerts are coalesced per zone, so a crowd crossing a line raises one alert,
+        every other alert per track and type.
+
+        :param: alert - Alert submitted.
+        :return: tuple - (alert type, track ID or None for zone alerts)
+        '''
+
+        if ':' in alert['type']:
+            return alert['type'], None
+
+        return alert['type'], alert['track_id']
+
+
+    def coalesce(self, alert : Dict[str, Any], now : float) -> None:
+
+        '''
+        Add an alert to the batch unless another alert with its key was sent within the coalescing window, in which case it is counted
+        towards the summary sent when the window closes.
+
+        :param: alert - Alert submitted.
+        :param: now - Current monotonic time.
+        '''
+
+        key = self.coalescing_key(alert)
+        window = self.windows.get(key)
+
+        if window is not None and now < window['closes_at']:
+            window['latest'] = alert
+            window['count'] += 1
+            self.counters['coalesced'] += 1
+            return
+
+        self.windows[key] = {'closes_at' : now + self.COALESCE_SECONDS, 'latest' : alert, 'count' : 0}
+        self.enqueue(dict(alert, coalesced=0), now)
+
+
+    def close_windows(self, now : float) -> None:
+
+        '''
+        Close expired coalescing windows, summarising any alerts held back by the latest of them.
+
+        :param: now - Current monotonic time.
+        '''
+
+        for key in [key for key, window in self.windows.items() if now >= window['closes_at']]:
+
+            window = self.windows.pop(key)
+
+            if window['count'] > 0:
+                self.enqueue(dict(window['latest'], coalesced=window['count']), now)
+
+
+    def enqueue(self, alert : Dict[str, Any], now : float) -> None:
+
+        '''
+        Add an alert to the batch being built.
+
+        :param: alert - Alert to send.
+        :param: now - Current monotonic time.
+        '''
+
+        if not self.batch:
+            self.batch_started = now
+
+        self.batch.append(alert)
+
+
+    def deliver(self, sink : AlertSink, alerts : List[Dict[str, Any]], attempt : int, now : float) -> None:
+
+        '''
+        Send a batch to a sink, scheduling a retry if it fails.
+
+        :param: sink - Destination.
+        :param: alerts - Batch to send.
+        :param: attempt - Number of attempts already made.
+        :param: now - Current monotonic time.
+        '''
+
+        try:
+            sink.send(alerts)
+            self.counters['sent'] += len(alerts)
+
+        except Exception as error:
+
+            if attempt < self.MAXIMUM_RETRIES:
+                self.counters['retried'] += 1
+                self.retries.append((now + self.RETRY_BACKOFF * 2 ** attempt, attempt + 1, sink, alerts))
+            else:
+                self.counters['failed'] += len(alerts)
+                print(f'{sink.NAME} alert delivery failed after {attempt + 1} attempts, dropping {len(alerts)} alerts!\n {error}')
+
+
+    def dispatch(self) -> None:
+
+        '''
+        Dispatcher thread. Coalesces submitted alerts, sends full or expired batches to every sink and retries failed deliveries.
+        '''
+
+        while True:
+
+            now = time.monotonic()
+
+            # Sleep until the next alert arrives or the next batch, window or retry falls due.
+            deadlines = [window['closes_at'] for window in self.windows.values()] + [due_at for due_at, _, _, _ in self.retries]
+
+            if self.batch:
+                deadlines.append(self.batch_started + self.BATCH_INTERVAL)
+
+            timeout = min(max(min(deadlines) - now, 0), 1.0) if deadlines else 1.0
+
+            try:
+                alert = self.alert_queue.get(timeout=timeout)
+                self.coalesce(alert, time.monotonic())
+
+                # Drain whatever else is waiting without blocking, at most a queue full so batches still go out under a flood.
+                for _ in range(self.alert_queue.maxsize):
+                    self.coalesce(self.alert_queue.get_nowait(), time.monotonic())
+
+            except queue.Empty:
+                pass
+
+            now = time.monotonic()
+
+            self.close_windows(now)
+
+            # Send the batch once it is full or has waited long enough.
+            while self.batch and (len(self.batch) >= self.BATCH_SIZE or now - self.batch_started >= self.BATCH_INTERVAL):
+
+                alerts, self.batch = self.batch[:self.BATCH_SIZE], self.batch[self.BATCH_SIZE:]
+                self.batch_started = now
+
+                for sink in self.sinks:
+                    self.deliver(sink, alerts, 0, now)
+
+            # Retry deliveries that are due.
+            due_retries = [retry for retry in self.retries if retry[0] <= now]
+            self.retries = [retry for retry in self.retries if retry[0] > now]
+
+            for _, attempt, sink, alerts in due_retries:
+                self.deliver(sink, alerts, attempt, now)
+
+
+    def stats(self) -> Dict[str, int]:
+
+        '''
+        Report how many alerts were submitted, dropped, coalesced, sent and failed, and how many deliveries are waiting to be retried.
+
+        :return: dict - Alert counters.
+        '''
+
+        return dict(self.counters, pending_retries=len(self.retries))
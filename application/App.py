@@ -1,12 +1,21 @@
-from flask import Flask, Response, render_template, request, redirect, url_for
-from typing import List, Dict, Generator, Tuple
+from flask import Flask, Response, render_template, request, redirect, url_for, jsonify, send_from_directory
+from typing import List, Dict, Generator, Tuple, Optional
 
 from ObjectTracking import ObjectTracking
 from ObjectDetection import ObjectDetection
 from FileHandling import FileHandling
+from Database import CaptureDatabase
+from Services import Services
+from CapturePolicy import CapturePolicy
+from BestShot import BestShotSelector
+from Zones import ZoneMonitor
+from Alerts import AlertDispatcher
+from FrameBuffer import FrameBuffer
+from BitrateController import BitrateController
+from AsyncStreamServer import AsyncStreamServer
 from Camera import Camera 
 
-import os, time, threading, cv2
+import os, time, threading, json, cv2
 from datetime import datetime 
 
 
@@ -16,20 +25,42 @@ class App(object):
     Application class setup to handle all logic concerned with the applications operation. This includes the routes and the associated functionality within those pages. 
     '''
     
-    def __init__(self, THREAT_LEVEL : int = 3) -> None:
+    def __init__(self, THREAT_LEVEL : int = 3, services : Optional[Services] = None) -> None:
+
+        # Shared services, each created once on first use.
+        self.services : Services = services if services is not None else Services()
 
         # Initalise Flask application object. 
-        self.app : object = Flask(__name__)
+        with self.services.phase('flask'):
+            self.app : object = Flask(__name__)
+
+        # The camera, detection pipeline, database, file handling and alerts are resolved from the services on first use, see the
+        # properties below. Only the camera is needed here, the stream encoder and the settings live on it.
+
+        # Policy rate limiting captures and skipping near-duplicate frames.
+        self.capture_policy : CapturePolicy = CapturePolicy()
+
+        # Best frame of each threatening track, written once its window closes.
+        self.best_shots : BestShotSelector = BestShotSelector()
 
-        # Initialise Camera object for its methods and attributes.
-        self.camera : object = Camera()
+        # Time each track last raised a tripwire or zone event, used when captures are triggered by zones.
+        self.zone_triggers : Dict[int, float] = {}
 
-        self.object_detection = ObjectDetection()
+        # Controller adapting the JPEG quality and frame rate of each stream variant to the bandwidth budget.
+        self.bitrate_controller : BitrateController = BitrateController(self.camera.encode_frame, self.camera.settings_store)
 
-        self.object_tracking = ObjectTracking()
+        # Latest capture settings from the settings store, and the snapshot last applied by the pipeline. See apply_capture_settings.
+        self.pending_capture_settings = None
+        self.applied_capture_settings = None
 
-        # Initialise FileHandling module to access functions to manage files in local storage
-        self.file_handling : object = FileHandling()
+        # Rebuild derived state only when the settings it depends on change.
+        self.camera.settings_store.subscribe(self.apply_capture_settings, ('best_shot_window', 'capture_interval', 'duplicate_distance'))
+
+        # Shared buffer holding the latest processed frame, read by every connected client.
+        self.frame_buffer : FrameBuffer = FrameBuffer(self.bitrate_controller.encode, self.camera.scale_substream)
+
+        # Asynchronous server streaming the frame buffer to viewers without holding a thread per connection.
+        self.stream_server : AsyncStreamServer = AsyncStreamServer(self.frame_buffer, bitrate_controller = self.bitrate_controller)
 
         # Dictionary storing key value pairs representing applications current information.
         self.app_info : Dict[str, str] = {
@@ -60,19 +91,34 @@ class App(object):
             :return: Render template returns the homepage with the html template, title and application info dictionary appended.
             '''
 
-            # Update index with the current length of stored images.
-            self.app_info['no_of_captures'] = str(len(self.file_handling.stored_images))
-            # Update index with last sorted capture, returning the first result. 
-            self.app_info['capture_date'] =  self.file_handling.sort_files(self.file_handling.stored_images)[0]['capture_date'] 
-            self.app_info['capture_time'] =  self.file_handling.sort_files(self.file_handling.stored_images)[0]['capture_time'] 
+            # Summary of the captures stored, cached until captures are written or deleted.
+            capture_summary = self.database.capture_summary()
+            # Update index with the number of captures stored.
+            self.app_info['no_of_captures'] = str(capture_summary['total'])
+            # Update index with the most recent capture.
+            latest_capture = capture_summary['latest']
+            self.app_info['capture_date'] = latest_capture['capture_date'] if latest_capture else 'N/A'
+            self.app_info['capture_time'] = latest_capture['capture_time'] if latest_capture else 'N/A'
             # Update index with the current status of the camera. 
             self.app_info['device_status'] = 'Active' if self.camera.settings['camera_toggle'] == True else 'Inactive'
 
+            # Serve the stream and detections from the asynchronous server when it is up, falling back onto the Flask routes.
+            if self.stream_server.running:
+                stream_url = f'//{request.host.split(":")[0]}:{self.stream_server.PORT}/video_stream?layer=raw'
+                detections_url = f'//{request.host.split(":")[0]}:{self.stream_server.PORT}/detections'
+            else:
+                stream_url = url_for('video_stream', layer='raw')
+                detections_url = url_for('detections')
+
             # Call render template function.
             return render_template(
                 'index.html', 
                 # app_info dictionary for template to access data stored as key value pairs. 
-                app_info = self.app_info
+                app_info = self.app_info,
+                # Location of the live video stream.
+                stream_url = stream_url,
+                # Location of the detection metadata the overlay is drawn from.
+                detections_url = detections_url,
             )
         
 
@@ -81,23 +127,154 @@ class App(object):
 
             '''
             Real-time video streaming achieved by a multipart response, providing multiple frames with one HTTP response.
+            Passing ?layer=raw streams the clean frame without overlays, for clients drawing detections themselves.
+            Passing ?quality=low streams the low resolution substream.
+
             :return: Stream of frames.
             '''
 
-            # Call response object, accessing the camera and its settings the content type.
+            # Layer of the frame requested by the client, annotated by default.
+            layer = 'raw' if request.args.get('layer') == 'raw' else 'annotated'
+
+            # Resolution requested by the client, full resolution by default.
+            quality = 'low' if request.args.get('quality') == 'low' else 'main'
+
+            # Call response object, accessing the shared frame buffer and the content type.
             return Response(
-                # Call stream_frames function.
-                App.stream_frames(
-                    self,
-                    self.camera,
-                    self.object_detection,
-                    self.object_tracking
-                ),
+                # Call generate_stream function.
+                self.generate_stream(request.remote_addr, layer, quality),
                 # Set content type argument. 
                 mimetype='multipart/x-mixed-replace; boundary=frame',
             )
 
 
+        @self.app.route('/detections')
+        def detections() -> Response:
+
+            '''
+            Server-Sent Events stream publishing the detection metadata of each frame, tagged with the frames sequence number.
+
+            :return: Stream of detection events.
+            '''
+
+            return Response(
+                # Call generate_detections function.
+                self.generate_detections(request.remote_addr),
+                # Set content type argument.
+                mimetype='text/event-stream',
+                # Stop proxies from buffering the events.
+                headers={'Cache-Control' : 'no-cache'},
+            )
+
+
+        @self.app.route('/stream/stats')
+        def stream_stats() -> Response:
+
+            '''
+            Report the delivery counters of every connected viewer, showing which clients are skipping frames.
+
+            :return: JSON list of per-client statistics.
+            '''
+
+            return jsonify(self.frame_buffer.subscriber_stats())
+
+
+        @self.app.route('/stream/bitrate')
+        def stream_bitrate() -> Response:
+
+            '''
+            Report the measured bitrate, JPEG quality and frame rate limit of every stream variant against the bandwidth budget.
+
+            :return: JSON of per-variant statistics.
+            '''
+
+            return jsonify({
+                'budget_kbps' : self.camera.settings['bandwidth_budget'],
+                'variants' : self.bitrate_controller.stats(),
+            })
+
+
+        @self.app.route('/motion/heatmap')
+        def motion_heatmap() -> Response:
+
+            '''
+            Report the per-tile motion heatmap, showing where motion happens within the frame.
+
+            :return: JSON description of the heatmap.
+            '''
+
+            return jsonify(self.object_detection.motion_heatmap.describe())
+
+
+        @self.app.route('/tracks')
+        def tracks() -> Response:
+
+            '''
+            Report the recent path of every track and which tracks are loitering, having stayed within ?radius= pixels of the same spot
+            for the last ?window= seconds.
+
+            :return: JSON of track trails and loitering track IDs.
+            '''
+
+            trajectories = self.object_tracking.trajectories
+
+            window = request.args.get('window', 30, type=float)
+            radius = request.args.get('radius', 50, type=float)
+
+            return jsonify({
+                'trails' : {str(track_ID) : trajectories.trail(track_ID).round(1).tolist() for track_ID in list(trajectories.slots)},
+                'loitering' : trajectories.loitering(time.time(), window, radius),
+            })
+
+
+        @self.app.route('/alerts/stats')
+        def alert_stats() -> Response:
+
+            '''
+            Report how many alerts were submitted, dropped, coalesced, sent and failed.
+
+            :return: JSON of alert counters.
+            '''
+
+            return jsonify(self.alert_dispatcher.stats())
+
+
+        @self.app.route('/zones', methods = ['GET', 'POST'])
+        def zones() -> Response:
+
+            '''
+            Report the tripwires and zones, or replace them with those posted as JSON.
+            {"tripwires" : [{"name", "start" : [x, y], "end" : [x, y], "direction" : -1|0|1}], "zones" : [{"name", "polygon" : [[x, y], ...]}]}
+
+            :return: JSON of the tripwires and zones.
+            '''
+
+            if request.method == 'POST':
+                try:
+                    self.object_tracking.zones.configure(request.get_json())
+                except (TypeError, KeyError, ValueError, AttributeError) as error:
+                    return jsonify({'error' : str(error)}), 400
+
+            return jsonify(self.object_tracking.zones.describe())
+
+
+        @self.app.route('/motion/sensitivity', methods = ['POST'])
+        def motion_sensitivity() -> Response:
+
+            '''
+            Apply per-tile sensitivity overrides, posted as JSON. {"tile_sensitivity" : [[...], ...]}
+
+            :return: JSON description of the updated heatmap.
+            '''
+
+            try:
+                self.object_detection.motion_heatmap.set_tile_sensitivity(request.get_json()['tile_sensitivity'])
+            except (TypeError, KeyError, ValueError) as error:
+                return jsonify({'error' : str(error)}), 400
+
+            return jsonify(self.object_detection.motion_heatmap.describe())
+
+
         @self.app.route('/captures', methods = ['GET', 'POST'])
         def captures() -> str:
 
@@ -116,23 +293,50 @@ class App(object):
                 # Redirect users back to settings page with changes appended. 
                 return redirect(url_for('captures'))
 
-            # Sort images stored list using the order provided. 
-            sorted_images = self.file_handling.sort_files(self.file_handling.stored_images, reverse_order = self.file_handling.file_order)
-
-            # Call function to manage the captures displayed content. Pass 12 as the maximum number of images argument. 
-            current_images, total_pages, page_number = self.file_handling.manage_images_displayed(12, sorted_images)
+            # Call function to query the captures displayed in the current order. Pass 12 as the maximum number of images argument. 
+            current_images, total_pages, page_number, next_cursor, previous_cursor = self.file_handling.manage_captures_displayed(12)
       
             # Call render template function.
             return render_template(
                 'captures.html',
-                title = 'Captures' if len(self.file_handling.stored_images) > 1 else 'No Captures Yet :(',
+                title = 'Captures' if total_pages > 0 else 'No Captures Yet :(',
                 image = current_images,
                 total_pages = total_pages,
                 current_page = page_number,
+                next_cursor = next_cursor,
+                previous_cursor = previous_cursor,
                 order = self.file_handling.file_order,
             )
         
 
+        @self.app.route('/captures/image/<filename>')
+        def capture_image(filename) -> Response:
+
+            '''
+            Serve a capture, supporting conditional and range requests so browsers revalidate for free and downloads can resume.
+
+            :param filename: Capture to serve, without its extension.
+            '''
+
+            return self.send_capture(self.file_handling.CAPTURES_DIRECTORY, filename)
+
+
+        @self.app.route('/captures/thumbnail/<filename>')
+        def capture_thumbnail(filename) -> Response:
+
+            '''
+            Serve a scaled down copy of a capture for the gallery, generated on first request.
+
+            :param filename: Capture to serve, without its extension.
+            '''
+
+            # Capture does not exist, nothing to scale down.
+            if self.file_handling.thumbnail_path(filename) is None:
+                return 'Resource not found!', 404
+
+            return self.send_capture(self.file_handling.THUMBNAILS_DIRECTORY, filename)
+
+
         @self.app.route('/captures/delete/<filename>', methods = ['POST'])
         def delete_capture(filename) -> str:
 
@@ -142,17 +346,8 @@ class App(object):
             :param filename: Specified file to be deleted. 
             '''
 
-            # Get the current captures directory. 
-            directory = self.file_handling.CAPTURES_DIRECTORY
-
-            # Construct filepath from parameterised filename. 
-            capture = f'{directory}{filename}.jpg'
-
-            # Check path exists before moving forward.
-            if os.path.exists(capture):
-
-                # Use os library to remove file from the devices local storage. 
-                os.remove(capture)
+            # Remove the capture from local storage and the database, checking it exists first.
+            if self.file_handling.delete_capture(filename):
 
                 # Redirect users back to captures page. 
                 return redirect(url_for('captures'))
@@ -188,76 +383,190 @@ class App(object):
             :return: Redirect the user back to settings page, should make experience seamless.
             '''
 
-            # If the value returned is a button.
-            if 'toggle' in request.form:
+            try:
 
-                # Grab the buttons name.
-                btn_name = request.form.get('toggle')
-                # Construct button name by appending _toggle designator.
-                target_btn = f'{btn_name}_toggle'
+                # If the value returned is a button.
+                if 'toggle' in request.form:
 
-                # Retrieve current status, negate current values.
-                self.camera.settings[target_btn] = not self.camera.settings[target_btn]
+                    # Grab the buttons name.
+                    btn_name = request.form.get('toggle')
+                    # Construct button name by appending _toggle designator.
+                    target_btn = f'{btn_name}_toggle'
 
-            # If the value returned is a slider.
-            elif 'slider' in request.form:
-                
-                # Grab the sliders current value.
-                value = request.form.get('slider')
+                    # Retrieve current status, negate current values.
+                    self.camera.settings_store.toggle(target_btn)
 
-                # Grab the sliders name.
-                name = request.form.get('slider_name')
-                
-                # Apply updated value to the settings dictionary. 
-                self.camera.settings[name] = int(value)
+                # If the value returned is a slider.
+                elif 'slider' in request.form:
+                    
+                    # Grab the sliders current value.
+                    value = request.form.get('slider')
 
-            # If the value returned is a drop down.
-            elif 'drop' in request.form:
-                
-                # Get the drop down name.
-                drop_name = request.form.get('drop_name')
+                    # Grab the sliders name.
+                    name = request.form.get('slider_name')
+                    
+                    # Validate and apply updated value to the settings. 
+                    self.camera.settings_store.update({name : value})
+
+                # If the value returned is a drop down.
+                elif 'drop' in request.form:
+                    
+                    # Get the drop down name.
+                    drop_name = request.form.get('drop_name')
+
+                    # Get the option selected by the user. 
+                    value = request.form.get('drop')
+
+                    # Validate and apply the value to the settings. 
+                    self.camera.settings_store.update({drop_name : value})
 
-                # Get the option selected by the user. 
-                value = request.form.get('drop')
+            except (KeyError, ValueError) as error:
 
-                # Apply the value to settings dictionary. 
-                self.camera.settings[drop_name] = int(value)
+                # Reject unknown settings and values outside their limits.
+                return f'Invalid setting! {error}', 400
 
             # Redirect the user back to the settings page to make experience seamless.
             return redirect(url_for('settings'))
 
     
+    '''
+    Shared services, each resolved from the services the first time it is used.
+    '''
+
+
+    @property
+    def camera(self) -> Camera:
+
+        # Camera object for its methods and attributes, the only handle on the capture device.
+        return self.services.camera
+
+
+    @property
+    def object_detection(self) -> ObjectDetection:
+
+        # Detection pipeline, sharing the tracker and file handler below.
+        return self.services.object_detection
+
+
+    @property
+    def object_tracking(self) -> ObjectTracking:
+
+        return self.services.object_tracking
+
+
+    @property
+    def database(self) -> CaptureDatabase:
+
+        # Embedded database storing captures and detection events.
+        return self.services.database
+
+
+    @property
+    def alert_dispatcher(self) -> AlertDispatcher:
+
+        # Dispatcher delivering alerts off the frame loop.
+        return self.services.alert_dispatcher
+
+
+    @property
+    def file_handling(self) -> FileHandling:
+
+        # FileHandling module to access functions to manage files in local storage
+        return self.services.file_handling
+
+
     '''
     Functions separating page logic from the application routes for increased maintainability.
     '''
 
     
-    def stream_frames(self, camera : Camera, object_detection : ObjectDetection, object_tracking : ObjectTracking):
+    def stream_frames(self, camera : Camera, object_detection : ObjectDetection, object_tracking : ObjectTracking) -> None:
         
         '''
-        Retrieve frames from the devices onboard camera, encodes them into response chunks to upload for streaming.
+        Retrieve frames from the devices onboard camera, process them and publish the results to the shared frame buffer for streaming.
         '''
         # Toggle for the camera on/off.
         camera_toggle = camera.settings['camera_toggle']
 
+        # Restore or quickly learn the background before detection is armed, avoiding a burst of false alarms on startup.
+        object_detection.warm_start(camera.retrieve_frame_CV2)
+
         # Initialise previous frame variable, store first frame when loading to avoid errors.
         previous_frame = camera.retrieve_frame_CV2()
 
+        # Number of frames streamed, used to run detection every detection_stride frames.
+        frame_count = 0
+
+        # Whether motion was found the last time detection ran.
+        motion_detected = False
+
         while camera_toggle: 
 
             # Initialise timer used to enforce stream framerate. 
             fps_timer_start = time.time()
             
+            # Read the settings once, the whole frame is processed with the same snapshot.
+            settings = camera.settings
+
+            # Rebuild state derived from settings changed since the last frame, here on the pipeline thread so it never changes mid frame.
+            object_detection.apply_pending_settings()
+            object_tracking.apply_pending_settings()
+            self.apply_pending_capture_settings()
+
             # Retrive the current, untampered frame from the devices onboard camera.
             raw_frame = camera.retrieve_frame_CV2()
 
-            motion_detected = object_detection.motion_detection(previous_frame, raw_frame, camera)
+            frame_count += 1
+
+            # Run detection on stride frames, or sooner if the tracks predicted positions can no longer be trusted.
+            run_detection = (
+                frame_count % max(settings['detection_stride'], 1) == 0 or
+                object_tracking.prediction_confidence() * 100 < settings['minimum_confidence']
+            )
+
+            if run_detection:
+
+                motion_detected = object_detection.motion_detection(previous_frame, raw_frame, camera)
+
+                frame, detections = object_detection.register_detections(raw_frame, camera)
 
-            frame, detections = object_detection.register_detections(raw_frame, camera)
+                updated_detections = object_tracking.update_detections_V3(detections)
 
-            updated_detections = object_tracking.update_detections_V3(detections)
+                # Stop the background model learning the regions covered by active tracks.
+                object_detection.learning_schedule.frozen_boxes = [detection[:4] for detection in updated_detections]
 
-            detection_frame, threat_level = object_detection.draw_bounding_boxes(frame, updated_detections)
+                # Persist tracks registering, escalating and leaving.
+                for event_type, detection_ID, detection_threat_level, box in object_tracking.track_events:
+                    self.database.record_event(event_type, detection_ID, detection_threat_level, box)
+
+                    # Tracks that left have their best shot written and no longer need rate limiting.
+                    if event_type == 'deregistered':
+                        self.best_shots.close_track(detection_ID)
+                        self.capture_policy.forget(detection_ID)
+                        self.zone_triggers.pop(detection_ID, None)
+
+                    # Tracks crossing a tripwire or entering or leaving a zone can trigger captures, and raise an alert.
+                    elif event_type.split(':')[0] in ZoneMonitor.EVENT_TYPES:
+                        self.zone_triggers[detection_ID] = time.time()
+                        self.alert_dispatcher.submit(event_type, detection_ID, detection_threat_level, box)
+
+                    # Tracks reaching the threat level raise an alert.
+                    elif event_type == 'escalated' and detection_threat_level >= self.threat_level:
+                        self.alert_dispatcher.submit(event_type, detection_ID, detection_threat_level, box)
+
+                # Update the previous frame with the raw onboard camera frame, motion is measured between detected frames.
+                previous_frame = raw_frame
+
+            else:
+
+                # Bridge the gap between detections with the tracks predicted positions.
+                frame, updated_detections = raw_frame, object_tracking.predict_detections()
+
+            # Describe detections once, shared by the drawn overlays and the published metadata.
+            described_detections = object_detection.describe_detections(updated_detections)
+
+            # Draw onto a copy so the raw frame stays clean for unannotated streams.
+            detection_frame, threat_level = object_detection.draw_bounding_boxes(object_detection.draw_zones(frame.copy()), described_detections)
 
             # Access current time, formatted to display on the video stream.
             current_time = datetime.now().strftime('%I:%M:%S%p')
@@ -266,25 +575,47 @@ class App(object):
             # Layer clock frame over the current frame, mitigates interference for bounding boxes.
             appended_frame = cv2.addWeighted(detection_frame, 0.5, time_layer, 0.5, 0)
 
-            # Encode the frame into bytes for streaming.
-            encoded_frame = camera.encode_frame(appended_frame)
+            # Publish the frames and metadata, encoding is deferred until a client requests them.
+            self.frame_buffer.publish(raw_frame, appended_frame, described_detections)
 
-            if motion_detected == True and threat_level == self.threat_level:
-            
-                # Capture that specific frame where motion has been detected.
-                object_detection.capture_frame(
-                    detection_frame, 
-                    './static/captures/', 
-                )   
-
-            # Yielded sequence of the encoded frames as response chunks for the stream.
-            yield (
-                b'--frame\r\n'
-                b'Content-Type: image/jpeg\r\n\r\n' + encoded_frame + b'\r\n'
-            )
+            if settings['capture_trigger'] == 1:
+
+                # Offer detections that raised a tripwire or zone event within the best shot window, ignoring other motion.
+                for detection in described_detections:
+                    if time.time() - self.zone_triggers.get(detection['id'], 0) <= settings['best_shot_window']:
+                        self.best_shots.consider(raw_frame, detection_frame, detection)
+
+            elif motion_detected == True and threat_level == self.threat_level:
 
-            # Update the previous frame with the raw onboard camera frame.
-            previous_frame = raw_frame
+                # Offer every detection at the threat level, keeping the best shot of each within its window.
+                for detection in described_detections:
+                    if detection['threat_level'] == threat_level:
+                        self.best_shots.consider(raw_frame, detection_frame, detection)
+
+            # Best shots of windows that have closed are ready to be written.
+            self.best_shots.close_expired()
+
+            # Write at most one best shot per second, later shots wait rather than overwrite it.
+            if self.best_shots.ready_shots and self.capture_policy.ready():
+
+                shot = self.best_shots.next_shot()
+                threat = shot['detection']
+
+                # Only write shots passing the rate limits that differ from the last capture.
+                if self.capture_policy.should_capture(shot['raw_frame'], threat['id']):
+
+                    # Capture the best frame of the detection.
+                    capture = object_detection.capture_frame(
+                        shot['annotated_frame'], 
+                        './static/captures/', 
+                        threat,
+                    )   
+
+                    self.database.record_event('capture', threat['id'], threat['threat_level'], threat['box'], capture)
+                    self.alert_dispatcher.submit('capture', threat['id'], threat['threat_level'], threat['box'], capture)
+
+            # Periodically save the learnt background so a restart can warm start from it.
+            object_detection.save_background_snapshot()
 
             # Reset the elapsed time for the fps timer.
             elapsed_time = time.time() - fps_timer_start
@@ -292,6 +623,136 @@ class App(object):
             # Enforce stream framerate. 
             camera.enforce_frame_rate(elapsed_time)
 
+
+    def apply_capture_settings(self, settings) -> None:
+
+        '''
+        Settings store subscriber, called on the thread updating the settings when the capture settings change. The snapshot is only
+        recorded, the pipeline applies it before its next frame with apply_pending_capture_settings.
+
+        :param: settings - Settings snapshot.
+        :return: N/A
+        '''
+
+        self.pending_capture_settings = settings
+
+
+    def apply_pending_capture_settings(self) -> None:
+
+        '''
+        Apply the latest capture settings to the best shot selector and capture policy if they have not been applied yet.
+
+        :return: N/A
+        '''
+
+        settings = self.pending_capture_settings
+
+        if settings is None or settings is self.applied_capture_settings:
+            return
+
+        self.best_shots.WINDOW_SECONDS = settings['best_shot_window']
+        self.capture_policy.CAPTURE_INTERVAL = settings['capture_interval']
+        self.capture_policy.DUPLICATE_DISTANCE = settings['duplicate_distance']
+
+        self.applied_capture_settings = settings
+
+
+    def generate_stream(self, client : str, layer : str = 'annotated', quality : str = 'main') -> Generator[bytes, None, None]:
+
+        '''
+        Read frames from the clients mailbox on the shared frame buffer, yielding each one as a response chunk for the stream.
+        A slow client only ever skips frames, it never holds back the pipeline or other viewers.
+
+        :param: client - Address of the client, reported in the stream statistics.
+        :param: layer - 'annotated' for frames with overlays drawn, 'raw' for clean frames.
+        :param: quality - 'main' for full resolution, 'low' for the substream.
+        :return: Generator of multipart response chunks.
+        '''
+
+        # Subscribe the client, receiving the latest frame whenever it is ready for one.
+        subscriber = self.frame_buffer.subscribe(f'video_stream {client} {layer}/{quality}')
+
+        try:
+            while True:
+
+                # Wait for the next frame offered to this client.
+                packet = subscriber.take()
+
+                # Nothing published yet, keep waiting.
+                if packet is None:
+                    continue
+
+                sent_at = time.time()
+
+                # Yielded sequence of the encoded frames as response chunks for the stream.
+                yield (
+                    b'--frame\r\n'
+                    b'Content-Type: image/jpeg\r\n\r\n' + packet.encoded(layer, quality) + b'\r\n'
+                )
+
+                # Space out frames of a variant over its bandwidth budget, frames published meanwhile are skipped without being encoded.
+                time.sleep(max(self.bitrate_controller.frame_interval((layer, quality)) - (time.time() - sent_at), 0))
+
+        finally:
+            # Client disconnected, stop offering it frames.
+            self.frame_buffer.unsubscribe(subscriber)
+
+
+    def generate_detections(self, client : str) -> Generator[str, None, None]:
+
+        '''
+        Read detection metadata from the clients mailbox on the shared frame buffer, yielding each frames metadata as a Server-Sent Event.
+
+        :param: client - Address of the client, reported in the stream statistics.
+
+        :return: Generator of event stream chunks.
+        '''
+
+        # Subscribe the client, receiving the latest frame whenever it is ready for one.
+        subscriber = self.frame_buffer.subscribe(f'detections {client}')
+
+        try:
+            while True:
+
+                # Wait for the next frame offered to this client.
+                packet = subscriber.take()
+
+                # Nothing published yet, keep waiting.
+                if packet is None:
+                    continue
+
+                # Event ID is the frame sequence number, letting clients pair metadata with frames.
+                yield f'id: {packet.sequence}\ndata: {json.dumps(packet.metadata())}\n\n'
+
+        finally:
+            # Client disconnected, stop offering it frames.
+            self.frame_buffer.unsubscribe(subscriber)
+
+
+    def send_capture(self, directory : str, filename : str, max_age : int = 31536000) -> Response:
+
+        '''
+        Send a JPEG from local storage. Werkzeug adds the ETag and Last-Modified headers, answers If-None-Match, If-Modified-Since and Range
+        requests, and hands the open file to the servers file wrapper so servers supporting it send it with sendfile.
+
+        :param: directory - Directory the file is stored in.
+        :param: filename - Filename without its extension.
+        :param: max_age - Seconds browsers may cache the file for without revalidating.
+        :return: Response - File response, or 404 if it does not exist.
+        '''
+
+        # Resolve against the working directory captures are written relative to, rather than the application root.
+        response = send_from_directory(os.path.abspath(directory), f'{filename}.jpg', mimetype='image/jpeg', conditional=True, max_age=max_age)
+
+        # Captures never change once written, except within the second a capture with the same name is taken again.
+        if response.last_modified is not None and time.time() - response.last_modified.timestamp() > 1:
+            response.cache_control.immutable = True
+        else:
+            response.cache_control.max_age = 0
+            response.cache_control.no_cache = True
+
+        return response
+
     
     def run_app(self) -> None:
 
@@ -319,20 +780,31 @@ if __name__ == '__main__':
     # Instantiate the application object to access its methods. 
     application = App()
 
-    # Access files in devices local storage whilst application loads using target directory. 
-    application.file_handling.access_stored_captures(application.file_handling.CAPTURES_DIRECTORY)
+    services = application.services
+
+    # Import files in devices local storage into the database the first time the application loads. 
+    with services.phase('import captures'):
+        application.file_handling.import_stored_captures(application.file_handling.CAPTURES_DIRECTORY)
 
     # Create a thread to run the cameras streaming functionality in concurrency with the rest of the application.
-    camera_stream_thread = threading.Thread(
-        target=application.stream_frames,
-        args=(
-            application.camera,
-            application.object_detection,
-            application.object_tracking,
+    with services.phase('pipeline thread'):
+        camera_stream_thread = threading.Thread(
+            target=application.stream_frames,
+            args=(
+                application.camera,
+                application.object_detection,
+                application.object_tracking,
+            ),
+            daemon=True,
         )
-    )
-    camera_stream_thread.isDaemon = True
-    camera_stream_thread.start()
+        camera_stream_thread.start()
+
+    # Start the asynchronous streaming server on its own thread, serving viewers alongside the Flask pages.
+    with services.phase('stream server'):
+        application.stream_server.start()
+
+    # Report where startup time went.
+    services.report()
 
     # Run the application. 
     application.run_app()
\ No newline at end of file
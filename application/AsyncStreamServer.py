@@ -0,0 +1,330 @@
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit, parse_qs
+
+from FrameBuffer import FrameBuffer, FramePacket, Subscriber
+from BitrateController import BitrateController
+
+import asyncio, json, threading
+
+
+class AsyncStreamServer(object):
+
+    '''
+    Lightweight asyncio HTTP server streaming frames and their detection metadata from the shared frame buffer. Every viewer is a coroutine
+    rather than a thread, so many concurrent clients can be served without exhausting the Flask worker threads, which are left to serve the
+    application pages.
+    '''
+
+    def __init__(self, frame_buffer : FrameBuffer, HOST : str = '0.0.0.0', PORT : int = 8001, MAXIMUM_REQUEST_SIZE : int = 8192, bitrate_controller : Optional[BitrateController] = None) -> None:
+
+        # Shared buffer holding the latest processed frame.
+        self.frame_buffer = frame_buffer
+
+        # Controller spacing out frames of variants over their bandwidth budget, if any.
+        self.bitrate_controller = bitrate_controller
+
+        # Address the server listens on.
+        self.HOST = HOST
+
+        # Port the server listens on.
+        self.PORT = PORT
+
+        # Largest request header block accepted before the connection is dropped.
+        self.MAXIMUM_REQUEST_SIZE = MAXIMUM_REQUEST_SIZE
+
+        # Event loop the server runs on, created when the server starts.
+        self.loop : Optional[asyncio.AbstractEventLoop] = None
+
+        # Number of clients currently connected.
+        self.connected_clients : int = 0
+
+        # Whether the server is up and accepting connections.
+        self.running : bool = False
+
+
+    '''
+    Functions concerned with running the server alongside the Flask application.
+    '''
+
+
+    def start(self) -> threading.Thread:
+
+        '''
+        Start the server on its own thread with a dedicated event loop.
+
+        :return: server_thread - Thread running the event loop.
+        '''
+
+        server_thread = threading.Thread(target=asyncio.run, args=(self.serve(),), daemon=True)
+        server_thread.start()
+
+        return server_thread
+
+
+    async def serve(self) -> None:
+
+        '''
+        Bind the server and hook it onto the frame buffer, then serve clients forever.
+        '''
+
+        self.loop = asyncio.get_running_loop()
+
+        server = await asyncio.start_server(self.handle_client, self.HOST, self.PORT, limit=self.MAXIMUM_REQUEST_SIZE)
+
+        self.running = True
+        print(f'Streaming server listening on port {self.PORT}!')
+
+        async with server:
+            await server.serve_forever()
+
+
+    def subscribe(self, name : str) -> Tuple[Subscriber, asyncio.Event]:
+
+        '''
+        Subscribe a client to the frame buffer, pairing its mailbox with an event the producer thread can set without blocking.
+
+        :param: name - Description of the client.
+        :return: subscriber - Mailbox the client reads frames from.
+        :return: frame_ready - Event set on the event loop whenever a frame is offered.
+        '''
+
+        frame_ready = asyncio.Event()
+
+        subscriber = self.frame_buffer.subscribe(name, lambda: self.loop.call_soon_threadsafe(frame_ready.set))
+
+        return subscriber, frame_ready
+
+
+    async def next_frame(self, subscriber : Subscriber, frame_ready : asyncio.Event) -> FramePacket:
+
+        '''
+        Wait until the clients mailbox holds a frame, then take it.
+
+        :param: subscriber - Mailbox the client reads frames from.
+        :param: frame_ready - Event set whenever a frame is offered.
+        :return: packet - Latest frame packet.
+        '''
+
+        while True:
+
+            await frame_ready.wait()
+            frame_ready.clear()
+
+            packet = subscriber.take_nowait()
+
+            # Event may have been set for a frame already taken, keep waiting.
+            if packet is not None:
+                return packet
+
+
+    '''
+    Functions handling client requests.
+    '''
+
+
+    async def handle_client(self, reader : asyncio.StreamReader, writer : asyncio.StreamWriter) -> None:
+
+        '''
+        Parse a clients request and dispatch it to the matching route.
+
+        :param: reader - Stream to read the request from.
+        :param: writer - Stream to write the response to.
+        '''
+
+        self.connected_clients += 1
+
+        try:
+            path, query = await self.read_request(reader)
+
+            # Layer of the frame requested by the client, annotated by default.
+            layer = 'raw' if query.get('layer', [''])[0] == 'raw' else 'annotated'
+
+            # Resolution requested by the client, full resolution by default.
+            quality = 'low' if query.get('quality', [''])[0] == 'low' else 'main'
+
+            # Describe the client by its address for the stream statistics.
+            name = f'async {writer.get_extra_info("peername")}'
+
+            if path == '/video_stream':
+                await self.stream(writer, name, layer, quality)
+            elif path == '/snapshot':
+                await self.snapshot(writer, name, layer, quality)
+            elif path == '/detections':
+                await self.detections(writer, f'detections {writer.get_extra_info("peername")}')
+            else:
+                await self.send_headers(writer, '404 Not Found', {'Content-Type' : 'text/plain', 'Content-Length' : '19'})
+                writer.write(b'Resource not found!')
+                await writer.drain()
+
+        except (ValueError, ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            # Client disconnected or sent a malformed request, nothing to respond to.
+            pass
+
+        finally:
+            self.connected_clients -= 1
+            writer.close()
+
+
+    async def read_request(self, reader : asyncio.StreamReader) -> Tuple[str, Dict[str, list]]:
+
+        '''
+        Read the request line and headers, returning the requested path and query parameters.
+
+        :param: reader - Stream to read the request from.
+        :return: path - Requested path.
+        :return: query - Parsed query string parameters.
+        '''
+
+        # Headers larger than the stream limit raise LimitOverrunError.
+        request = await reader.readuntil(b'\r\n\r\n')
+
+        # Request line is formatted as 'METHOD TARGET VERSION'.
+        method, target, _ = request.split(b'\r\n', 1)[0].decode('latin-1').split(' ', 2)
+
+        if method != 'GET':
+            raise ValueError('Only GET requests are supported!')
+
+        url = urlsplit(target)
+
+        return url.path, parse_qs(url.query)
+
+
+    async def send_headers(self, writer : asyncio.StreamWriter, status : str, headers : Dict[str, str]) -> None:
+
+        '''
+        Write the status line and headers of a response.
+
+        :param: writer - Stream to write the response to.
+        :param: status - HTTP status code and reason.
+        :param: headers - Response headers.
+        '''
+
+        lines = [f'HTTP/1.1 {status}'] + [f'{name}: {value}' for name, value in headers.items()] + ['Connection: close', '', '']
+
+        writer.write('\r\n'.join(lines).encode('latin-1'))
+        await writer.drain()
+
+
+    async def encode(self, packet : FramePacket, layer : str, quality : str) -> bytes:
+
+        '''
+        Encode a frame variant off the event loop, keeping the loop free to serve other clients.
+
+        :param: packet - Frame packet to encode.
+        :param: layer - Layer of the frame to encode.
+        :param: quality - Resolution of the frame to encode.
+        :return: bytes - Encoded frame.
+        '''
+
+        return await self.loop.run_in_executor(None, packet.encoded, layer, quality)
+
+
+    async def stream(self, writer : asyncio.StreamWriter, name : str, layer : str, quality : str) -> None:
+
+        '''
+        Stream frames to the client as a multipart response until it disconnects.
+
+        :param: writer - Stream to write the response to.
+        :param: name - Description of the client.
+        :param: layer - Layer of the frame to stream.
+        :param: quality - Resolution of the frame to stream.
+        '''
+
+        await self.send_headers(writer, '200 OK', {
+            'Content-Type' : 'multipart/x-mixed-replace; boundary=frame',
+            'Cache-Control' : 'no-cache',
+        })
+
+        subscriber, frame_ready = self.subscribe(name)
+
+        try:
+            while True:
+
+                packet = await self.next_frame(subscriber, frame_ready)
+
+                sent_at = self.loop.time()
+
+                encoded_frame = await self.encode(packet, layer, quality)
+
+                writer.write(
+                    b'--frame\r\n'
+                    b'Content-Type: image/jpeg\r\n\r\n' + encoded_frame + b'\r\n'
+                )
+
+                # Only this clients coroutine waits on a slow connection, frames published meanwhile replace each other in its mailbox.
+                await writer.drain()
+
+                # Space out frames of a variant over its bandwidth budget, frames published meanwhile are skipped without being encoded.
+                if self.bitrate_controller is not None:
+                    await asyncio.sleep(max(self.bitrate_controller.frame_interval((layer, quality)) - (self.loop.time() - sent_at), 0))
+
+        finally:
+            self.frame_buffer.unsubscribe(subscriber)
+
+
+    async def snapshot(self, writer : asyncio.StreamWriter, name : str, layer : str, quality : str) -> None:
+
+        '''
+        Respond with the latest frame as a single JPEG image.
+
+        :param: writer - Stream to write the response to.
+        :param: name - Description of the client.
+        :param: layer - Layer of the frame to send.
+        :param: quality - Resolution of the frame to send.
+        '''
+
+        packet = self.frame_buffer.latest
+
+        # Nothing published yet, wait for the first frame.
+        if packet is None:
+
+            subscriber, frame_ready = self.subscribe(name)
+
+            try:
+                packet = await self.next_frame(subscriber, frame_ready)
+            finally:
+                self.frame_buffer.unsubscribe(subscriber)
+
+        encoded_frame = await self.encode(packet, layer, quality)
+
+        await self.send_headers(writer, '200 OK', {
+            'Content-Type' : 'image/jpeg',
+            'Content-Length' : str(len(encoded_frame)),
+            'Cache-Control' : 'no-store',
+        })
+
+        writer.write(encoded_frame)
+        await writer.drain()
+
+
+    async def detections(self, writer : asyncio.StreamWriter, name : str) -> None:
+
+        '''
+        Stream the detection metadata of each frame as Server-Sent Events until the client disconnects, tagged with the frames sequence number.
+
+        :param: writer - Stream to write the response to.
+        :param: name - Description of the client.
+        '''
+
+        await self.send_headers(writer, '200 OK', {
+            'Content-Type' : 'text/event-stream',
+            'Cache-Control' : 'no-cache',
+            # The dashboard is served by Flask on another port, allow its pages to open the event stream.
+            'Access-Control-Allow-Origin' : '*',
+        })
+
+        subscriber, frame_ready = self.subscribe(name)
+
+        try:
+            while True:
+
+                packet = await self.next_frame(subscriber, frame_ready)
+
+                # Event ID is the frame sequence number, letting clients pair metadata with frames.
+                writer.write(f'id: {packet.sequence}\ndata: {json.dumps(packet.metadata())}\n\n'.encode('utf-8'))
+
+                # Metadata published while the client is slow replaces itself in its mailbox.
+                await writer.drain()
+
+        finally:
+            self.frame_buffer.unsubscribe(subscriber)
@@ -0,0 +1,331 @@
+from typing import List, Tuple, Optional
+import cv2, sys, time, numpy as np
+
+
+class BackgroundModel(object):
+
+    '''
+    Interface shared by the background models used to separate moving objects from the scene. Every model accepts a preprocessed
+    grayscale frame and returns a foreground mask where 255 marks foreground pixels.
+    '''
+
+    # Name reported by the settings page and benchmark harness.
+    NAME = 'Background Model'
+
+    # Learning rate applied when the model is updated on every frame.
+    DEFAULT_LEARNING_RATE = 0.01
+
+    def apply(self, frame : np.ndarray, learning_rate : float = -1) -> np.ndarray:
+
+        '''
+        Classify the frame into foreground and background, updating the model.
+
+        :param: frame - Preprocessed grayscale frame.
+        :param: learning_rate - Rate the model adapts at, between 0 and 1. Negative values use the models default.
+        :return: foreground_mask - Mask marking foreground pixels.
+        '''
+
+        raise NotImplementedError
+
+
+    def background_image(self) -> Optional[np.ndarray]:
+
+        '''
+        Return the models current estimate of the empty scene.
+
+        :return: np.ndarray - Background image, or None before the model has seen a frame.
+        '''
+
+        raise NotImplementedError
+
+
+    def seed(self, background : np.ndarray) -> None:
+
+        '''
+        Initialise the model from an image of the empty scene, such as a snapshot saved before a restart or the background of the model
+        being replaced, so detection starts from a learnt scene rather than from the first frame seen.
+
+        :param: background - Preprocessed grayscale image of the scene.
+        '''
+
+        # A learning rate of 1 discards anything learnt so far and takes the image as the background.
+        self.apply(background, 1.0)
+
+
+    def learn(self, frame : np.ndarray, learning_rate : float, frozen_boxes : List[List[int]]) -> None:
+
+        '''
+        Update the model without learning the regions supplied, so that stationary objects inside them do not fade into the background.
+        The frozen regions are replaced by the current background estimate before the frame is learnt.
+
+        :param: frame - Preprocessed grayscale frame.
+        :param: learning_rate - Rate the model adapts at, between 0 and 1.
+        :param: frozen_boxes - Bounding boxes excluded from learning. [x, y, w, h]
+        '''
+
+        background = self.background_image()
+
+        # Nothing learnt yet, learn the frame as it is.
+        if background is None or background.shape != frame.shape:
+            self.apply(frame, learning_rate)
+            return
+
+        composite_frame = frame.copy()
+
+        for x, y, w, h in frozen_boxes:
+            composite_frame[y:y + h, x:x + w] = background[y:y + h, x:x + w]
+
+        self.apply(composite_frame, learning_rate)
+
+
+class MOG2BackgroundModel(BackgroundModel):
+
+    '''
+    Gaussian mixture background model, accurate on busy scenes but the most expensive per pixel.
+    '''
+
+    NAME = 'MOG2'
+
+    def __init__(self, HISTORY : int = 100, VARIANCE_THRESHOLD : float = 40) -> None:
+
+        self.background_subtractor = cv2.createBackgroundSubtractorMOG2(history=HISTORY, varThreshold=VARIANCE_THRESHOLD)
+
+
+    def apply(self, frame : np.ndarray, learning_rate : float = -1) -> np.ndarray:
+
+        return self.background_subtractor.apply(frame, learningRate=learning_rate)
+
+
+    def background_image(self) -> Optional[np.ndarray]:
+
+        return self.background_subtractor.getBackgroundImage()
+
+
+class KNNBackgroundModel(BackgroundModel):
+
+    '''
+    K-nearest neighbours background model, copes well with small repetitive movement such as foliage.
+    '''
+
+    NAME = 'KNN'
+
+    def __init__(self, HISTORY : int = 100, DISTANCE_THRESHOLD : float = 400) -> None:
+
+        self.background_subtractor = cv2.createBackgroundSubtractorKNN(history=HISTORY, dist2Threshold=DISTANCE_THRESHOLD)
+
+
+    def apply(self, frame : np.ndarray, learning_rate : float = -1) -> np.ndarray:
+
+        return self.background_subtractor.apply(frame, learningRate=learning_rate)
+
+
+    def background_image(self) -> Optional[np.ndarray]:
+
+        return self.background_subtractor.getBackgroundImage()
+
+
+class RunningAverageBackgroundModel(BackgroundModel):
+
+    '''
+    Exponential running average of the scene, differenced against each frame. A fraction of the cost of the mixture models, suited to
+    low powered devices watching static scenes.
+    '''
+
+    NAME = 'Running Average'
+
+    DEFAULT_LEARNING_RATE = 0.05
+
+    def __init__(self, LEARNING_RATE : float = 0.05, DIFFERENCE_THRESHOLD : int = 25) -> None:
+
+        # Default weight given to each new frame.
+        self.LEARNING_RATE = LEARNING_RATE
+
+        # Difference from the average a pixel must exceed to be foreground.
+        self.DIFFERENCE_THRESHOLD = DIFFERENCE_THRESHOLD
+
+        # Running average of the scene, kept as floats to accumulate small changes.
+        self.average : Optional[np.ndarray] = None
+
+
+    def apply(self, frame : np.ndarray, learning_rate : float = -1) -> np.ndarray:
+
+        # Initialise the average from the first frame.
+        if self.average is None or self.average.shape != frame.shape:
+            self.average = frame.astype(np.float32)
+
+        # Difference the frame against the average before updating it.
+        frame_differencing = cv2.absdiff(frame, cv2.convertScaleAbs(self.average))
+
+        _, foreground_mask = cv2.threshold(frame_differencing, self.DIFFERENCE_THRESHOLD, 255, cv2.THRESH_BINARY)
+
+        # Fold the frame into the average, unless learning is paused.
+        if learning_rate != 0:
+            cv2.accumulateWeighted(frame, self.average, self.LEARNING_RATE if learning_rate < 0 else learning_rate)
+
+        return foreground_mask
+
+
+    def learn(self, frame : np.ndarray, learning_rate : float, frozen_boxes : List[List[int]]) -> None:
+
+        # Average was never initialised, classify the frame to initialise it.
+        if self.average is None or self.average.shape != frame.shape:
+            self.apply(frame, 0)
+
+        # Mask out the frozen regions, the average is only updated where the mask is set.
+        learning_mask = np.full(frame.shape, 255, dtype=np.uint8)
+
+        for x, y, w, h in frozen_boxes:
+            learning_mask[y:y + h, x:x + w] = 0
+
+        cv2.accumulateWeighted(frame, self.average, learning_rate, learning_mask)
+
+
+    def background_image(self) -> Optional[np.ndarray]:
+
+        return None if self.average is None else cv2.convertScaleAbs(self.average)
+
+
+class LearningSchedule(object):
+
+    '''
+    Decides how fast the background model learns on each frame. A static scene is only learnt every few frames, regions covered by active
+    tracks are frozen so that stationary intruders stay in the foreground, and learning speeds up for a while after the whole scene changes.
+    A global change, such as lights switching on or cloud passing, is spotted from the share of the frame in the foreground or a jump in
+    the frames mean luminance. Detection is suppressed while the scene is relearnt, so the change does not flood the pipeline with blobs.
+    '''
+
+    def __init__(self, STRIDE : int = 5, SCENE_CHANGE_RATIO : float = 0.5, BOOST_LEARNING_RATE : float = 0.2, BOOST_FRAMES : int = 30, LUMINANCE_JUMP : float = 20, LUMINANCE_SMOOTHING : float = 0.1) -> None:
+
+        # Frames between background updates.
+        self.STRIDE = STRIDE
+
+        # Fraction of the frame in the foreground that counts as a global scene change.
+        self.SCENE_CHANGE_RATIO = SCENE_CHANGE_RATIO
+
+        # Learning rate used to relearn the scene after a global change.
+        self.BOOST_LEARNING_RATE = BOOST_LEARNING_RATE
+
+        # Number of frames learnt at the boosted rate after a global change.
+        self.BOOST_FRAMES = BOOST_FRAMES
+
+        # Change in mean luminance from its recent average, out of 255, that counts as a global scene change.
+        self.LUMINANCE_JUMP = LUMINANCE_JUMP
+
+        # Weight given to each frame in the recent average luminance.
+        self.LUMINANCE_SMOOTHING = LUMINANCE_SMOOTHING
+
+        # Recent average luminance of the scene, None until the first frame.
+        self.average_luminance : Optional[float] = None
+
+        # Frame count and time the current global change started, None while the scene is stable.
+        self.change_started : Optional[Tuple[int, float]] = None
+
+        # Frames seen since the schedule started.
+        self.frame_count : int = 0
+
+        # Frames left to learn at the boosted rate.
+        self.boost_remaining : int = 0
+
+        # Bounding boxes of the active tracks, excluded from learning. [x, y, w, h]
+        self.frozen_boxes : List[List[int]] = []
+
+
+    def next_update(self, default_learning_rate : float) -> Tuple[float, List[List[int]]]:
+
+        '''
+        Learning rate and frozen regions for the next frame. Updates made every STRIDE frames are scaled up so the model adapts at the same overall speed.
+
+        :param: default_learning_rate - Rate the model is learnt at when updated every frame.
+        :return: learning_rate - Learning rate, 0 when the model should not be updated.
+        :return: frozen_boxes - Bounding boxes excluded from learning.
+        '''
+
+        self.frame_count += 1
+
+        # Relearning after a global scene change, update every frame everywhere.
+        if self.boost_remaining > 0:
+            self.boost_remaining -= 1
+            return self.BOOST_LEARNING_RATE, []
+
+        # Skip updates between strides.
+        if self.frame_count % max(self.STRIDE, 1) != 0:
+            return 0, []
+
+        return min(default_learning_rate * self.STRIDE, 1.0), self.frozen_boxes
+
+
+    def observe(self, foreground_mask : np.ndarray, frame : Optional[np.ndarray] = None) -> bool:
+
+        '''
+        Check the foreground mask and frame luminance for a global scene change, boosting learning if one has happened.
+
+        :param: foreground_mask - Mask returned by the background model.
+        :param: frame - Preprocessed grayscale frame the mask was taken from, used to watch for luminance jumps.
+        :return: bool - True if a global scene change started on this frame.
+        '''
+
+        foreground_ratio = cv2.countNonZero(foreground_mask) / foreground_mask.size
+
+        # Jump in mean luminance against its recent average, which keeps following the scene through the change.
+        luminance_jump = 0.0
+
+        if frame is not None:
+
+            luminance = cv2.mean(frame)[0]
+
+            if self.average_luminance is not None:
+                luminance_jump = abs(luminance - self.average_luminance)
+                self.average_luminance += self.LUMINANCE_SMOOTHING * (luminance - self.average_luminance)
+            else:
+                self.average_luminance = luminance
+
+        # The first mask is taken against a model that has learnt nothing yet and reads as all foreground, watch from the next frame.
+        if self.frame_count <= 1:
+            return False
+
+        # Most of the frame changed at once and no boost is running, relearn the scene quickly.
+        if (foreground_ratio > self.SCENE_CHANGE_RATIO or luminance_jump > self.LUMINANCE_JUMP) and self.boost_remaining == 0:
+
+            if self.change_started is None:
+                self.change_started = self.frame_count, time.monotonic()
+                print(f'Global scene change, {100 * foreground_ratio:.0f}% foreground and luminance jumped {luminance_jump:.0f}, suppressing detection while the background is relearnt.', file=sys.stderr)
+
+            self.boost()
+            return True
+
+        # Boost ran out without the change carrying on, the scene has settled.
+        if self.change_started is not None and self.boost_remaining == 0:
+            started_frame, started_time = self.change_started
+            print(f'Scene settled after {time.monotonic() - started_time:.1f}s, detection suppressed for {self.frame_count - started_frame} frames.', file=sys.stderr)
+            self.change_started = None
+
+        return False
+
+
+    @property
+    def scene_changing(self) -> bool:
+
+        '''
+        Whether a global scene change is being relearnt, blobs found meanwhile are the change rather than objects.
+
+        :return: bool - True while detection should be suppressed.
+        '''
+
+        return self.change_started is not None
+
+
+    def boost(self) -> None:
+
+        '''
+        Start learning at the boosted rate.
+        '''
+
+        self.boost_remaining = self.BOOST_FRAMES
+
+
+# Background models selectable from the settings, keyed by the value stored.
+BACKGROUND_ENGINES = {
+    0 : MOG2BackgroundModel,
+    1 : KNNBackgroundModel,
+    2 : RunningAverageBackgroundModel,
+}
@@ -0,0 +1,298 @@
+from typing import Any, List, Dict, Iterator, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
+
+from ObjectTracking import ObjectTracking
+from ObjectDetection import ObjectDetection
+from Zones import ZoneMonitor
+from Camera import Camera
+
+import argparse, csv, json, sys, time, cv2
+
+
+class BatchAnalysis(object):
+
+    '''
+    Headless analysis of recorded footage. Runs the detection and tracking pipeline over video files as fast as the device allows, without the
+    Flask application or real-time pacing, and writes the detections, track events and capture events found to JSON Lines or CSV.
+    '''
+
+    # Columns written when the output format is CSV.
+    CSV_COLUMNS = ['type', 'video', 'chunk', 'frame', 'time', 'id', 'x', 'y', 'w', 'h', 'threat_level', 'motion', 'event']
+
+    def __init__(self, settings : Dict[str, int] = None, THREAT_LEVEL : int = 3, CHUNK_SECONDS : float = 0, WARMUP_SECONDS : float = 5, WORKERS : int = 1, zones : Optional[Dict[str, Any]] = None) -> None:
+
+        # Settings overriding the cameras defaults.
+        self.settings = settings or {}
+
+        # Threat level required to record a capture event.
+        self.THREAT_LEVEL = THREAT_LEVEL
+
+        # Length of the chunks footage is split into, 0 to analyse each file in one piece.
+        self.CHUNK_SECONDS = CHUNK_SECONDS
+
+        # Footage replayed before each chunk so the background model has learnt the scene, excluded from the output.
+        self.WARMUP_SECONDS = WARMUP_SECONDS
+
+        # Number of processes chunks are spread across.
+        self.WORKERS = WORKERS
+
+        # Tripwires and zones the tracks are tested against, as accepted by ZoneMonitor.configure. Validated now rather than in every worker.
+        self.zones = zones
+
+        if zones is not None:
+            ZoneMonitor.build_layout(zones)
+
+
+    def plan_chunks(self, video_path : str) -> List[Tuple[str, int, int, int, float]]:
+
+        '''
+        Split a video into chunks of frames.
+
+        :param: video_path - Path to the footage.
+        :return: chunks - List of (video_path, chunk_index, start_frame, end_frame, fps).
+        '''
+
+        video = cv2.VideoCapture(video_path)
+
+        if not video.isOpened():
+            raise IOError(f'Could not open {video_path}!')
+
+        total_frames = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = video.get(cv2.CAP_PROP_FPS) or 30.0
+
+        video.release()
+
+        # Frame count unknown or chunking disabled, analyse the whole file at once.
+        if total_frames <= 0 or self.CHUNK_SECONDS <= 0:
+            return [(video_path, 0, 0, total_frames if total_frames > 0 else sys.maxsize, fps)]
+
+        chunk_frames = max(int(self.CHUNK_SECONDS * fps), 1)
+
+        return [
+            (video_path, chunk_index, start_frame, min(start_frame + chunk_frames, total_frames), fps)
+            for chunk_index, start_frame in enumerate(range(0, total_frames, chunk_frames))
+        ]
+
+
+    def analyse_chunk(self, chunk : Tuple[str, int, int, int, float]) -> List[dict]:
+
+        '''
+        Run the pipeline over one chunk of a video, replaying the warm-up frames before it first.
+
+        :param: chunk - (video_path, chunk_index, start_frame, end_frame, fps) as planned by plan_chunks.
+        :return: records - Detection, track and event records found within the chunk.
+        '''
+
+        video_path, chunk_index, start_frame, end_frame, fps = chunk
+
+        camera = Camera(video_path)
+        camera.settings_store.update(self.settings)
+
+        object_tracking = ObjectTracking()
+        object_detection = ObjectDetection(object_tracking = object_tracking)
+
+        # Raise tripwire and zone events, the tracker keeps them in memory only.
+        if self.zones is not None:
+            object_tracking.zones.configure(self.zones)
+
+        # Build the background model and threat policy selected in the settings.
+        camera.settings_store.subscribe(object_detection.apply_settings, ObjectDetection.SETTINGS_KEYS)
+        camera.settings_store.subscribe(object_tracking.apply_settings, ObjectTracking.SETTINGS_KEYS)
+
+        # Start early so the background model and tracker are warm when the chunk begins.
+        warmup_start = max(start_frame - int(self.WARMUP_SECONDS * fps), 0)
+        camera.video_stream.set(cv2.CAP_PROP_POS_FRAMES, warmup_start)
+
+        # Seed the background with the first frame so it is not measured against an empty model and read as all foreground.
+        try:
+            object_detection.background_model.seed(object_detection.preprocess_frame(camera.retrieve_frame_CV2()))
+            camera.video_stream.set(cv2.CAP_PROP_POS_FRAMES, warmup_start)
+        except IOError:
+            pass
+
+        records = []
+        previous_frame = None
+
+        for frame_index in range(warmup_start, end_frame):
+
+            try:
+                raw_frame = camera.retrieve_frame_CV2()
+            except IOError:
+                # End of the footage.
+                break
+
+            if previous_frame is None:
+                previous_frame = raw_frame
+
+            # Footage time drives the tracker rather than the wall clock.
+            timestamp = frame_index / fps
+
+            # Settings are applied by the pipeline before each frame.
+            object_detection.apply_pending_settings()
+            object_tracking.apply_pending_settings()
+
+            motion_detected = object_detection.motion_detection(previous_frame, raw_frame, camera)
+
+            _, detections = object_detection.register_detections(raw_frame, camera)
+
+            updated_detections = object_tracking.update_detections_V3(detections, timestamp)
+
+            object_detection.learning_schedule.frozen_boxes = [detection[:4] for detection in updated_detections]
+
+            previous_frame = raw_frame
+
+            # Warm-up frames only prime the models.
+            if frame_index < start_frame:
+                continue
+
+            # Lifecycle, threat and zone events the tracker raised on this frame.
+            for event_type, detection_ID, threat_level, (x, y, w, h) in object_tracking.track_events:
+
+                records.append({
+                    'type' : 'track',
+                    'video' : video_path,
+                    'chunk' : chunk_index,
+                    'frame' : frame_index,
+                    'time' : round(timestamp, 3),
+                    'id' : detection_ID,
+                    'x' : int(x), 'y' : int(y), 'w' : int(w), 'h' : int(h),
+                    'threat_level' : threat_level,
+                    'event' : event_type,
+                })
+
+            for x, y, w, h, detection_ID, threat_level in updated_detections:
+
+                record = {
+                    'type' : 'detection',
+                    'video' : video_path,
+                    'chunk' : chunk_index,
+                    'frame' : frame_index,
+                    'time' : round(timestamp, 3),
+                    'id' : detection_ID,
+                    'x' : x, 'y' : y, 'w' : w, 'h' : h,
+                    'threat_level' : threat_level,
+                    'motion' : bool(motion_detected),
+                }
+
+                records.append(record)
+
+                # Same condition the live stream saves captures on.
+                if motion_detected == True and threat_level == self.THREAT_LEVEL:
+                    records.append(dict(record, type='event'))
+
+        camera.video_stream.release()
+
+        return records
+
+
+    def analyse(self, video_paths : List[str]) -> Iterator[dict]:
+
+        '''
+        Analyse every video, spreading chunks across the process pool and yielding their records in order.
+
+        :param: video_paths - Paths to the footage.
+        :return: Iterator of detection, track and event records.
+        '''
+
+        chunks = [chunk for video_path in video_paths for chunk in self.plan_chunks(video_path)]
+
+        if self.WORKERS <= 1:
+            for chunk in chunks:
+                yield from self.analyse_chunk(chunk)
+            return
+
+        with ProcessPoolExecutor(max_workers=self.WORKERS) as pool:
+            for records in pool.map(self.analyse_chunk, chunks):
+                yield from records
+
+
+    def write(self, records : Iterator[dict], output, output_format : str = 'jsonl') -> int:
+
+        '''
+        Write records to the output as JSON Lines or CSV.
+
+        :param: records - Records to write.
+        :param: output - Open text file to write to.
+        :param: output_format - 'jsonl' or 'csv'.
+        :return: int - Number of records written.
+        '''
+
+        written = 0
+
+        if output_format == 'csv':
+            writer = csv.DictWriter(output, fieldnames=self.CSV_COLUMNS)
+            writer.writeheader()
+            for record in records:
+                writer.writerow(record)
+                written += 1
+        else:
+            for record in records:
+                output.write(json.dumps(record) + '\n')
+                written += 1
+
+        return written
+
+
+    @staticmethod
+    def parse_settings(assignments : List[str]) -> Dict[str, int]:
+
+        '''
+        Parse setting overrides given on the command line as name=value.
+
+        :param: assignments - List of name=value strings.
+        :return: settings - Dictionary of setting overrides.
+        '''
+
+        settings = {}
+
+        for assignment in assignments:
+            name, _, value = assignment.partition('=')
+            settings[name] = int(value)
+
+        return settings
+
+
+if __name__ == '__main__':
+
+    '''
+    Main method. Analyse recorded footage from the command line.
+    '''
+
+    parser = argparse.ArgumentParser(description='Run detection and tracking over recorded footage.')
+    parser.add_argument('videos', nargs='+', help='Paths to the recorded footage.')
+    parser.add_argument('--output', default='-', help='File to write records to, - for stdout.')
+    parser.add_argument('--format', choices=['jsonl', 'csv'], default='jsonl', help='Output format.')
+    parser.add_argument('--chunk-seconds', type=float, default=0, help='Split footage into chunks of this length, 0 to disable.')
+    parser.add_argument('--warmup-seconds', type=float, default=5, help='Footage replayed before each chunk to warm up the background model.')
+    parser.add_argument('--workers', type=int, default=1, help='Number of processes analysing chunks.')
+    parser.add_argument('--threat-level', type=int, default=3, help='Threat level recorded as a capture event.')
+    parser.add_argument('--set', action='append', default=[], metavar='NAME=VALUE', help='Override a camera setting, e.g. --set threshold=2000.')
+    parser.add_argument('--zones', help='Tripwires and zones JSON file, as written by the application, to raise zone events.')
+    arguments = parser.parse_args()
+
+    zones = None
+
+    if arguments.zones is not None:
+        with open(arguments.zones) as zones_file:
+            zones = json.load(zones_file)
+
+    batch_analysis = BatchAnalysis(
+        BatchAnalysis.parse_settings(arguments.set),
+        arguments.threat_level,
+        arguments.chunk_seconds,
+        arguments.warmup_seconds,
+        arguments.workers,
+        zones,
+    )
+
+    start_time = time.perf_counter()
+
+    output = sys.stdout if arguments.output == '-' else open(arguments.output, 'w', newline='')
+
+    try:
+        written = batch_analysis.write(batch_analysis.analyse(arguments.videos), output, arguments.format)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    print(f'Wrote {written} records in {time.perf_counter() - start_time:.1f}s.', file=sys.stderr)
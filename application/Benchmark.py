@@ -0,0 +1,215 @@
+from typing import List, Dict
+from ObjectDetection import ObjectDetection
+from BackgroundModels import BACKGROUND_ENGINES
+from Settings import SettingsStore
+from Camera import Camera
+
+import argparse, time, cv2, numpy as np
+
+
+class Benchmark(object):
+
+    '''
+    Benchmark harness replaying recorded footage through the computer vision pipeline, measuring the cost of interchangeable stages and
+    validating that they produce equivalent output.
+    '''
+
+    def __init__(self, video_path : str, MAXIMUM_FRAMES : int = 500) -> None:
+
+        # Path to the recorded footage to replay.
+        self.video_path = video_path
+
+        # Maximum number of frames read from the footage.
+        self.MAXIMUM_FRAMES = MAXIMUM_FRAMES
+
+        # Detection pipeline under test.
+        self.object_detection = ObjectDetection()
+
+        # Settings the pipeline runs with, the cameras defaults without opening the capture device.
+        self.settings = SettingsStore(Camera.DEFAULT_SETTINGS, Camera.SETTINGS_LIMITS).snapshot
+
+
+    def load_frames(self) -> List[np.ndarray]:
+
+        '''
+        Read the footage into memory so that decoding time is excluded from the measurements.
+
+        :return: frames - List of frames read from the footage.
+        '''
+
+        frames = []
+
+        video = cv2.VideoCapture(self.video_path)
+
+        while len(frames) < self.MAXIMUM_FRAMES:
+
+            ret, frame = video.read()
+
+            # End of the footage.
+            if not ret:
+                break
+
+            frames.append(frame)
+
+        video.release()
+
+        if not frames:
+            raise IOError(f'Could not read frames from {self.video_path}!')
+
+        return frames
+
+
+    def build_masks(self, frames : List[np.ndarray]) -> List[np.ndarray]:
+
+        '''
+        Run the frames through background subtraction and thresholding, producing the masks blobs are extracted from.
+
+        :param: frames - Frames to process.
+        :return: masks - Binary foreground mask for each frame.
+        '''
+
+        masks = []
+
+        for frame in frames:
+
+            processed_frame = self.object_detection.process_frames(frame)
+
+            _, masked_frame = cv2.threshold(processed_frame, self.settings['range'], 255, cv2.THRESH_BINARY)
+
+            masks.append(masked_frame)
+
+        return masks
+
+
+    def compare_background_engines(self, frames : List[np.ndarray]) -> Dict[str, dict]:
+
+        '''
+        Time every background engine over the same footage and measure the quality of its output. Without labelled footage, quality is reported
+        as the fraction of the frame marked foreground, the detections registered and the overlap of each engines masks with those of MOG2.
+
+        :param: frames - Frames to process.
+        :return: results - Cost and quality measurements per engine.
+        '''
+
+        # Preprocess once so only the background models are timed.
+        preprocessed_frames = [self.object_detection.preprocess_frame(frame) for frame in frames]
+
+        results = {}
+        reference_masks = None
+
+        for engine in BACKGROUND_ENGINES.values():
+
+            background_model = engine()
+
+            start_time = time.perf_counter()
+
+            foreground_masks = [background_model.apply(frame) for frame in preprocessed_frames]
+
+            elapsed_time = time.perf_counter() - start_time
+
+            # Threshold as register_detections does, removing shadows.
+            masks = [cv2.threshold(mask, self.settings['range'], 255, cv2.THRESH_BINARY)[1] > 0 for mask in foreground_masks]
+
+            # First engine, MOG2, is the reference the others are compared to.
+            if reference_masks is None:
+                reference_masks = masks
+
+            # Intersection over union of the foreground with the reference, ignoring frames where both are empty.
+            overlaps = [
+                np.logical_and(mask, reference).sum() / union
+                for mask, reference in zip(masks, reference_masks)
+                for union in [np.logical_or(mask, reference).sum()] if union > 0
+            ]
+
+            detections = sum(
+                len(self.object_detection.extract_contours(mask.astype(np.uint8) * 255, self.settings['threshold'])) for mask in masks
+            )
+
+            results[engine.NAME] = {
+                'ms_per_frame' : 1000 * elapsed_time / len(frames),
+                'foreground_pct' : 100 * float(np.mean([mask.mean() for mask in masks])),
+                'detections' : detections,
+                'iou_vs_mog2' : float(np.mean(overlaps)) if overlaps else 1.0,
+            }
+
+        return results
+
+
+    def compare_extraction_engines(self, masks : List[np.ndarray]) -> Dict[str, dict]:
+
+        '''
+        Time both blob extraction engines over the same masks and validate that they register the same bounding boxes.
+        Both engines measure a blob by the pixels its outer contour encloses, so every frame should match.
+
+        :param: masks - Binary foreground masks to extract blobs from.
+        :return: results - Timings and detection counts per engine, plus the agreement between them.
+        '''
+
+        engines = {
+            'contours' : self.object_detection.extract_contours,
+            'components' : self.object_detection.extract_components,
+        }
+
+        results = {}
+        outputs = {}
+
+        for name, engine in engines.items():
+
+            start_time = time.perf_counter()
+
+            outputs[name] = [engine(mask, self.settings['threshold']) for mask in masks]
+
+            elapsed_time = time.perf_counter() - start_time
+
+            results[name] = {
+                'ms_per_frame' : 1000 * elapsed_time / len(masks),
+                'detections' : sum(len(detections) for detections in outputs[name]),
+            }
+
+        # Frames where both engines registered exactly the same boxes.
+        matching_frames = sum(
+            sorted(map(tuple, contours)) == sorted(map(tuple, components))
+            for contours, components in zip(outputs['contours'], outputs['components'])
+        )
+
+        results['agreement'] = {
+            'matching_frames' : matching_frames,
+            'total_frames' : len(masks),
+        }
+
+        return results
+
+
+    def report(self, title : str, results : Dict[str, dict]) -> None:
+
+        '''
+        Print benchmark results as a readable table.
+
+        :param: title - Name of the benchmark.
+        :param: results - Results keyed by the stage variant measured.
+        '''
+
+        print(f'\n{title}')
+
+        for name, values in results.items():
+            print(f'  {name:<18}' + '  '.join(f'{key}: {value:.2f}' if isinstance(value, float) else f'{key}: {value}' for key, value in values.items()))
+
+
+if __name__ == '__main__':
+
+    '''
+    Main method. Benchmark the pipeline against recorded footage.
+    '''
+
+    parser = argparse.ArgumentParser(description='Benchmark the computer vision pipeline against recorded footage.')
+    parser.add_argument('video', help='Path to the recorded footage.')
+    parser.add_argument('--frames', type=int, default=500, help='Maximum number of frames to replay.')
+    arguments = parser.parse_args()
+
+    benchmark = Benchmark(arguments.video, arguments.frames)
+
+    frames = benchmark.load_frames()
+    masks = benchmark.build_masks(frames)
+
+    benchmark.report('Background model engines', benchmark.compare_background_engines(frames))
+    benchmark.report('Blob extraction engines', benchmark.compare_extraction_engines(masks))
@@ -0,0 +1,123 @@
+from typing import Dict, Optional
+from collections import deque
+import time, cv2, numpy as np
+
+
+class BestShotSelector(object):
+
+    '''
+    Keeps the best frame seen of each threatening track within a window, so that one sharp, close frame is captured per intruder rather than
+    every frame they appear in. Frames are scored by the sharpness of the detection, measured as the variance of the Laplacian, weighted by
+    the area of its bounding box. A tracks best shot is ready once its window closes or the track is deregistered.
+    '''
+
+    def __init__(self, WINDOW_SECONDS : float = 5, MAXIMUM_READY : int = 10) -> None:
+
+        # Seconds a track is watched before its best shot is ready.
+        self.WINDOW_SECONDS = WINDOW_SECONDS
+
+        # Best shot of each track within its current window. {track_id : shot}
+        self.candidates : Dict[int, dict] = {}
+
+        # Shots whose window has closed, waiting to be written. Oldest shots are dropped if writing falls behind.
+        self.ready_shots : deque = deque(maxlen=MAXIMUM_READY)
+
+
+    def score(self, frame : np.ndarray, box) -> float:
+
+        '''
+        Score a detection by its sharpness and size. Blurred detections have few strong edges, giving a low Laplacian variance.
+
+        :param: frame - Unannotated frame the detection was found in.
+        :param: box - Bounding box of the detection. [x, y, w, h]
+        :return: float - Sharpness multiplied by the box area, 0 if the box lies outside the frame.
+        '''
+
+        x, y, w, h = box
+        height, width = frame.shape[:2]
+
+        # Clip the box to the frame, predicted boxes may overhang the edges.
+        x1, y1 = max(x, 0), max(y, 0)
+        x2, y2 = min(x + w, width), min(y + h, height)
+
+        if x2 - x1 < 3 or y2 - y1 < 3:
+            return 0.0
+
+        crop = frame[y1:y2, x1:x2]
+        grayscale_crop = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+
+        sharpness = cv2.Laplacian(grayscale_crop, cv2.CV_64F).var()
+
+        return float(sharpness * (x2 - x1) * (y2 - y1))
+
+
+    def consider(self, raw_frame : np.ndarray, annotated_frame : np.ndarray, detection : dict, timestamp : Optional[float] = None) -> None:
+
+        '''
+        Offer a frame of a threatening track, keeping it if it beats the tracks best shot in the current window. Frames are kept by reference,
+        the pipeline allocates new frames every iteration.
+
+        :param: raw_frame - Unannotated frame, scored and used for duplicate checks.
+        :param: annotated_frame - Frame with overlays drawn, written as the capture.
+        :param: detection - Detection metadata {id, box, predicted_box, threat_level}.
+        :param: timestamp - Time of the frame, defaults to now.
+        '''
+
+        timestamp = time.time() if timestamp is None else timestamp
+
+        score = self.score(raw_frame, detection['box'])
+
+        candidate = self.candidates.get(detection['id'])
+
+        # First frame of a new window.
+        if candidate is None:
+            self.candidates[detection['id']] = {
+                'score' : score,
+                'raw_frame' : raw_frame,
+                'annotated_frame' : annotated_frame,
+                'detection' : detection,
+                'window_start' : timestamp,
+            }
+
+        # Better than the best shot so far.
+        elif score > candidate['score']:
+            candidate.update(score=score, raw_frame=raw_frame, annotated_frame=annotated_frame, detection=detection)
+
+
+    def close_expired(self, timestamp : Optional[float] = None) -> None:
+
+        '''
+        Move the best shots of windows that have closed to the ready queue.
+
+        :param: timestamp - Current time, defaults to now.
+        '''
+
+        timestamp = time.time() if timestamp is None else timestamp
+
+        for track_id in [track_id for track_id, candidate in self.candidates.items() if timestamp - candidate['window_start'] >= self.WINDOW_SECONDS]:
+            self.close_track(track_id)
+
+
+    def close_track(self, track_id : int) -> None:
+
+        '''
+        Close a tracks window early, moving its best shot to the ready queue, e.g. when the track is deregistered.
+
+        :param: track_id - ID of the detection.
+        '''
+
+        candidate = self.candidates.pop(track_id, None)
+
+        if candidate is not None:
+            self.ready_shots.append(candidate)
+
+
+    def next_shot(self) -> Optional[dict]:
+
+        '''
+        Take the oldest shot ready to be written.
+
+        :return: dict - Shot {score, raw_frame, annotated_frame, detection, window_start}, or None if none are ready.
+        '''
+
+        return self.ready_shots.popleft() if self.ready_shots else None
@@ -0,0 +1,164 @@
+from typing import Dict, Tuple, Callable
+from Settings import SettingsStore
+from collections import deque
+import math, threading, time, numpy as np
+
+
+class BitrateController(object):
+
+    '''
+    Keeps each stream variant under a bandwidth budget. The size of every encoded frame is measured between adjustments, JPEG quality is
+    lowered while the variant runs over budget and raised again once there is headroom. When quality bottoms out the variants frame rate is
+    lowered instead, by spacing out the frames sent to its clients.
+    '''
+
+    def __init__(self, encoder : Callable[[np.ndarray, int], bytes], settings_store : SettingsStore, WINDOW_SECONDS : float = 2.0, ADJUST_INTERVAL : float = 0.5, MINIMUM_QUALITY : int = 20, QUALITY_STEP : int = 5, HEADROOM : float = 0.8) -> None:
+
+        # Function encoding a frame at a given JPEG quality.
+        self.encoder = encoder
+
+        # Settings holding the budget (bandwidth_budget, kbit/s) and highest quality (jpeg_quality).
+        self.settings_store = settings_store
+
+        # Longest span of encoded frames the bitrate is measured over.
+        self.WINDOW_SECONDS = WINDOW_SECONDS
+
+        # Seconds between adjustments, giving each change time to show in the measurements.
+        self.ADJUST_INTERVAL = ADJUST_INTERVAL
+
+        # Lowest JPEG quality used before the frame rate is lowered instead.
+        self.MINIMUM_QUALITY = MINIMUM_QUALITY
+
+        # Quality lowered by per adjustment, it is raised by half as much to avoid oscillating.
+        self.QUALITY_STEP = QUALITY_STEP
+
+        # Fraction of the budget the bitrate must fall below before quality or frame rate is raised.
+        self.HEADROOM = HEADROOM
+
+        # Control state of each variant, keyed by layer and quality.
+        self.variants : Dict[Tuple[str, str], dict] = {}
+
+        # Lock guarding the variant state, frames are encoded from many client threads.
+        self.lock = threading.Lock()
+
+
+    def encode(self, frame : np.ndarray, variant : Tuple[str, str]) -> bytes:
+
+        '''
+        Encode a frame of a variant at its current quality, then measure the result and adjust.
+
+        :param: frame - Frame to encode.
+        :param: variant - (layer, quality) of the stream the frame belongs to.
+        :return: bytes - Encoded frame.
+        '''
+
+        # Read the settings once, the frame is encoded and measured against the same snapshot.
+        settings = self.settings_store.snapshot
+
+        with self.lock:
+            state = self.variants.setdefault(variant, {
+                'quality' : settings['jpeg_quality'],
+                'frame_interval' : 0.0,
+                'samples' : deque(),
+                'adjusted_at' : time.monotonic(),
+                'kbps' : 0.0,
+            })
+            jpeg_quality = min(state['quality'], settings['jpeg_quality'])
+
+        encoded_frame = self.encoder(frame, jpeg_quality)
+
+        with self.lock:
+            self.adjust(state, len(encoded_frame), time.monotonic(), settings['bandwidth_budget'], settings['jpeg_quality'])
+
+        return encoded_frame
+
+
+    def adjust(self, state : dict, frame_size : int, now : float, budget : int, maximum_quality : int) -> None:
+
+        '''
+        Record the size of a frame and adjust the variants quality and frame interval towards the budget.
+
+        :param: state - Control state of the variant.
+        :param: frame_size - Size of the encoded frame in bytes.
+        :param: now - Current monotonic time.
+        :param: budget - Bandwidth budget in kbit/s, 0 for unlimited.
+        :param: maximum_quality - Highest JPEG quality allowed.
+        '''
+
+        # No budget, stream at full quality and frame rate.
+        if budget <= 0:
+            state.update(quality=maximum_quality, frame_interval=0.0)
+            return
+
+        samples = state['samples']
+        samples.append((now, frame_size))
+
+        # Drop frames older than the window.
+        while now - samples[0][0] > self.WINDOW_SECONDS:
+            samples.popleft()
+
+        # Wait for enough frames encoded since the last adjustment to measure its effect.
+        if now - state['adjusted_at'] < self.ADJUST_INTERVAL or len(samples) < 2:
+            return
+
+        state['adjusted_at'] = now
+
+        # Bitrate over the frames in the window, and the average frame size in kbit.
+        window_kbits = 8 * sum(size for _, size in samples) / 1000
+        state['kbps'] = window_kbits / max(now - samples[0][0], self.ADJUST_INTERVAL)
+        frame_kbits = window_kbits / len(samples)
+
+        # Measure the next adjustment from frames encoded with the new settings only.
+        samples.clear()
+
+        if state['kbps'] > budget:
+
+            # Trade quality first, in bigger steps the further over budget, then frame rate, spacing frames so their average size fits the budget.
+            if state['quality'] > self.MINIMUM_QUALITY:
+                state['quality'] = max(state['quality'] - self.QUALITY_STEP * min(math.ceil(state['kbps'] / budget), 4), self.MINIMUM_QUALITY)
+            else:
+                state['frame_interval'] = frame_kbits / budget
+
+        elif state['kbps'] < budget * self.HEADROOM:
+
+            # Restore frame rate first, then quality.
+            if state['frame_interval'] > 0:
+                state['frame_interval'] = state['frame_interval'] * 0.8 if state['frame_interval'] > 0.01 else 0.0
+            elif state['quality'] < maximum_quality:
+                state['quality'] = min(state['quality'] + max(self.QUALITY_STEP // 2, 1), maximum_quality)
+
+        # Highest quality lowered in the settings.
+        state['quality'] = min(state['quality'], maximum_quality)
+
+
+    def frame_interval(self, variant : Tuple[str, str]) -> float:
+
+        '''
+        Minimum seconds between frames sent to clients of a variant, 0 while quality alone keeps it within budget.
+
+        :param: variant - (layer, quality) of the stream.
+        :return: float - Seconds between frames.
+        '''
+
+        state = self.variants.get(variant)
+
+        return 0.0 if state is None else state['frame_interval']
+
+
+    def stats(self) -> Dict[str, dict]:
+
+        '''
+        Report the measured bitrate and current settings of every variant.
+
+        :return: dict - {layer/quality : {kbps, quality, fps_limit}}.
+        '''
+
+        with self.lock:
+            return {
+                f'{layer}/{quality}' : {
+                    'kbps' : round(state['kbps'], 1),
+                    'quality' : state['quality'],
+                    'fps_limit' : round(1 / state['frame_interval'], 1) if state['frame_interval'] > 0 else None,
+                }
+                for (layer, quality), state in self.variants.items()
+            }
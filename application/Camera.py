@@ -1,3 +1,5 @@
+from typing import Any, Mapping, Optional
+from Settings import SettingsStore
 import cv2, numpy as np, time
  
 class Camera(object):
@@ -6,26 +8,104 @@ class Camera(object):
     The Camera class handles functionality associated with accessing the devices onboard camera, processing the input taken. 
     '''
 
-    def __init__(self) -> None:
+    # Default value of every setting. 
+    DEFAULT_SETTINGS = {
+        # Camera on/off
+        'camera_toggle' : True,
+        # Time to re-initialise motion detection functionality.
+        'sleep' : 5, 
+        # Threshold setting for motion detection.
+        'threshold' : 1500, 
+        # Sensitivity setting for motion detection.
+        'sensitivity' : 1800,
+        #
+        'range' : 100,
+        # Stream framerate setting. 
+        'fps' : 60,
+        # Width in pixels of the low resolution substream.
+        'substream_width' : 320,
+        # Highest JPEG quality streamed, lowered automatically to stay within the bandwidth budget.
+        'jpeg_quality' : 80,
+        # Optimised JPEG Huffman tables on/off.
+        'jpeg_optimize_toggle' : False,
+        # Progressive JPEG encoding on/off.
+        'jpeg_progressive_toggle' : False,
+        # Bandwidth budget per stream in kbit/s, 0 for unlimited.
+        'bandwidth_budget' : 0,
+        # Blob extraction engine, 0 for contours, 1 for connected components.
+        'extraction_engine' : 0,
+        # Background model engine, 0 for MOG2, 1 for KNN, 2 for running average.
+        'background_engine' : 0,
+        # Frames between background model updates while the scene is static.
+        'background_stride' : 5,
+        # Frames between full detections, predicted positions are streamed in between.
+        'detection_stride' : 1,
+        # Prediction confidence percentage below which detection is forced.
+        'minimum_confidence' : 50,
+        # Merge nearby detections into a single box on/off.
+        'merge_toggle' : True,
+        # Largest gap in pixels between detections that are merged.
+        'merge_distance' : 25,
+        # Seconds the best frame of a detection is chosen over before it is captured.
+        'best_shot_window' : 5,
+        # Seconds between captures of the same detection.
+        'capture_interval' : 10,
+        # Hash bits that must differ from the last capture for a frame to be written.
+        'duplicate_distance' : 6,
+        # What triggers captures, 0 for detections at the capture threat level, 1 for tripwire and zone events.
+        'capture_trigger' : 0,
+        # Seconds a detection must stay in view to rise each threat level, 0 to ignore.
+        'escalation_time' : 10,
+        # Speed in pixels per second above which a detection rises a threat level, 0 to ignore.
+        'escalation_speed' : 0,
+        # Seconds between each threat level a detection drops once nothing supports it.
+        'decay_time' : 5,
+    }
+
+    # Inclusive range each numeric setting is validated against.
+    SETTINGS_LIMITS = {
+        'sleep' : (0, 600),
+        'threshold' : (0, 100000),
+        'sensitivity' : (0, 100000),
+        'range' : (0, 254),
+        'fps' : (1, 120),
+        'substream_width' : (80, 1920),
+        'jpeg_quality' : (1, 100),
+        'bandwidth_budget' : (0, 100000),
+        'extraction_engine' : (0, 1),
+        'background_engine' : (0, 2),
+        'background_stride' : (1, 100),
+        'detection_stride' : (1, 100),
+        'minimum_confidence' : (0, 100),
+        'merge_distance' : (0, 1000),
+        'best_shot_window' : (1, 300),
+        'capture_interval' : (0, 3600),
+        'duplicate_distance' : (0, 64),
+        'capture_trigger' : (0, 1),
+        'escalation_time' : (0, 600),
+        'escalation_speed' : (0, 5000),
+        'decay_time' : (0, 600),
+    }
+
+    def __init__(self, SOURCE = 0, SETTINGS_PATH : Optional[str] = None) -> None:
+
+        # Store to access, update and persist the cameras settings, SETTINGS_PATH None keeps them in memory.
+        self.settings_store = SettingsStore(self.DEFAULT_SETTINGS, self.SETTINGS_LIMITS, SETTINGS_PATH)
+
+        # Access the onboard camera using OpenCV, 0 represents camera, 1 for video input, a path for recorded footage. 
+        self.video_stream = cv2.VideoCapture(SOURCE)
+
+
+    @property
+    def settings(self) -> Mapping[str, Any]:
 
-        # Dictionary to store, access and retrieve the cameras settings. 
-        self.settings = {
-            # Camera on/off
-            'camera_toggle' : True,
-            # Time to re-initialise motion detection functionality.
-            'sleep' : 5, 
-            # Threshold setting for motion detection.
-            'threshold' : 1500, 
-            # Sensitivity setting for motion detection.
-            'sensitivity' : 1800,
-            #
-            'range' : 100,
-            # Stream framerate setting. 
-            'fps' : 60,
-        }
+        '''
+        Current settings snapshot. Read it once and keep it for the whole frame, updates replace the snapshot rather than changing it.
+
+        :return: Mapping - Immutable settings.
+        '''
 
-        # Access the onboard camera using OpenCV, 0 represents camera, 1 for video input. 
-        self.video_stream = cv2.VideoCapture(0)
+        return self.settings_store.snapshot
 
 
     ''' Functions concerned with the cameras functionality. '''
@@ -72,17 +152,27 @@ class Camera(object):
         return clock_overlay
         
 
-    def encode_frame(self, frame : np.ndarray) -> bytes:
+    def encode_frame(self, frame : np.ndarray, quality : Optional[int] = None) -> bytes:
 
         '''
         Takes frame, converts it to bytes for HTTP upload.
 
         :param frame: Frame to be converted.
+        :param quality: JPEG quality from 0 to 100, defaults to the jpeg_quality setting.
         :return bytes: Frame encoded as bytes.
         '''
 
+        settings = self.settings
+
+        # JPEG parameters, optimised Huffman tables shave a few percent off each frame and progressive frames render coarse to fine.
+        parameters = [
+            cv2.IMWRITE_JPEG_QUALITY, settings['jpeg_quality'] if quality is None else int(quality),
+            cv2.IMWRITE_JPEG_OPTIMIZE, int(settings['jpeg_optimize_toggle']),
+            cv2.IMWRITE_JPEG_PROGRESSIVE, int(settings['jpeg_progressive_toggle']),
+        ]
+
         # Encode the frames and check the operation has been succesful with return bool.
-        ret, jpeg = cv2.imencode('.jpg', frame)
+        ret, jpeg = cv2.imencode('.jpg', frame, parameters)
 
         # If nothing returned after operation, inform user. 
         if not ret:
@@ -92,6 +182,32 @@ class Camera(object):
         return jpeg.tobytes()
     
 
+    def scale_substream(self, frame : np.ndarray) -> np.ndarray:
+
+        '''
+        Downscale a frame to the substream width, preserving its aspect ratio.
+
+        :param frame: Frame to be downscaled.
+        :return frame: Downscaled frame, or the original if it is already narrower.
+        '''
+
+        # Get dimensions of the parameterised frame.
+        height, width = frame.shape[:2]
+
+        # Target width for the substream.
+        substream_width = self.settings['substream_width']
+
+        # Never upscale, return the frame untouched.
+        if substream_width >= width:
+            return frame
+
+        # Scale height by the same factor as the width.
+        substream_height = int(height * substream_width / width)
+
+        # Area interpolation gives the cleanest result when shrinking.
+        return cv2.resize(frame, (substream_width, substream_height), interpolation=cv2.INTER_AREA)
+    
+
     def retrieve_frame_CV2(self) -> np.ndarray:
 
         '''
@@ -0,0 +1,111 @@
+from typing import Dict, Optional
+import time, cv2, numpy as np
+
+
+class CapturePolicy(object):
+
+    '''
+    Decides which frames are worth writing to local storage. Each track may only be captured once per interval, no two captures are taken
+    within the same second, since filenames only resolve to the second, and frames that look nearly identical to the last capture are skipped
+    by comparing their difference hashes.
+    '''
+
+    def __init__(self, CAPTURE_INTERVAL : float = 10, GLOBAL_INTERVAL : float = 1, DUPLICATE_DISTANCE : int = 6, HASH_SIZE : int = 8) -> None:
+
+        # Seconds between captures of the same track.
+        self.CAPTURE_INTERVAL = CAPTURE_INTERVAL
+
+        # Seconds between any two captures, filenames resolve to the second so sooner captures overwrite each other.
+        self.GLOBAL_INTERVAL = GLOBAL_INTERVAL
+
+        # Differing hash bits at or below which a frame counts as a duplicate of the last capture.
+        self.DUPLICATE_DISTANCE = DUPLICATE_DISTANCE
+
+        # Width and height of the hash grid, the hash is HASH_SIZE squared bits long.
+        self.HASH_SIZE = HASH_SIZE
+
+        # Time each track was last captured. {track_id : timestamp}
+        self.track_captures : Dict[Optional[int], float] = {}
+
+        # Time and hash of the last capture taken.
+        self.last_capture_time : float = float('-inf')
+        self.last_capture_hash : Optional[int] = None
+
+        # Frames rejected by each rule.
+        self.rejected : Dict[str, int] = {'rate_limited' : 0, 'duplicate' : 0}
+
+
+    def difference_hash(self, frame : np.ndarray) -> int:
+
+        '''
+        Perceptual hash of a frame. The frame is shrunk to a tiny grayscale grid and every bit records whether a cell is brighter than its right
+        neighbour, so noise and compression barely change the hash while real changes to the scene flip many bits.
+
+        :param: frame - Frame to hash.
+        :return: int - Hash of HASH_SIZE squared bits.
+        '''
+
+        grayscale_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+
+        # One extra column so every cell has a right neighbour to compare with.
+        grid = cv2.resize(grayscale_frame, (self.HASH_SIZE + 1, self.HASH_SIZE), interpolation=cv2.INTER_AREA)
+
+        bits = grid[:, 1:] > grid[:, :-1]
+
+        return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+    def ready(self, timestamp : Optional[float] = None) -> bool:
+
+        '''
+        Check whether enough time has passed since the last capture for another to be written without overwriting it.
+
+        :param: timestamp - Current time, defaults to now.
+        :return: bool - True once the global interval has passed.
+        '''
+
+        return (time.time() if timestamp is None else timestamp) - self.last_capture_time >= self.GLOBAL_INTERVAL
+
+
+    def should_capture(self, frame : np.ndarray, track_id : Optional[int] = None, timestamp : Optional[float] = None) -> bool:
+
+        '''
+        Check a frame against the rate limits and the last capture, recording it as captured if it passes.
+
+        :param: frame - Candidate frame, hashed unannotated so overlays such as the clock do not count as changes.
+        :param: track_id - ID of the detection that triggered the capture, None if unknown.
+        :param: timestamp - Time of the frame, defaults to now.
+        :return: bool - True if the frame should be written.
+        '''
+
+        timestamp = time.time() if timestamp is None else timestamp
+
+        # Too soon after the last capture of anything, or of this track.
+        if (timestamp - self.last_capture_time < self.GLOBAL_INTERVAL or
+            timestamp - self.track_captures.get(track_id, float('-inf')) < self.CAPTURE_INTERVAL):
+            self.rejected['rate_limited'] += 1
+            return False
+
+        frame_hash = self.difference_hash(frame)
+
+        # Scene has barely changed since the last capture.
+        if self.last_capture_hash is not None and bin(frame_hash ^ self.last_capture_hash).count('1') <= self.DUPLICATE_DISTANCE:
+            self.rejected['duplicate'] += 1
+            return False
+
+        self.track_captures[track_id] = timestamp
+        self.last_capture_time = timestamp
+        self.last_capture_hash = frame_hash
+
+        return True
+
+
+    def forget(self, track_id : int) -> None:
+
+        '''
+        Drop the rate limit of a track that has been deregistered.
+
+        :param: track_id - ID of the detection.
+        '''
+
+        self.track_captures.pop(track_id, None)
@@ -0,0 +1,395 @@
+from typing import Callable, List, Dict, Optional, Tuple
+import os, queue, sqlite3, threading, time
+
+
+class CaptureDatabase(object):
+
+    '''
+    Embedded SQLite store for captures and detection events. Writes are queued and committed in batches by a single writer thread so the
+    streaming pipeline never waits on the disk, while reads use their own connections thanks to write-ahead logging.
+    '''
+
+    SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS captures (
+            id INTEGER PRIMARY KEY,
+            filename TEXT NOT NULL UNIQUE,
+            fullpath TEXT NOT NULL,
+            file_ext TEXT NOT NULL,
+            captured_at REAL NOT NULL,
+            capture_date TEXT NOT NULL,
+            capture_time TEXT NOT NULL,
+            track_id INTEGER,
+            threat_level INTEGER,
+            x INTEGER, y INTEGER, w INTEGER, h INTEGER
+        );
+        DROP INDEX IF EXISTS captures_captured_at;
+        CREATE INDEX IF NOT EXISTS captures_cursor ON captures (captured_at, id);
+        CREATE INDEX IF NOT EXISTS captures_track_id ON captures (track_id);
+
+        CREATE TABLE IF NOT EXISTS events (
+            id INTEGER PRIMARY KEY,
+            occurred_at REAL NOT NULL,
+            event_type TEXT NOT NULL,
+            track_id INTEGER,
+            threat_level INTEGER,
+            x INTEGER, y INTEGER, w INTEGER, h INTEGER,
+            capture TEXT
+        );
+        CREATE INDEX IF NOT EXISTS events_occurred_at ON events (occurred_at);
+        CREATE INDEX IF NOT EXISTS events_track_id ON events (track_id);
+
+        CREATE TABLE IF NOT EXISTS metadata (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+    '''
+
+    # Queued in place of SQL to prune the oldest captures on the writer thread, see prune_captures.
+    PRUNE_CAPTURES = '-- prune captures'
+
+    def __init__(self, DATABASE_PATH : str = './captures.db', BATCH_SIZE : int = 100, FLUSH_INTERVAL : float = 1.0) -> None:
+
+        # Location of the database file.
+        self.DATABASE_PATH = DATABASE_PATH
+
+        # Maximum number of writes committed in one transaction.
+        self.BATCH_SIZE = BATCH_SIZE
+
+        # Longest time in seconds a queued write waits before it is committed.
+        self.FLUSH_INTERVAL = FLUSH_INTERVAL
+
+        # Writes waiting to be committed by the writer thread. (sql, parameters)
+        self.write_queue : queue.Queue = queue.Queue()
+
+        # Read connections, one per thread.
+        self.local = threading.local()
+
+        # Cached capture count and latest capture, cleared by the writer thread once captures change.
+        self.summary : Optional[Dict[str, object]] = None
+        self.summary_lock = threading.Lock()
+
+        # Create the schema before any thread touches the database.
+        connection = self.connect()
+        connection.executescript(self.SCHEMA)
+        connection.commit()
+
+        # Start the writer thread.
+        self.writer_thread = threading.Thread(target=self.write_batches, daemon=True)
+        self.writer_thread.start()
+
+
+    def connect(self) -> sqlite3.Connection:
+
+        '''
+        Open a connection in write-ahead logging mode, letting readers and the writer work concurrently.
+
+        :return: connection - New database connection.
+        '''
+
+        connection = sqlite3.connect(self.DATABASE_PATH, timeout=10)
+        connection.row_factory = sqlite3.Row
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+
+        return connection
+
+
+    def reader(self) -> sqlite3.Connection:
+
+        '''
+        Return the calling threads read connection, opening it on first use.
+
+        :return: connection - Database connection owned by the calling thread.
+        '''
+
+        if not hasattr(self.local, 'connection'):
+            self.local.connection = self.connect()
+
+        return self.local.connection
+
+
+    '''
+    Functions concerned with writing to the database.
+    '''
+
+
+    def write_batches(self) -> None:
+
+        '''
+        Writer thread. Collects queued writes and commits them in batches, bounding the number of transactions hitting the storage.
+        '''
+
+        connection = self.connect()
+
+        while True:
+
+            # Wait for the first write of the next batch.
+            batch = [self.write_queue.get()]
+
+            # Gather further writes until the batch is full or the flush interval has passed.
+            deadline = time.monotonic() + self.FLUSH_INTERVAL
+
+            while len(batch) < self.BATCH_SIZE:
+                try:
+                    batch.append(self.write_queue.get(timeout=max(deadline - time.monotonic(), 0)))
+                except queue.Empty:
+                    break
+
+            # Captures pruned within the batch, handed to their callbacks once committed. [(callback, captures)]
+            pruned = []
+
+            try:
+                with connection:
+                    for sql, parameters in batch:
+                        if sql == self.PRUNE_CAPTURES:
+                            pruned.append((parameters[1], self.prune_oldest(connection, parameters[0])))
+                        else:
+                            connection.execute(sql, parameters)
+            except sqlite3.Error as error:
+                print(f'Failed to write {len(batch)} records to the database!\n {error}')
+                pruned = []
+
+            for on_pruned, captures in pruned:
+                if captures:
+                    on_pruned(captures)
+
+            # Invalidate the summary once capture changes are visible to readers.
+            if any('captures' in sql for sql, _ in batch):
+                with self.summary_lock:
+                    self.summary = None
+
+            for _ in batch:
+                self.write_queue.task_done()
+
+
+    @staticmethod
+    def prune_oldest(connection : sqlite3.Connection, file_limit : int) -> List[Dict[str, str]]:
+
+        '''
+        Delete the oldest captures beyond the file limit within the writer threads transaction, which already holds every capture queued
+        before the prune.
+
+        :param: connection - Writer connection.
+        :param: file_limit - Number of captures to keep.
+        :return: List of the captures deleted.
+        '''
+
+        excess = connection.execute('SELECT COUNT(*) FROM captures').fetchone()[0] - file_limit
+
+        if excess <= 0:
+            return []
+
+        captures = [dict(row) for row in connection.execute('SELECT * FROM captures ORDER BY captured_at, id LIMIT ?', (excess,)).fetchall()]
+
+        connection.executemany('DELETE FROM captures WHERE id = ?', [(capture['id'],) for capture in captures])
+
+        return captures
+
+
+    def flush(self) -> None:
+
+        '''
+        Block until every queued write has been committed.
+        '''
+
+        self.write_queue.join()
+
+
+    def record_capture(self, fullpath : str, capture_date : str, capture_time : str, captured_at : Optional[float] = None, track_id : Optional[int] = None, threat_level : Optional[int] = None, box : Optional[Tuple[int, int, int, int]] = None) -> None:
+
+        '''
+        Queue a capture to be stored.
+
+        :param: fullpath - Path to the capture.
+        :param: capture_date - Date the capture was taken, as displayed.
+        :param: capture_time - Time the capture was taken, as displayed.
+        :param: captured_at - Epoch time the capture was taken, defaults to now.
+        :param: track_id - ID of the detection that triggered the capture.
+        :param: threat_level - Threat level of that detection.
+        :param: box - Bounding box of that detection. (x, y, w, h)
+        '''
+
+        filename, file_ext = os.path.splitext(os.path.basename(fullpath))
+        x, y, w, h = box if box is not None else (None, None, None, None)
+
+        self.write_queue.put((
+            'INSERT OR REPLACE INTO captures (filename, fullpath, file_ext, captured_at, capture_date, capture_time, track_id, threat_level, x, y, w, h) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (filename, fullpath, file_ext, time.time() if captured_at is None else captured_at, capture_date, capture_time, track_id, threat_level, x, y, w, h),
+        ))
+
+
+    def record_event(self, event_type : str, track_id : Optional[int] = None, threat_level : Optional[int] = None, box : Optional[Tuple[int, int, int, int]] = None, capture : Optional[str] = None, occurred_at : Optional[float] = None) -> None:
+
+        '''
+        Queue a detection event to be stored.
+
+        :param: event_type - Kind of event, e.g. registered, escalated, deregistered, capture or crossed:<tripwire name>.
+        :param: track_id - ID of the detection concerned.
+        :param: threat_level - Threat level of the detection.
+        :param: box - Bounding box of the detection. (x, y, w, h)
+        :param: capture - Path of the capture taken, if any.
+        :param: occurred_at - Epoch time of the event, defaults to now.
+        '''
+
+        x, y, w, h = box if box is not None else (None, None, None, None)
+
+        self.write_queue.put((
+            'INSERT INTO events (occurred_at, event_type, track_id, threat_level, x, y, w, h, capture) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (time.time() if occurred_at is None else occurred_at, event_type, track_id, threat_level, x, y, w, h, capture),
+        ))
+
+
+    def delete_capture(self, filename : str) -> None:
+
+        '''
+        Remove a capture and wait for the change to be committed, so pages rendered next no longer list it.
+
+        :param: filename - Filename of the capture without its extension.
+        '''
+
+        self.write_queue.put(('DELETE FROM captures WHERE filename = ?', (filename,)))
+        self.flush()
+
+
+    def prune_captures(self, file_limit : int, on_pruned : Callable[[List[Dict[str, str]]], None]) -> None:
+
+        '''
+        Queue removal of the oldest captures beyond the file limit without waiting. The captures are chosen and deleted on the writer thread,
+        after every capture queued before them has been written, and passed to the callback on that thread once the deletion is committed.
+
+        :param: file_limit - Number of captures to keep.
+        :param: on_pruned - Called with the captures deleted, to remove their files.
+        '''
+
+        self.write_queue.put((self.PRUNE_CAPTURES, (file_limit, on_pruned)))
+
+
+    def set_metadata(self, key : str, value : str) -> None:
+
+        '''
+        Queue a metadata value to be stored.
+
+        :param: key - Name of the value.
+        :param: value - Value to store.
+        '''
+
+        self.write_queue.put(('INSERT OR REPLACE INTO metadata (key, value) VALUES (?, ?)', (key, value)))
+
+
+    '''
+    Functions concerned with reading from the database.
+    '''
+
+
+    def get_metadata(self, key : str) -> Optional[str]:
+
+        '''
+        Read a metadata value.
+
+        :param: key - Name of the value.
+        :return: str - Stored value, or None if it has never been set.
+        '''
+
+        row = self.reader().execute('SELECT value FROM metadata WHERE key = ?', (key,)).fetchone()
+
+        return None if row is None else row['value']
+
+
+    def count_captures(self) -> int:
+
+        '''
+        Number of captures stored.
+
+        :return: int - Total captures.
+        '''
+
+        return self.reader().execute('SELECT COUNT(*) FROM captures').fetchone()[0]
+
+
+    def latest_capture(self) -> Optional[Dict[str, str]]:
+
+        '''
+        Most recent capture.
+
+        :return: dict - Capture metadata, or None if nothing has been captured.
+        '''
+
+        row = self.reader().execute('SELECT * FROM captures ORDER BY captured_at DESC, id DESC LIMIT 1').fetchone()
+
+        return None if row is None else dict(row)
+
+
+    def capture_summary(self) -> Dict[str, object]:
+
+        '''
+        Number of captures stored and the most recent capture, computed once and served from memory until captures are written or deleted.
+
+        :return: dict - {total, latest}, latest is None if nothing has been captured.
+        '''
+
+        with self.summary_lock:
+
+            if self.summary is None:
+                self.summary = {
+                    'total' : self.count_captures(),
+                    'latest' : self.latest_capture(),
+                }
+
+            return self.summary
+
+
+    def page_captures(self, limit : int, cursor : Optional[Tuple[float, int]] = None, newest_first : bool = True, backwards : bool = False) -> Tuple[List[Dict[str, str]], bool]:
+
+        '''
+        Page of captures following a cursor. Seeks straight to the cursor through the captured_at index, so every page costs the same no
+        matter how deep into the captures it is.
+
+        :param: limit - Maximum number of captures returned.
+        :param: cursor - (captured_at, id) of the capture the page starts after, None for the first page.
+        :param: newest_first - Order captures from newest to oldest.
+        :param: backwards - Page towards the start of the order instead, returning the captures before the cursor.
+        :return: captures - List of capture metadata, always in display order.
+        :return: has_more - True if further captures exist in the direction paged.
+        '''
+
+        # Walk the index in the direction being paged.
+        descending = newest_first != backwards
+        order, comparison = ('DESC', '<') if descending else ('ASC', '>')
+
+        # Fetch one extra row to learn whether another page follows.
+        if cursor is None:
+            rows = self.reader().execute(
+                f'SELECT * FROM captures ORDER BY captured_at {order}, id {order} LIMIT ?', (limit + 1,)
+            ).fetchall()
+        else:
+            rows = self.reader().execute(
+                f'SELECT * FROM captures WHERE (captured_at, id) {comparison} (?, ?) ORDER BY captured_at {order}, id {order} LIMIT ?', (*cursor, limit + 1)
+            ).fetchall()
+
+        captures = [dict(row) for row in rows[:limit]]
+
+        # Paging backwards walks the index in reverse, restore the display order.
+        if backwards:
+            captures.reverse()
+
+        return captures, len(rows) > limit
+
+
+    def events_between(self, start_time : float, end_time : float, track_id : Optional[int] = None) -> List[Dict[str, str]]:
+
+        '''
+        Events that occurred within a time range, optionally for a single detection.
+
+        :param: start_time - Epoch time the range starts.
+        :param: end_time - Epoch time the range ends.
+        :param: track_id - Only return events for this detection.
+        :return: List of events ordered by time.
+        '''
+
+        if track_id is None:
+            rows = self.reader().execute('SELECT * FROM events WHERE occurred_at BETWEEN ? AND ? ORDER BY occurred_at', (start_time, end_time))
+        else:
+            rows = self.reader().execute('SELECT * FROM events WHERE track_id = ? AND occurred_at BETWEEN ? AND ? ORDER BY occurred_at', (track_id, start_time, end_time))
+
+        return [dict(row) for row in rows.fetchall()]
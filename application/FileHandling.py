@@ -1,6 +1,7 @@
-from typing import List, Dict
+from typing import List, Dict, Optional
 from flask import request
-import os
+from Database import CaptureDatabase
+import os, time, threading, cv2
 
 class FileHandling(object):
 
@@ -8,7 +9,7 @@ class FileHandling(object):
     FileHandling class to seperate multiple functions concerned with managing the captures kept within the devices local storage, bunlding them together in one location.
     '''
 
-    def __init__(self, CAPTURES_DIRECTORY : str = './static/captures/', FORMATTED_FILENAME_DATE : str = '%a-%b-%Y_%I-%M-%S%p', FORMATTED_DISPLAY_DATE : str = '%I:%M:%S%p', MAXIMUM_FILES_STORED : int = 30) -> None:
+    def __init__(self, CAPTURES_DIRECTORY : str = './static/captures/', FORMATTED_FILENAME_DATE : str = '%a-%b-%Y_%I-%M-%S%p', FORMATTED_DISPLAY_DATE : str = '%I:%M:%S%p', MAXIMUM_FILES_STORED : int = 30, database : Optional[CaptureDatabase] = None, THUMBNAILS_DIRECTORY : str = './static/thumbnails/', THUMBNAIL_WIDTH : int = 320) -> None:
         
         # Initialise list that will store the images metadata.
         self.stored_images : List = []
@@ -28,6 +29,24 @@ class FileHandling(object):
         # Final vairiable to control maximum number of files allowed within the devices local storage.
         self.MAXIMUM_FILES_STORED = MAXIMUM_FILES_STORED
 
+        # Directory thumbnails of the captures are generated into, kept apart so they never count towards the file limit.
+        self.THUMBNAILS_DIRECTORY = THUMBNAILS_DIRECTORY
+
+        # Width thumbnails are scaled down to, keeping the captures aspect ratio.
+        self.THUMBNAIL_WIDTH = THUMBNAIL_WIDTH
+
+        # Database storing capture metadata, captures are only tracked on disk without one.
+        self.database = database
+
+        # Number of captures stored, kept up to date on every write and delete.
+        self.capture_count : int = database.count_captures() if database is not None else 0
+
+        # Lock guarding the capture count, pruned captures are counted off on the database writer thread.
+        self.count_lock = threading.Lock()
+
+        # Path of the last capture registered, captures taken within the same second overwrite the same file.
+        self.last_capture_path : Optional[str] = None
+
 
     def sort_files(self, files : List[dict], reverse_order : bool = False) -> List[dict]:
 
@@ -132,6 +151,247 @@ class FileHandling(object):
         return current_images, total_pages, page_number
     
     
+    def import_stored_captures(self, directory : str) -> None:
+
+        '''
+        Import captures already in local storage into the database the first time it is used. Later startups skip the directory entirely.
+
+        :param: directory - Access the cameras capture directory attribute.
+        :return: N/A
+        '''
+
+        # Already imported, startup does not depend on the size of the directory.
+        if self.database is None or self.database.get_metadata('imported') is not None:
+            return
+
+        if os.path.exists(directory):
+
+            for image in self.access_stored_captures(directory):
+
+                # Filenames omit the day of the month, captures are never modified so the modification time is when they were taken.
+                captured_at = os.path.getmtime(image['fullpath'])
+
+                self.database.record_capture(image['fullpath'], image['capture_date'], image['capture_time'], captured_at)
+
+        self.database.set_metadata('imported', str(time.time()))
+        self.database.flush()
+
+        self.capture_count = self.database.count_captures()
+
+
+    def register_capture(self, fullpath : str, detection : Optional[dict] = None) -> None:
+
+        '''
+        Record a newly written capture along with the detection that triggered it.
+
+        :param: fullpath - Path the capture was written to.
+        :param: detection - Detection metadata {id, box, predicted_box, threat_level}, if known.
+        :return: N/A
+        '''
+
+        if self.database is None:
+            return
+
+        # Date and time are taken from the filename, matching captures imported from storage.
+        filename, _ = os.path.splitext(os.path.basename(fullpath))
+        capture_date, _, capture_time = filename.partition('_')
+
+        self.database.record_capture(
+            fullpath,
+            capture_date,
+            capture_time,
+            track_id = detection['id'] if detection else None,
+            threat_level = detection['threat_level'] if detection else None,
+            box = detection['box'] if detection else None,
+        )
+
+        # Only count new files, an overwritten capture replaces its existing record.
+        if fullpath != self.last_capture_path:
+            with self.count_lock:
+                self.capture_count += 1
+            self.last_capture_path = fullpath
+
+
+    def delete_capture(self, filename : str) -> bool:
+
+        '''
+        Remove a capture from local storage and the database.
+
+        :param: filename - Filename of the capture without its extension.
+        :return: bool - True if the capture existed and was removed.
+        '''
+
+        # Construct filepath from parameterised filename. 
+        capture = f'{self.CAPTURES_DIRECTORY}{filename}.jpg'
+
+        if not os.path.exists(capture):
+            return False
+
+        # Use os library to remove file from the devices local storage. 
+        os.remove(capture)
+        self.remove_thumbnail(filename)
+
+        if self.database is not None:
+            self.database.delete_capture(filename)
+            with self.count_lock:
+                self.capture_count -= 1
+
+        return True
+
+
+    def manage_captures_displayed(self, max_images : int) -> tuple[list, int, int, Optional[str], Optional[str]]:
+
+        '''
+        Query a page of captures from the database in the current file order. Pages are addressed by a cursor naming the capture they follow,
+        ?next=<cursor> pages forward and ?previous=<cursor> pages back, so deep pages load as quickly as the first.
+
+        :param: max_images - Maximum number of images to fit onto a page. 
+        :return: current_images - Images to display upon the page.
+        :return: total_pages - Pages required to fit all of the images stored.
+        :return: page_number - Current page number to display to the user.
+        :return: next_cursor - Cursor of the next page, None on the last page.
+        :return: previous_cursor - Cursor of the previous page, None on the first page.
+        '''
+
+        # Page number is only carried along for display, the cursor decides what is shown.
+        page_number = max(request.args.get('page', default=1, type=int), 1)
+
+        # Paging back when a previous cursor is given, otherwise forward from the next cursor or the start.
+        backwards = 'previous' in request.args
+        cursor = self.parse_cursor(request.args.get('previous' if backwards else 'next'))
+
+        current_images, has_more = self.database.page_captures(max_images, cursor, newest_first = not self.file_order, backwards = backwards)
+
+        # Paging back always leaves a page ahead, paging forward always leaves one behind unless starting from the beginning.
+        has_next = has_more if not backwards else True
+        has_previous = has_more if backwards else cursor is not None
+
+        # Fell off the start of the captures, e.g. after deletions, so this is the first page.
+        if not has_previous:
+            page_number = 1
+
+        next_cursor = self.format_cursor(current_images[-1]) if current_images and has_next else None
+        previous_cursor = self.format_cursor(current_images[0]) if current_images and has_previous else None
+
+        total_captures = self.database.capture_summary()['total']
+
+        # Calculate total number of pages to be traversed. 
+        total_pages = total_captures // max_images + (1 if total_captures % max_images != 0 else 0)
+
+        return current_images, total_pages, page_number, next_cursor, previous_cursor
+
+
+    @staticmethod
+    def format_cursor(capture : dict) -> str:
+
+        '''
+        Encode the position of a capture as a page cursor.
+
+        :param: capture - Capture metadata.
+        :return: str - Cursor in the form captured_at:id.
+        '''
+
+        return f"{capture['captured_at']!r}:{capture['id']}"
+
+
+    @staticmethod
+    def parse_cursor(cursor : Optional[str]) -> Optional[tuple[float, int]]:
+
+        '''
+        Decode a page cursor, ignoring malformed values so they fall back onto the first page.
+
+        :param: cursor - Cursor in the form captured_at:id.
+        :return: tuple - (captured_at, id), or None.
+        '''
+
+        try:
+            captured_at, capture_id = cursor.split(':')
+            return float(captured_at), int(capture_id)
+        except (AttributeError, ValueError):
+            return None
+
+
+    def thumbnail_path(self, filename : str) -> Optional[str]:
+
+        '''
+        Path to a captures thumbnail, generating it the first time it is requested. Thumbnails older than their capture are regenerated.
+
+        :param: filename - Filename of the capture without its extension.
+        :return: str - Path to the thumbnail, or None if the capture does not exist.
+        '''
+
+        capture = f'{self.CAPTURES_DIRECTORY}{filename}.jpg'
+        thumbnail = f'{self.THUMBNAILS_DIRECTORY}{filename}.jpg'
+
+        if not os.path.exists(capture):
+            return None
+
+        # Thumbnail already generated from the current capture.
+        if os.path.exists(thumbnail) and os.path.getmtime(thumbnail) >= os.path.getmtime(capture):
+            return thumbnail
+
+        frame = cv2.imread(capture)
+
+        if frame is None:
+            return None
+
+        # Only scale down, captures narrower than a thumbnail are kept as they are.
+        height, width = frame.shape[:2]
+
+        if width > self.THUMBNAIL_WIDTH:
+            frame = cv2.resize(frame, (self.THUMBNAIL_WIDTH, max(round(height * self.THUMBNAIL_WIDTH / width), 1)), interpolation=cv2.INTER_AREA)
+
+        os.makedirs(self.THUMBNAILS_DIRECTORY, exist_ok=True)
+
+        # Write under a temporary name and move into place, so a concurrent request never serves a partial thumbnail.
+        temporary = f'{thumbnail}.{os.getpid()}-{threading.get_ident()}.tmp.jpg'
+        cv2.imwrite(temporary, frame, [cv2.IMWRITE_JPEG_QUALITY, 70])
+        os.replace(temporary, thumbnail)
+
+        # Thumbnail carries the captures modification time, so it is cached exactly like the capture it was made from.
+        capture_modified = os.path.getmtime(capture)
+        os.utime(thumbnail, (capture_modified, capture_modified))
+
+        return thumbnail
+
+
+    def remove_thumbnail(self, filename : str) -> None:
+
+        '''
+        Remove the thumbnail generated for a capture, if any.
+
+        :param: filename - Filename of the capture without its extension.
+        :return: N/A
+        '''
+
+        thumbnail = f'{self.THUMBNAILS_DIRECTORY}{filename}.jpg'
+
+        if os.path.exists(thumbnail):
+            os.remove(thumbnail)
+
+
+    def remove_pruned_captures(self, captures : List[Dict[str, str]]) -> None:
+
+        '''
+        Remove the files of captures pruned from the database. Called on the database writer thread.
+
+        :param: captures - Metadata of the captures pruned.
+        :return: N/A
+        '''
+
+        for capture in captures:
+
+            if os.path.exists(capture['fullpath']):
+                os.remove(capture['fullpath'])
+            self.remove_thumbnail(capture['filename'])
+
+            # Notify users changes have been applied.
+            print(f'Storage Limits Exceeded!\n {capture["fullpath"]} has been deleted from the system!')
+
+        with self.count_lock:
+            self.capture_count -= len(captures)
+
+
     def check_file_exhaustion(self, directory : str, file_limit : int) -> None:
 
         '''
@@ -142,6 +402,14 @@ class FileHandling(object):
         :return: N/A.
         '''
         
+        # With a database, prune the oldest captures on the writer thread without listing the directory or waiting on the disk.
+        if self.database is not None:
+
+            if self.capture_count > file_limit:
+                self.database.prune_captures(file_limit, self.remove_pruned_captures)
+
+            return
+
         # Source all files from the directory parameterised. 
         files = os.listdir(directory)
 
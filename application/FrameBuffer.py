@@ -0,0 +1,293 @@
+from typing import List, Dict, Tuple, Callable, Optional
+import threading, time, numpy as np
+
+
+class FramePacket(object):
+
+    '''
+    Immutable record of a single processed frame published by the streaming pipeline. Holds the raw and annotated frames alongside the detection
+    metadata, resizing and encoding each stream variant lazily so that it is produced at most once regardless of how many clients request it.
+    '''
+
+    def __init__(self, sequence : int, raw_frame : np.ndarray, annotated_frame : np.ndarray, detections : List[dict], encoder : Callable[[np.ndarray, Tuple[str, str]], bytes], scaler : Callable[[np.ndarray], np.ndarray]) -> None:
+
+        # Sequence number of the frame, increments with every published frame.
+        self.sequence = sequence
+
+        # Time the frame was published.
+        self.timestamp = time.time()
+
+        # Untampered frame straight from the camera.
+        self.raw_frame = raw_frame
+
+        # Frame with bounding boxes and clock drawn on.
+        self.annotated_frame = annotated_frame
+
+        # Detection metadata (ID, box, predicted box, threat level) for the frame.
+        self.detections = detections
+
+        # Function used to convert frames into bytes, given the variant so each can be encoded with its own parameters.
+        self.encoder = encoder
+
+        # Function used to downscale frames for the low resolution substream.
+        self.scaler = scaler
+
+        # Cache of encoded variants, keyed by layer and quality.
+        self.encoded_frames : Dict[Tuple[str, str], bytes] = {}
+
+        # Lock guarding the cache so concurrent clients do not encode the same variant twice.
+        self.lock = threading.Lock()
+
+
+    def encoded(self, layer : str = 'annotated', quality : str = 'main') -> bytes:
+
+        '''
+        Return the requested variant of the frame encoded as bytes, resizing and encoding it on first access only.
+
+        :param: layer - 'annotated' for the frame with overlays drawn, 'raw' for the clean frame.
+        :param: quality - 'main' for full resolution, 'low' for the downscaled substream.
+        :return: bytes - Encoded frame.
+        '''
+
+        variant = (layer, quality)
+
+        with self.lock:
+
+            # Encode the variant if no other client has done so already.
+            if variant not in self.encoded_frames:
+
+                frame = self.raw_frame if layer == 'raw' else self.annotated_frame
+
+                # Downscale for the substream.
+                if quality == 'low':
+                    frame = self.scaler(frame)
+
+                self.encoded_frames[variant] = self.encoder(frame, variant)
+
+            return self.encoded_frames[variant]
+
+
+    def metadata(self) -> dict:
+
+        '''
+        Describe the frame for clients drawing their own overlays.
+
+        :return: dict - Sequence number, timestamp, frame dimensions and detections.
+        '''
+
+        height, width = self.raw_frame.shape[:2]
+
+        return {
+            'sequence' : self.sequence,
+            'timestamp' : self.timestamp,
+            'width' : width,
+            'height' : height,
+            'detections' : self.detections,
+        }
+
+
+class Subscriber(object):
+
+    '''
+    One-slot mailbox holding the latest frame for a single client. A frame the client has not consumed yet is replaced rather than queued,
+    so a slow viewer skips frames instead of holding back the producer or any other viewer.
+    '''
+
+    def __init__(self, name : str, notify : Optional[Callable[[], None]] = None) -> None:
+
+        # Description of the client, reported in the stream statistics.
+        self.name = name
+
+        # Optional non-blocking callback invoked whenever a frame is offered, used by asynchronous clients.
+        self.notify = notify
+
+        # Latest frame waiting to be consumed.
+        self.slot : Optional[FramePacket] = None
+
+        # Lock guarding the slot and counters.
+        self.lock = threading.Lock()
+
+        # Event set while a frame is waiting in the slot.
+        self.frame_ready = threading.Event()
+
+        # Number of frames handed to the client.
+        self.frames_delivered : int = 0
+
+        # Number of frames replaced before the client consumed them.
+        self.frames_skipped : int = 0
+
+        # Time the client subscribed.
+        self.connected_at = time.time()
+
+
+    def offer(self, packet : FramePacket) -> None:
+
+        '''
+        Place a frame in the mailbox, replacing any frame not yet consumed. Called on the producer thread and never blocks on the client.
+
+        :param: packet - Newly published frame packet.
+        '''
+
+        with self.lock:
+
+            # Previous frame was never consumed, count it as skipped.
+            if self.slot is not None:
+                self.frames_skipped += 1
+
+            self.slot = packet
+
+        self.frame_ready.set()
+
+        if self.notify is not None:
+            self.notify()
+
+
+    def take_nowait(self) -> Optional[FramePacket]:
+
+        '''
+        Empty the mailbox without waiting.
+
+        :return: packet - Waiting frame packet, or None if the mailbox is empty.
+        '''
+
+        with self.lock:
+
+            packet, self.slot = self.slot, None
+
+            self.frame_ready.clear()
+
+            if packet is not None:
+                self.frames_delivered += 1
+
+            return packet
+
+
+    def take(self, timeout : float = 1.0) -> Optional[FramePacket]:
+
+        '''
+        Block until a frame is waiting in the mailbox, then empty it.
+
+        :param: timeout - Maximum time to wait in seconds.
+        :return: packet - Waiting frame packet, or None if the wait timed out.
+        '''
+
+        self.frame_ready.wait(timeout)
+
+        return self.take_nowait()
+
+
+    def stats(self) -> dict:
+
+        '''
+        Report the clients delivery counters.
+
+        :return: dict - Client name, connection duration and frames delivered and skipped.
+        '''
+
+        return {
+            'name' : self.name,
+            'connected_for' : round(time.time() - self.connected_at, 1),
+            'frames_delivered' : self.frames_delivered,
+            'frames_skipped' : self.frames_skipped,
+        }
+
+
+class FrameBuffer(object):
+
+    '''
+    Shared latest-frame buffer. A single producer publishes processed frames into a one-slot mailbox per subscribed client,
+    decoupling the cost of the computer vision pipeline from the number and speed of connected viewers.
+    '''
+
+    def __init__(self, encoder : Callable[[np.ndarray, Tuple[str, str]], bytes], scaler : Callable[[np.ndarray], np.ndarray]) -> None:
+
+        # Function used to convert frames into bytes, given the variant so each can be encoded with its own parameters.
+        self.encoder = encoder
+
+        # Function used to downscale frames for the low resolution substream.
+        self.scaler = scaler
+
+        # Most recently published frame.
+        self.latest : Optional[FramePacket] = None
+
+        # Number of frames published so far.
+        self.sequence : int = 0
+
+        # Clients currently subscribed to the buffer.
+        self.subscribers : List[Subscriber] = []
+
+        # Lock guarding the subscribers list.
+        self.lock = threading.Lock()
+
+
+    def publish(self, raw_frame : np.ndarray, annotated_frame : np.ndarray, detections : List[dict]) -> FramePacket:
+
+        '''
+        Store a newly processed frame and offer it to every subscriber. Never waits on any client.
+
+        :param: raw_frame - Untampered camera frame.
+        :param: annotated_frame - Frame with overlays drawn on.
+        :param: detections - Detection metadata for the frame.
+        :return: packet - The published frame packet.
+        '''
+
+        self.sequence += 1
+
+        packet = FramePacket(self.sequence, raw_frame, annotated_frame, detections, self.encoder, self.scaler)
+
+        self.latest = packet
+
+        # Copy the list so clients may subscribe or leave while frames are being offered.
+        with self.lock:
+            subscribers = list(self.subscribers)
+
+        for subscriber in subscribers:
+            subscriber.offer(packet)
+
+        return packet
+
+
+    def subscribe(self, name : str, notify : Optional[Callable[[], None]] = None) -> Subscriber:
+
+        '''
+        Register a client, returning its mailbox. The latest frame is offered straight away so new viewers do not wait for the next one.
+
+        :param: name - Description of the client.
+        :param: notify - Optional non-blocking callback invoked whenever a frame is offered.
+        :return: subscriber - Mailbox the client reads frames from.
+        '''
+
+        subscriber = Subscriber(name, notify)
+
+        with self.lock:
+            self.subscribers.append(subscriber)
+
+        if self.latest is not None:
+            subscriber.offer(self.latest)
+
+        return subscriber
+
+
+    def unsubscribe(self, subscriber : Subscriber) -> None:
+
+        '''
+        Remove a client once it disconnects.
+
+        :param: subscriber - Mailbox of the client leaving.
+        '''
+
+        with self.lock:
+            if subscriber in self.subscribers:
+                self.subscribers.remove(subscriber)
+
+
+    def subscriber_stats(self) -> List[dict]:
+
+        '''
+        Report the delivery counters of every connected client.
+
+        :return: List of per-client statistics.
+        '''
+
+        with self.lock:
+            return [subscriber.stats() for subscriber in self.subscribers]
@@ -0,0 +1,231 @@
+from typing import List, Tuple, Optional
+import numpy as np
+
+
+class MotionHeatmap(object):
+
+    '''
+    Per-tile motion statistics computed from the thresholded frame difference. Splits the frame into a fixed grid, summing each tile in one
+    pass, and keeps an exponentially decayed heatmap of where motion happens alongside a summed-area table for constant time region queries.
+    '''
+
+    def __init__(self, GRID_SIZE : Tuple[int, int] = (8, 8), DECAY : float = 0.95, STATIC_HEAT : float = 0.001) -> None:
+
+        # Number of tile rows and columns.
+        self.GRID_SIZE = GRID_SIZE
+
+        # Fraction of the previous heat kept each frame, higher values remember motion for longer.
+        self.DECAY = DECAY
+
+        # Heat below which a tile without motion in the latest frame is static and skipped by detection, 0 to process every tile.
+        self.STATIC_HEAT = STATIC_HEAT
+
+        # Sum of the thresholded pixels within each tile for the latest frame.
+        self.tile_sums : np.ndarray = np.zeros(GRID_SIZE, dtype=np.int64)
+
+        # Fraction of each tile in motion, decayed over time.
+        self.heatmap : np.ndarray = np.zeros(GRID_SIZE, dtype=np.float32)
+
+        # Summed-area table of the tile sums, padded with a leading row and column of zeros.
+        self.integral : np.ndarray = np.zeros((GRID_SIZE[0] + 1, GRID_SIZE[1] + 1), dtype=np.int64)
+
+        # Per-tile sensitivity overrides, infinity leaves a tile to the global sensitivity only.
+        self.tile_sensitivity : np.ndarray = np.full(GRID_SIZE, np.inf)
+
+        # Height and width of the frames the grid was built for.
+        self.frame_shape : Optional[Tuple[int, int]] = None
+
+        # Pixel offsets where each tile row and column starts, derived from the first frame.
+        self.row_edges : Optional[np.ndarray] = None
+        self.column_edges : Optional[np.ndarray] = None
+
+        # Height of each tile row and width of each tile column in pixels.
+        self.tile_heights : Optional[np.ndarray] = None
+        self.tile_widths : Optional[np.ndarray] = None
+
+        # Number of pixels within each tile.
+        self.tile_areas : Optional[np.ndarray] = None
+
+
+    def update(self, thresholded_frame : np.ndarray) -> None:
+
+        '''
+        Sum the thresholded frame tile by tile and fold the result into the heatmap.
+
+        :param: thresholded_frame - Binary frame difference, 255 where pixels changed.
+        '''
+
+        # Derive the tile layout once the frame size is known.
+        if self.frame_shape != thresholded_frame.shape[:2]:
+            self.build_grid(thresholded_frame.shape[:2])
+
+        # Sum every tile in one pass, rows first then columns.
+        row_sums = np.add.reduceat(thresholded_frame, self.row_edges, axis=0, dtype=np.int64)
+        self.tile_sums = np.add.reduceat(row_sums, self.column_edges, axis=1)
+
+        # Fraction of each tile in motion this frame.
+        motion_fraction = self.tile_sums / (255 * self.tile_areas)
+
+        # Decay the previous heat and add the new motion.
+        self.heatmap = (self.DECAY * self.heatmap + (1 - self.DECAY) * motion_fraction).astype(np.float32)
+
+        # Rebuild the summed-area table for region queries.
+        integral = np.zeros_like(self.integral)
+        integral[1:, 1:] = self.tile_sums.cumsum(axis=0).cumsum(axis=1)
+        self.integral = integral
+
+
+    def build_grid(self, frame_shape : Tuple[int, int]) -> None:
+
+        '''
+        Split the frame into the tile grid, spreading any remainder so that tiles differ in size by one pixel at most.
+
+        :param: frame_shape - Height and width of the frame.
+        '''
+
+        self.frame_shape = frame_shape
+
+        height, width = frame_shape
+        rows, columns = self.GRID_SIZE
+
+        self.row_edges = np.linspace(0, height, rows + 1).astype(np.int64)[:-1]
+        self.column_edges = np.linspace(0, width, columns + 1).astype(np.int64)[:-1]
+
+        # Pixel count of every tile from the distance between consecutive edges.
+        self.tile_heights = np.diff(np.append(self.row_edges, height))
+        self.tile_widths = np.diff(np.append(self.column_edges, width))
+        self.tile_areas = np.outer(self.tile_heights, self.tile_widths)
+
+
+    def total(self) -> int:
+
+        '''
+        Sum of the thresholded pixels across the whole frame.
+
+        :return: int - Sum of every tile.
+        '''
+
+        return int(self.integral[-1, -1])
+
+
+    def region_sum(self, row : int, column : int, rows : int, columns : int) -> int:
+
+        '''
+        Sum of the thresholded pixels within a rectangle of tiles, answered from the summed-area table in constant time.
+
+        :param: row - First tile row of the region.
+        :param: column - First tile column of the region.
+        :param: rows - Number of tile rows in the region.
+        :param: columns - Number of tile columns in the region.
+        :return: int - Sum of the tiles within the region.
+        '''
+
+        bottom, right = row + rows, column + columns
+
+        return int(self.integral[bottom, right] - self.integral[row, right] - self.integral[bottom, column] + self.integral[row, column])
+
+
+    def box_to_tiles(self, x : int, y : int, w : int, h : int) -> Tuple[int, int, int, int]:
+
+        '''
+        Convert a bounding box in pixels into the rectangle of tiles covering it.
+
+        :param: x, y, w, h - Bounding box in pixels.
+        :return: row, column, rows, columns - Rectangle of tiles covering the box.
+        '''
+
+        first_row = max(int(np.searchsorted(self.row_edges, y, side='right')) - 1, 0)
+        last_row = max(int(np.searchsorted(self.row_edges, y + h - 1, side='right')) - 1, first_row)
+        first_column = max(int(np.searchsorted(self.column_edges, x, side='right')) - 1, 0)
+        last_column = max(int(np.searchsorted(self.column_edges, x + w - 1, side='right')) - 1, first_column)
+
+        return first_row, first_column, last_row - first_row + 1, last_column - first_column + 1
+
+
+    def box_sum(self, x : int, y : int, w : int, h : int) -> int:
+
+        '''
+        Sum of the thresholded pixels within the tiles covering a bounding box.
+
+        :param: x, y, w, h - Bounding box in pixels.
+        :return: int - Sum of the tiles covering the box.
+        '''
+
+        return self.region_sum(*self.box_to_tiles(x, y, w, h))
+
+
+    def triggered_tiles(self) -> np.ndarray:
+
+        '''
+        Tiles whose motion exceeds their own sensitivity override, using the same scale as the global sensitivity setting.
+
+        :return: np.ndarray - Boolean grid, True where a tile detected motion.
+        '''
+
+        return (self.tile_sums / 100) > self.tile_sensitivity
+
+
+    def active_tiles(self, boxes : List[List[int]]) -> np.ndarray:
+
+        '''
+        Tiles worth searching for objects: those with motion in the latest frame or heat above STATIC_HEAT, and those covered by the boxes
+        given so that objects which have stopped moving are still found.
+
+        :param: boxes - Bounding boxes in pixels kept active whatever their motion. [x, y, w, h]
+        :return: np.ndarray - Boolean grid, True where a tile is active.
+        '''
+
+        active = (self.tile_sums > 0) | (self.heatmap >= self.STATIC_HEAT)
+
+        for x, y, w, h in boxes:
+            row, column, rows, columns = self.box_to_tiles(x, y, w, h)
+            active[row:row + rows, column:column + columns] = True
+
+        return active
+
+
+    def tile_mask(self, tiles : np.ndarray) -> np.ndarray:
+
+        '''
+        Expand a boolean tile grid into a mask the size of the frame.
+
+        :param: tiles - Boolean grid matching the tile grid.
+        :return: np.ndarray - Mask, 255 over the tiles set and 0 elsewhere.
+        '''
+
+        return np.repeat(np.repeat(tiles.astype(np.uint8) * 255, self.tile_heights, axis=0), self.tile_widths, axis=1)
+
+
+    def set_tile_sensitivity(self, tile_sensitivity) -> None:
+
+        '''
+        Apply per-tile sensitivity overrides. Tiles set to None fall back onto the global sensitivity only.
+
+        :param: tile_sensitivity - Grid of sensitivity values matching the tile grid.
+        '''
+
+        sensitivity = np.array(
+            [[np.inf if value is None else value for value in row] for row in tile_sensitivity],
+            dtype=np.float64
+        )
+
+        if sensitivity.shape != self.GRID_SIZE:
+            raise ValueError(f'Sensitivity grid must be {self.GRID_SIZE[0]}x{self.GRID_SIZE[1]}!')
+
+        self.tile_sensitivity = sensitivity
+
+
+    def describe(self) -> dict:
+
+        '''
+        Describe the heatmap for the API.
+
+        :return: dict - Grid size, decayed heatmap, pixels in motion per tile and sensitivity overrides.
+        '''
+
+        return {
+            'grid' : list(self.GRID_SIZE),
+            'heatmap' : np.round(self.heatmap, 4).tolist(),
+            'tile_pixels' : (self.tile_sums // 255).tolist(),
+            'tile_sensitivity' : [[None if np.isinf(value) else value for value in row] for row in self.tile_sensitivity.tolist()],
+        }
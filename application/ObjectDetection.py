@@ -1,9 +1,12 @@
+from typing import Callable, Optional
 from ObjectTracking import ObjectTracking
 from FileHandling import FileHandling
 from Camera import Camera
+from MotionHeatmap import MotionHeatmap
+from BackgroundModels import BackgroundModel, LearningSchedule, BACKGROUND_ENGINES
 
 
-import numpy as np, cv2, os, time
+import numpy as np, cv2, os, threading, time
 
 
 class ObjectDetection(object):
@@ -12,17 +15,47 @@ class ObjectDetection(object):
     
     '''
 
-    def __init__(self, KERNEL_SIZE = (3,3)) -> None:
+    def __init__(self, KERNEL_SIZE = (3,3), BACKGROUND_ENGINE : int = 0, object_tracking : Optional[ObjectTracking] = None, file_handling : Optional[FileHandling] = None, BACKGROUND_SNAPSHOT_PATH : Optional[str] = None, SNAPSHOT_INTERVAL : float = 60, PREROLL_FRAMES : int = 30) -> None:
 
-        self.camera = Camera()
-        
         self.KERNEL = KERNEL_SIZE
 
-        self.background_subtractor = cv2.createBackgroundSubtractorMOG2(history=100, varThreshold=40)
+        # Image the learnt background is saved to and restored from after a restart, None to always learn from scratch.
+        self.BACKGROUND_SNAPSHOT_PATH = BACKGROUND_SNAPSHOT_PATH
 
-        self.object_tracking = ObjectTracking()
+        # Seconds between background snapshots.
+        self.SNAPSHOT_INTERVAL = SNAPSHOT_INTERVAL
 
-        self.file_handling = FileHandling()
+        # Frames learnt quickly before detection is armed, a third as many refresh a restored snapshot.
+        self.PREROLL_FRAMES = PREROLL_FRAMES
+
+        # Time the background was last saved, the first snapshot waits a full interval so it is taken from a settled model.
+        self.last_snapshot_time = time.time()
+
+        # Engine the background model was built with, see BACKGROUND_ENGINES.
+        self.background_engine = BACKGROUND_ENGINE
+
+        # Latest settings snapshot from the settings store, and the snapshot last applied by the pipeline. See apply_settings.
+        self.pending_settings = None
+        self.applied_settings = None
+
+        # Background model separating moving objects from the scene.
+        self.background_model : BackgroundModel = BACKGROUND_ENGINES[BACKGROUND_ENGINE]()
+
+        # Schedule deciding when and where the background model learns.
+        self.learning_schedule = LearningSchedule()
+
+        # Last frame processed and its foreground mask, each frame is only applied to the background model once.
+        self.cached_frame = None
+        self.cached_mask = None
+
+        # Tracker whose kalman filter estimates detection positions, shared with the pipeline when supplied.
+        self.object_tracking = object_tracking if object_tracking is not None else ObjectTracking()
+
+        # File handler recording captures, shared with the application when supplied.
+        self.file_handling = file_handling if file_handling is not None else FileHandling()
+
+        # Per-tile motion statistics, updated by motion detection every frame.
+        self.motion_heatmap = MotionHeatmap()
 
         # Dictionary to correlate threat levels with OpenCV BGR colours.
         self.threat_levels : dict[int, tuple[int, int, int]] = {
@@ -35,7 +68,7 @@ class ObjectDetection(object):
         }
 
     
-    def capture_frame(self, frame, directory):
+    def capture_frame(self, frame, directory, detection = None):
 
         # Create directory if it does not exist. 
         if not os.path.exists(directory):
@@ -47,9 +80,14 @@ class ObjectDetection(object):
         # Write capture to directory with native filename.
         cv2.imwrite(f'{filename}.jpg', frame)
 
+        # Record the capture and the detection that triggered it.
+        self.file_handling.register_capture(f'{filename}.jpg', detection)
+
         # Once new capture is written, check if file limit has been exceeded and remove older captures to avoid resource exhaustion.
         self.file_handling.check_file_exhaustion(directory, self.file_handling.MAXIMUM_FILES_STORED)
 
+        return f'{filename}.jpg'
+
 
     def downsample_frame(self, frame, sample_scale):
 
@@ -70,7 +108,163 @@ class ObjectDetection(object):
         return downsampled_frame
 
 
-    def process_frames(self, frame):
+    # Settings the detection pipeline derives state from, see apply_settings.
+    SETTINGS_KEYS = ('background_engine', 'background_stride')
+
+
+    def apply_settings(self, settings) -> None:
+
+        '''
+        Settings store subscriber, called on the thread updating the settings when the background settings change. The snapshot is only
+        recorded, apply_pending_settings applies it on the pipeline thread before the next frame so nothing changes under a frame.
+
+        :param: settings - Settings snapshot.
+        '''
+
+        self.pending_settings = settings
+
+
+    def apply_pending_settings(self) -> None:
+
+        '''
+        Apply the latest settings snapshot if it has not been applied yet. Called by the pipeline before each frame.
+        '''
+
+        settings = self.pending_settings
+
+        if settings is None or settings is self.applied_settings:
+            return
+
+        # Rebuild the background model if the engine setting has changed.
+        self.select_background_engine(settings['background_engine'])
+
+        # Frames between background updates while the scene is static.
+        self.learning_schedule.STRIDE = settings['background_stride']
+
+        self.applied_settings = settings
+
+
+    def select_background_engine(self, engine : int) -> None:
+
+        '''
+        Rebuild the background model when a different engine is selected, otherwise keep the model already learnt.
+
+        :param: engine - Background engine selected, see BACKGROUND_ENGINES.
+        '''
+
+        if engine != self.background_engine and engine in BACKGROUND_ENGINES:
+
+            background = self.background_model.background_image()
+
+            self.background_model = BACKGROUND_ENGINES[engine]()
+            self.background_engine = engine
+
+            # Hand the scene learnt so far to the new model instead of relearning it from the next frame.
+            if background is not None:
+                self.background_model.seed(background)
+
+
+    def read_background_snapshot(self) -> Optional[np.ndarray]:
+
+        '''
+        Read the background saved before the last restart.
+
+        :return: np.ndarray - Grayscale background image, or None if there is no usable snapshot.
+        '''
+
+        if self.BACKGROUND_SNAPSHOT_PATH is None or not os.path.exists(self.BACKGROUND_SNAPSHOT_PATH):
+            return None
+
+        background = cv2.imread(self.BACKGROUND_SNAPSHOT_PATH, cv2.IMREAD_GRAYSCALE)
+
+        if background is None:
+            print(f'Could not read background snapshot {self.BACKGROUND_SNAPSHOT_PATH}, learning the scene from scratch!')
+
+        return background
+
+
+    def write_background_snapshot(self, background : np.ndarray) -> None:
+
+        '''
+        Write a background image to the snapshot path atomically, so a restart mid write still finds the previous snapshot.
+
+        :param: background - Grayscale background image.
+        '''
+
+        temporary_path = f'{self.BACKGROUND_SNAPSHOT_PATH}.tmp.png'
+
+        # PNG is lossless, JPEG artefacts would show up as foreground once the snapshot is restored.
+        if cv2.imwrite(temporary_path, background):
+            os.replace(temporary_path, self.BACKGROUND_SNAPSHOT_PATH)
+        else:
+            print(f'Could not write background snapshot {self.BACKGROUND_SNAPSHOT_PATH}!')
+
+
+    def save_background_snapshot(self) -> None:
+
+        '''
+        Save the learnt background every SNAPSHOT_INTERVAL seconds. The image is copied from the model on the pipeline thread, which owns
+        the model, and written to disk on a separate thread so the pipeline never waits on storage.
+        '''
+
+        if self.BACKGROUND_SNAPSHOT_PATH is None:
+            return
+
+        now = time.time()
+
+        if now - self.last_snapshot_time < self.SNAPSHOT_INTERVAL:
+            return
+
+        self.last_snapshot_time = now
+
+        background = self.background_model.background_image()
+
+        if background is None:
+            return
+
+        threading.Thread(target=self.write_background_snapshot, args=(background.copy(),), daemon=True).start()
+
+
+    def warm_start(self, read_frame : Callable[[], np.ndarray]) -> None:
+
+        '''
+        Prepare the background model before detection is armed. The model is seeded from the last saved snapshot when one matches the
+        frame size, then a short pre-roll of frames is learnt at a fast, falling rate. Without a snapshot the pre-roll averages every frame
+        equally, building the background in PREROLL_FRAMES frames rather than the hundreds the default rate needs, so the first detections
+        are not a burst of false alarms from a half learnt scene.
+
+        :param: read_frame - Function returning the next frame from the camera.
+        '''
+
+        start_time = time.perf_counter()
+
+        background = self.read_background_snapshot()
+
+        seeded = False
+
+        # A restored snapshot only needs refreshing for changes made while the device was down.
+        preroll_frames = max(self.PREROLL_FRAMES // 3, 1) if background is not None else self.PREROLL_FRAMES
+
+        for index in range(preroll_frames):
+
+            morphological_operation = self.preprocess_frame(read_frame())
+
+            if index == 0 and background is not None:
+
+                # Snapshots from a different resolution cannot be used.
+                if background.shape == morphological_operation.shape:
+                    self.background_model.seed(background)
+                    seeded = True
+                else:
+                    print('Background snapshot does not match the frame size, learning the scene from scratch!')
+
+            # Cumulative average of the pre-roll, the snapshot counting as the first frame when one was restored.
+            self.background_model.apply(morphological_operation, 1 / (index + 2) if seeded else 1 / (index + 1))
+
+        print(f'Background warm started from {"snapshot" if seeded else "pre-roll"} in {1000 * (time.perf_counter() - start_time):.1f}ms')
+
+
+    def preprocess_frame(self, frame):
 
         scale = 20
 
@@ -80,11 +274,70 @@ class ObjectDetection(object):
 
         morphological_operation = cv2.GaussianBlur(grayscale_frame, self.KERNEL, 0)
 
-        foreground_mask = self.background_subtractor.apply(morphological_operation)
+        return morphological_operation
+
+
+    def process_frames(self, frame):
+
+        # Frame has already been through the background model, reuse its mask.
+        if frame is self.cached_frame:
+            return self.cached_mask
+
+        morphological_operation = self.preprocess_frame(frame)
+
+        learning_rate, frozen_boxes = self.learning_schedule.next_update(self.background_model.DEFAULT_LEARNING_RATE)
+
+        if learning_rate != 0 and frozen_boxes:
+            # Classify without learning, then learn everywhere except the active tracks.
+            foreground_mask = self.background_model.apply(morphological_operation, 0)
+            self.background_model.learn(morphological_operation, learning_rate, frozen_boxes)
+        else:
+            foreground_mask = self.background_model.apply(morphological_operation, learning_rate)
+
+        # Boost learning if the whole scene has changed.
+        self.learning_schedule.observe(foreground_mask, morphological_operation)
+
+        self.cached_frame, self.cached_mask = frame, foreground_mask
 
         return foreground_mask
     
 
+    def describe_detections(self, detections) -> list:
+
+        '''
+        Convert tracked detections into metadata records, estimating each detections next position once so the same values can be drawn
+        onto the frame by the server or published to clients drawing their own overlays.
+
+        :param: detections - List of tracked detections data. [x, y, w, h, ID, threat_level]
+        :return: described_detections - List of dictionaries containing the ID, bounding box, predicted bounding box and threat level.
+        '''
+
+        # Initialise list to store the detections metadata.
+        described_detections = []
+
+        # Iterate over each detection in the list provided.
+        for detection in detections:
+
+            # Accumulate detection data.
+            x, y, w, h, detection_ID, threat_level = detection
+
+            # Estimate the detections position using the kalman filter.
+            x_pred, y_pred = self.object_tracking.kf_predict(x, y)
+
+            described_detections.append({
+                # Unique ID of the tracked detection.
+                'id' : int(detection_ID),
+                # Measured bounding box. [x, y, w, h]
+                'box' : [int(x), int(y), int(w), int(h)],
+                # Kalman predicted bounding box. [x, y, w, h]
+                'predicted_box' : [int(x_pred), int(y_pred), int(w), int(h)],
+                # Current threat level of the detection.
+                'threat_level' : int(threat_level),
+            })
+
+        return described_detections
+
+
     def draw_bounding_boxes(self, frame : np.ndarray, detections) -> np.ndarray:
 
         '''
@@ -92,7 +345,7 @@ class ObjectDetection(object):
         the danger the detection poses.
 
         :param: frame - Frame for bounding boxes and other supporting data to be drawn upon.
-        :param: detections - List of detections data to supply this functions features. [x, y, w, h, ID, threat_level] 
+        :param: detections - List of detection metadata produced by describe_detections. {id, box, predicted_box, threat_level}
         :return: frame - Frame with data appended and visualised.
         :return: threat_level - Current threat level for the detection for external class logic.
         '''
@@ -105,9 +358,9 @@ class ObjectDetection(object):
         for detection in detections:
 
             # Accumulate detection data.
-            x, y, w, h, threat_level = detection
-
-            x_pred, y_pred = self.object_tracking.kf_predict(x, y)
+            _, y, w, h = detection['box']
+            x_pred, y_pred, _, _ = detection['predicted_box']
+            threat_level = detection['threat_level']
 
             # Associate visualiation colour with the detections threat level.
             if threat_level == 1:
@@ -143,10 +396,42 @@ class ObjectDetection(object):
                 thickness=2
             )   
 
+            # Path the detection has taken.
+            trail = self.object_tracking.trajectories.trail(detection['id'])
+
+            if len(trail) > 1:
+                cv2.polylines(
+                    img=frame,
+                    pts=[trail.astype(np.int32)],
+                    isClosed=False,
+                    color=detection_colour,
+                    thickness=1
+                )
+
         # Return processed frame and detections threat_level.
         return frame, threat_level
     
     
+    def draw_zones(self, frame : np.ndarray) -> np.ndarray:
+
+        '''
+        Draw the tripwires and zones the detections are tested against.
+
+        :param: frame - Frame to draw upon.
+        :return: frame - Frame with the tripwires and zones outlined.
+        '''
+
+        layout = self.object_tracking.zones.layout
+
+        for polygon in layout['polygons']:
+            cv2.polylines(img=frame, pts=[polygon.astype(np.int32)], isClosed=True, color=(255, 255, 0), thickness=1)
+
+        for start, end in zip(layout['line_starts'].astype(np.int32), layout['line_ends'].astype(np.int32)):
+            cv2.line(img=frame, pt1=tuple(start.tolist()), pt2=tuple(end.tolist()), color=(255, 0, 255), thickness=2)
+
+        return frame
+
+
     def motion_detection(self, prev_frame, curr_frame, camera : Camera):
 
         '''
@@ -161,6 +446,10 @@ class ObjectDetection(object):
         prev = self.process_frames(prev_frame)
         curr = self.process_frames(curr_frame)
 
+        # Lighting changes move the whole frame, they are not motion.
+        if self.learning_schedule.scene_changing:
+            return motion_detected
+
         frame_differencing = cv2.absdiff(prev, curr)
 
         _, thresholded_frame_pixels = cv2.threshold(
@@ -170,48 +459,230 @@ class ObjectDetection(object):
             cv2.THRESH_BINARY,
         )
 
+        # Sum the thresholded pixels tile by tile, the global sum is taken from the tiles.
+        self.motion_heatmap.update(thresholded_frame_pixels)
+
         # IF the sum of thresholded_frame_pixels is greater than the thresholded value. (Very large value divided for closer approximation).
-        if (np.sum(thresholded_frame_pixels) / 100) > camera.settings['sensitivity']:
+        if (self.motion_heatmap.total() / 100) > camera.settings['sensitivity']:
 
             # Set motion_detected boolean value to true.
             motion_detected = True 
 
+        # Otherwise check zones with their own sensitivity.
+        elif self.motion_heatmap.triggered_tiles().any():
+
+            motion_detected = True
+
         return motion_detected
 
 
-    def register_detections(self, frame, camera : Camera, threshold = 1500, range = 100):
+    def extract_contours(self, masked_frame : np.ndarray, minimum_area : int) -> list:
+
+        '''
+        Extract detections by tracing the outer contour of each blob in the mask, filtering them by the number of pixels the contour encloses.
+
+        :param: masked_frame - Binary foreground mask.
+        :param: minimum_area - Pixels a blob, including its holes, must exceed to be registered.
+        :return: detections - List of bounding boxes. [x, y, w, h]
+        '''
 
         detections = []
 
+        # Only outer contours are needed, holes inside blobs and blobs inside those holes belong to the enclosing blob.
+        highlighted_contours, _ = cv2.findContours(
+            masked_frame,
+            cv2.RETR_EXTERNAL,
+            cv2.CHAIN_APPROX_SIMPLE
+        )
+
+        for contour in highlighted_contours:
+
+            # Compute the bounding box data for that contour.
+            x, y, w, h = cv2.boundingRect(contour)
+
+            # A blob can never cover more pixels than its bounding box, skip small noise without measuring it.
+            if w * h <= minimum_area:
+                continue
+
+            # Fill the contour within its bounding box and count the pixels, the same area the component engine measures.
+            filled_contour = np.zeros((h, w), dtype=np.uint8)
+            cv2.drawContours(filled_contour, [contour], -1, 255, cv2.FILLED, offset=(-x, -y))
+
+            if cv2.countNonZero(filled_contour) > minimum_area:
+
+                # Append the data including size and coordinates to the list. 
+                detections.append( [x, y, w, h] )
+
+        return detections
+
+
+    def extract_components(self, masked_frame : np.ndarray, minimum_area : int) -> list:
+
+        '''
+        Extract detections by labelling the connected components of the mask, which returns the areas and bounding boxes of every blob as arrays.
+        Blobs are filtered with a single mask rather than a Python loop, keeping noisy masks with thousands of blobs cheap. Holes are filled
+        first, so every blob is measured and boxed exactly as its filled outer contour is by extract_contours.
+
+        :param: masked_frame - Binary foreground mask.
+        :param: minimum_area - Pixels a blob, including its holes, must exceed to be registered.
+        :return: detections - List of bounding boxes. [x, y, w, h]
+        '''
+
+        # Flood the background in from a border around the mask, 4-connected as the gaps between 8-connected blobs are.
+        # Whatever the flood cannot reach is a hole, or a blob inside one.
+        flooded = cv2.copyMakeBorder(masked_frame, 1, 1, 1, 1, cv2.BORDER_CONSTANT, value=0)
+        cv2.floodFill(flooded, None, (0, 0), 255)
+
+        filled_frame = cv2.bitwise_or(masked_frame, cv2.bitwise_not(flooded[1:-1, 1:-1]))
+
+        # Label blobs using 8-connectivity, matching the connectivity of contour tracing.
+        _, _, stats, _ = cv2.connectedComponentsWithStats(filled_frame, connectivity=8)
+
+        # Discard the first row, it describes the background.
+        stats = stats[1:]
+
+        # Keep blobs whose pixel area exceeds the minimum.
+        large_blobs = stats[:, cv2.CC_STAT_AREA] > minimum_area
+
+        # Return the bounding boxes of the remaining blobs.
+        return stats[large_blobs, :4].tolist()
+
+
+    def merge_detections(self, detections : list, merge_distance : int) -> list:
+
+        '''
+        Merge bounding boxes that overlap or sit within the merge distance of one another into a single box covering them all, so one object
+        fragmented into several blobs is registered once. Boxes are swept in order of their left edge, so each is only compared with the
+        boxes starting before its right edge, and neighbours are grouped transitively with a union find.
+
+        :param: detections - List of bounding boxes. [x, y, w, h]
+        :param: merge_distance - Largest gap in pixels between two boxes that are still merged.
+        :return: merged_detections - List of merged bounding boxes. [x, y, w, h]
+        '''
+
+        # Nothing to merge.
+        if len(detections) < 2:
+            return detections
+
+        # Convert boxes into corner coordinates. [x1, y1, x2, y2]
+        boxes = np.array(detections, dtype=np.int64)
+        boxes[:, 2:] += boxes[:, :2]
+
+        while True:
+
+            # Sweep the boxes from left to right.
+            boxes = boxes[np.argsort(boxes[:, 0], kind='stable')]
+            x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+
+            # Boxes after each one in the sweep that start within the merge distance of its right edge overlap it on the x axis.
+            # Only these pairs are generated, rather than every pair.
+            ends = np.searchsorted(x1, x2 + merge_distance, side='right')
+            counts = np.maximum(ends - np.arange(len(boxes)) - 1, 0)
+            firsts = np.repeat(np.arange(len(boxes)), counts)
+            seconds = firsts + 1 + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+
+            # Pairs are neighbours when the gap on the y axis is within the merge distance too.
+            on_y = (y1[firsts] <= y2[seconds] + merge_distance) & (y1[seconds] <= y2[firsts] + merge_distance)
+
+            # Group each box is in, every group is a tree whose root is its label.
+            parents = list(range(len(boxes)))
+
+            def find(index):
+                while parents[index] != index:
+                    # Point each visited box at its grandparent, keeping the trees shallow.
+                    parents[index] = parents[parents[index]]
+                    index = parents[index]
+                return index
+
+            for first, second in zip(firsts[on_y].tolist(), seconds[on_y].tolist()):
+                first_root, second_root = find(first), find(second)
+                if first_root != second_root:
+                    parents[max(first_root, second_root)] = min(first_root, second_root)
+
+            labels = np.array([find(index) for index in range(len(boxes))])
+
+            groups, labels = np.unique(labels, return_inverse=True)
+
+            # No boxes were merged, the remaining boxes are final.
+            if len(groups) == len(boxes):
+                break
+
+            # Union of the boxes in each group.
+            merged = np.empty((len(groups), 4), dtype=np.int64)
+            merged[:, :2] = np.iinfo(np.int64).max
+            merged[:, 2:] = np.iinfo(np.int64).min
+            np.minimum.at(merged[:, 0], labels, x1)
+            np.minimum.at(merged[:, 1], labels, y1)
+            np.maximum.at(merged[:, 2], labels, x2)
+            np.maximum.at(merged[:, 3], labels, y2)
+
+            # Merged boxes are larger and may now neighbour each other, repeat until stable.
+            boxes = merged
+
+        # Convert corner coordinates back into boxes. [x, y, w, h]
+        boxes[:, 2:] -= boxes[:, :2]
+
+        return boxes.tolist()
+
+
+    def mask_static_tiles(self, masked_frame : np.ndarray) -> np.ndarray:
+
+        '''
+        Clear the foreground in tiles of the motion heatmap that have not changed for a while, so blobs left there by the background model
+        are not extracted. Tiles under the active tracks are kept so intruders that stop moving are not lost.
+
+        :param: masked_frame - Thresholded foreground mask.
+        :return: np.ndarray - Mask with the static tiles cleared.
+        '''
+
+        # Heatmap has not seen frames of this size yet, nothing is known to be static.
+        if self.motion_heatmap.frame_shape != masked_frame.shape[:2]:
+            return masked_frame
+
+        active_tiles = self.motion_heatmap.active_tiles(self.learning_schedule.frozen_boxes)
+
+        if active_tiles.all():
+            return masked_frame
+
+        # No tile is active, there is nothing to extract.
+        if not active_tiles.any():
+            return np.zeros_like(masked_frame)
+
+        return cv2.bitwise_and(masked_frame, self.motion_heatmap.tile_mask(active_tiles))
+
+
+    def register_detections(self, frame, camera : Camera, threshold = 1500, range = 100):
+
         # Check frames passed are not None Type. Raise exception if they are. 
         if frame is None:
             return ValueError('Provided frames were returned as None!')
 
+        # Read the settings once, the whole frame is processed with the same snapshot.
+        settings = camera.settings
+
         processed_frame = self.process_frames(frame)
 
+        # Most of the mask is the scene changing rather than objects, skip extraction until the background is relearnt.
+        if self.learning_schedule.scene_changing:
+            return frame, []
+
         _, masked_frame = cv2.threshold(
             processed_frame, 
-            camera.settings['range'],
+            settings['range'],
             255,
             cv2.THRESH_BINARY
         )
 
-        highlighted_contours, _ = cv2.findContours(
-            masked_frame,
-            cv2.RETR_TREE,
-            cv2.CHAIN_APPROX_SIMPLE
-        )
+        masked_frame = self.mask_static_tiles(masked_frame)
 
-        for contour in highlighted_contours:
-
-            contour_area = cv2.contourArea(contour)
-
-            if contour_area > camera.settings['threshold']:
+        # Extract blobs with the engine selected in the settings.
+        if settings['extraction_engine'] == 1:
+            detections = self.extract_components(masked_frame, settings['threshold'])
+        else:
+            detections = self.extract_contours(masked_frame, settings['threshold'])
 
-                # Compute the bounding box data for that contour.
-                x, y, w, h = cv2.boundingRect(contour)
-
-                # Append the data including size and coordinates to the list. 
-                detections.append( [x, y, w, h] )
+        # Merge fragments of the same object before they reach the tracker.
+        if settings['merge_toggle']:
+            detections = self.merge_detections(detections, settings['merge_distance'])
 
         return frame, detections
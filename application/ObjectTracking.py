@@ -1,4 +1,7 @@
-from typing import List, Tuple, Dict
+from typing import List, Tuple, Dict, Optional
+from ThreatEngine import ThreatEngine, ThreatPolicy
+from Trajectories import TrajectoryStore
+from Zones import ZoneMonitor
 import math, time, cv2, numpy as np
 
 
@@ -8,7 +11,7 @@ class ObjectTracking(object):
     Class to seperate and handle logic for identifying and keeping track of objects. 
     '''
 
-    def __init__(self, EUCLIDEAN_DISTANCE_THRESHOLD : int = 225, MAXIMUM_THREAT_LEVEL : int = 3, DEREGISTRATION_TIME : int = 10, ESCALATION_TIME : int = 10) -> None:
+    def __init__(self, EUCLIDEAN_DISTANCE_THRESHOLD : int = 225, DEREGISTRATION_TIME : int = 10, threat_policy : Optional[ThreatPolicy] = None, PREDICTION_HORIZON : float = 1.0, SPEED_REFERENCE : float = 200, ZONES_PATH : Optional[str] = None) -> None:
         
         # Dictionary to hold detections data which can be used for IDs, bounding boxes and center points. 
         self.detection_center_points : Dict[int, Tuple[int, int]] = {}
@@ -25,17 +28,33 @@ class ObjectTracking(object):
         # Minimum number of pixels between each center point before they are classed as new detections. 
         self.EUCLIDEAN_DISTANCE_THRESHOLD = EUCLIDEAN_DISTANCE_THRESHOLD
 
-        # Dictionary to store detection ID accompanied by its threat level. 
-        self.detection_threat_level : Dict[int, int] = {}
-        
-        # Dictionary storing detection ID and last time its threat level was escalated.
-        self.last_increments : Dict[int, float] = {}
+        # Threat level of every detection, escalated and decayed by the policy supplied.
+        self.threat_engine = ThreatEngine(threat_policy)
+
+        # Recent path of every detection, for drawing trails and spotting loitering.
+        self.trajectories = TrajectoryStore()
+
+        # Tripwires and zones the detections are tested against, persisted to ZONES_PATH.
+        self.zones = ZoneMonitor(ZONES_PATH)
+
+        # Dictionary storing detection ID and its velocity in pixels per second, used to predict positions between detections.
+        self.track_velocities : Dict[int, Tuple[float, float]] = {}
+
+        # IDs of the detections returned by the latest update.
+        self.latest_IDs : List[int] = []
 
-        # Maximum threat level allowed.
-        self.MAXIMUM_THREAT_LEVEL = MAXIMUM_THREAT_LEVEL
+        # Events raised by the latest update. (event_type, ID, threat_level, (x, y, w, h))
+        self.track_events : List[Tuple[str, int, int, Tuple[int, int, int, int]]] = []
 
-        # Time taken to escalate a detections threat level. 
-        self.ESCALATION_TIME = ESCALATION_TIME
+        # Time in seconds over which confidence in a stationary tracks predicted position decays.
+        self.PREDICTION_HORIZON = PREDICTION_HORIZON
+
+        # Speed in pixels per second at which prediction confidence decays twice as fast.
+        self.SPEED_REFERENCE = SPEED_REFERENCE
+
+        # Latest settings snapshot from the settings store, and the snapshot last applied by the pipeline. See apply_settings.
+        self.pending_settings = None
+        self.applied_settings = None
 
         self.kf_filter = cv2.KalmanFilter(4, 2)  # State vector size is now 8, Measurement vector size is 4
 
@@ -59,12 +78,48 @@ class ObjectTracking(object):
         ], np.float32) * 0.05
 
 
+    # Settings the threat policy is built from, see apply_settings.
+    SETTINGS_KEYS = ('escalation_time', 'escalation_speed', 'decay_time')
+
+
+    def apply_settings(self, settings) -> None:
+
+        '''
+        Settings store subscriber, called on the thread updating the settings when the threat settings change. The snapshot is only recorded,
+        apply_pending_settings applies it on the pipeline thread before the next frame so the policy never changes during an update.
+
+        :param: settings - Settings snapshot.
+        '''
+
+        self.pending_settings = settings
+
+
+    def apply_pending_settings(self) -> None:
+
+        '''
+        Apply the latest threat settings to the policy if they have not been applied yet. Called by the pipeline before each frame.
+        '''
+
+        settings = self.pending_settings
+
+        if settings is None or settings is self.applied_settings:
+            return
+
+        policy = self.threat_engine.policy
+
+        policy.DWELL_TIME = settings['escalation_time']
+        policy.SPEED_THRESHOLD = settings['escalation_speed']
+        policy.DECAY_TIME = settings['decay_time']
+
+        self.applied_settings = settings
+
+
     '''
     Functions to handle the registering, deregistering and tracking of object detections. 
     '''
     
     
-    def update_detections_V3(self, detections : List[Tuple[int, int, int, int, int]]) -> List[Tuple[int, int, int, int, int]]:
+    def update_detections_V3(self, detections : List[Tuple[int, int, int, int]], timestamp : Optional[float] = None) -> List[Tuple[int, int, int, int, int, int]]:
 
         '''
         Accepts a list of data concerned with the detections and their bounding box data. This will be used to calculate the Euclidean Distance (straight line distance) between
@@ -72,14 +127,22 @@ class ObjectTracking(object):
         classed as the same object/detection. If the distance is greater than the supplied threshold, it can be classed as a separate object. 
 
         :param: detections - List of detections data (x, y, w, h)
-        :return: bounding_boxes - Updated list of detections data (x, y, w, h)
+        :param: timestamp - Time the detections were made, defaults to now. Recorded footage supplies its own timeline.
+        :return: bounding_boxes - Updated list of detections data (x, y, w, h, ID, threat_level)
         '''
 
-        intial_time : float = time.time()
+        intial_time : float = time.time() if timestamp is None else timestamp
 
         # Initialise list storing bounding box data. 
         bounding_boxes : List[Tuple[int, int, int, int]] = []
 
+        # Clear events raised by the previous update.
+        self.track_events = []
+
+        # IDs and speeds of the detections matched to existing tracks, passed to the threat engine in one go.
+        seen_IDs : List[int] = []
+        seen_speeds : List[float] = []
+
         # Iterate over detections parameterised. 
         for detection in detections:
             
@@ -105,20 +168,19 @@ class ObjectTracking(object):
                     # Determine whether that detection exists already or not.
                     self.detection_center_points[detection_ID] = (center_point_x, center_point_y)
 
+                    # Estimate velocity from the previous sighting.
+                    last_timed, last_x, last_y, _, _ = self.last_detected[detection_ID]
+                    if intial_time > last_timed:
+                        self.track_velocities[detection_ID] = ((x - last_x) / (intial_time - last_timed), (y - last_y) / (intial_time - last_timed))
+
                     # Append last time detection was seen to the dictionary with its ID.
                     self.last_detected[detection_ID] = intial_time, x, y, w, h
 
-                    # Check detections current time exceeds the threat escalation timer before its level can be raised.
-                    if intial_time - self.last_increments.get(detection_ID, 0) > self.ESCALATION_TIME:
-
-                        # Append detection ID and its current threat level to the dictionary. 
-                        self.detection_threat_level[detection_ID] = min(self.detection_threat_level.get(detection_ID, 0) + 1, self.MAXIMUM_THREAT_LEVEL)
-
-                        # Set time detections threat level was last escalated.
-                        self.last_increments[detection_ID] = intial_time
+                    seen_IDs.append(detection_ID)
+                    seen_speeds.append(math.hypot(*self.track_velocities.get(detection_ID, (0.0, 0.0))))
 
-                    # Update the bounding_box list with current data. 
-                    bounding_boxes.append([x, y, w, h, self.detection_threat_level[detection_ID]])
+                    # Update the bounding_box list with current data, the threat level is filled in once the threat engine has run.
+                    bounding_boxes.append([x, y, w, h, detection_ID, 0])
 
                     # Detection has been handled, set its status as already_detected to True. 
                     already_detected = True
@@ -136,16 +198,38 @@ class ObjectTracking(object):
                 self.last_detected[self.ID_increment_counter] = intial_time, x, y, w, h
 
                 # Initalise the threat level for that detection.
-                self.detection_threat_level[self.ID_increment_counter] = 1
+                threat_level = self.threat_engine.register(self.ID_increment_counter, intial_time)
 
-                self.last_increments[self.ID_increment_counter] = intial_time
+                # New detections are assumed stationary until seen again.
+                self.track_velocities[self.ID_increment_counter] = (0.0, 0.0)
 
                 # Update the bounding_box list with current data.
-                bounding_boxes.append([x, y, w, h, 1])
+                bounding_boxes.append([x, y, w, h, self.ID_increment_counter, threat_level])
+
+                self.track_events.append(('registered', self.ID_increment_counter, threat_level, (x, y, w, h)))
 
                 # Increment the detections counter. 
                 self.ID_increment_counter += 1
         
+        # IDs and box centers of the detections returned.
+        box_IDs = [bounding_box[4] for bounding_box in bounding_boxes]
+        box_centers = [(x + w / 2, y + h / 2) for x, y, w, h, _, _ in bounding_boxes]
+
+        # Test every detection against the tripwires and zones at once.
+        zone_events, in_zone = self.zones.update(box_IDs, box_centers)
+        zone_membership = dict(zip(box_IDs, in_zone.tolist()))
+
+        # Escalate and decay every detection against the policy in a single update.
+        self.threat_engine.observe(seen_IDs, intial_time, seen_speeds, [zone_membership[detection_ID] for detection_ID in seen_IDs])
+
+        for detection_ID, previous_level, threat_level in self.threat_engine.update(intial_time):
+            _, x, y, w, h = self.last_detected[detection_ID]
+            self.track_events.append(('escalated' if threat_level > previous_level else 'deescalated', detection_ID, threat_level, (x, y, w, h)))
+
+        for event_type, detection_ID in zone_events:
+            _, x, y, w, h = self.last_detected[detection_ID]
+            self.track_events.append((event_type, detection_ID, self.threat_engine.level(detection_ID), (x, y, w, h)))
+
         # Initialise list to store deregistrations.
         deregistered_detections : List[int] = []
         
@@ -160,21 +244,87 @@ class ObjectTracking(object):
                 # Append to deregistrations list. 
                 deregistered_detections.append(detection_ID)
 
-            else:
-                # Otherwise decrease the threat level for active detections.
-                self.detection_threat_level[detection_ID] = max(self.detection_threat_level.get(detection_ID, 1), -1, 1)
-
         # Iterate over each deregistration stored. 
         for deregistration_ID in deregistered_detections:
+
+            _, x, y, w, h = self.last_detected[deregistration_ID]
+            self.track_events.append(('deregistered', deregistration_ID, self.threat_engine.level(deregistration_ID), (x, y, w, h)))
             
             # Remove the deregistrations from the dictionaries. 
             del self.detection_center_points[deregistration_ID]
             del self.last_detected[deregistration_ID]
-            del self.detection_threat_level[deregistration_ID]
-            del self.last_increments[deregistration_ID]
+            self.threat_engine.deregister(deregistration_ID)
+            self.trajectories.deregister(deregistration_ID)
+            self.zones.forget(deregistration_ID)
+            self.track_velocities.pop(deregistration_ID, None)
+
+        # Fill in the threat levels of the detections returned.
+        for bounding_box in bounding_boxes:
+            bounding_box[5] = self.threat_engine.level(bounding_box[4])
+
+        # Extend the paths of the detections returned with their box centers.
+        self.trajectories.record(box_IDs, box_centers, intial_time)
+
+        # Remember which detections are in view for predictions between detections.
+        self.latest_IDs = [bounding_box[4] for bounding_box in bounding_boxes]
         
         # Return bounding_boxes list for later access. 
         return bounding_boxes
+
+
+    def predict_detections(self) -> List[Tuple[int, int, int, int, int, int]]:
+
+        '''
+        Propagate the detections in view at the latest update along their velocities, bridging frames where detection is skipped.
+
+        :return: bounding_boxes - Predicted list of detections data (x, y, w, h, ID, threat_level)
+        '''
+
+        current_time : float = time.time()
+
+        bounding_boxes = []
+
+        for detection_ID in self.latest_IDs:
+
+            # Detection may have been deregistered since.
+            if detection_ID not in self.last_detected:
+                continue
+
+            last_timed, x, y, w, h = self.last_detected[detection_ID]
+            velocity_x, velocity_y = self.track_velocities.get(detection_ID, (0.0, 0.0))
+
+            # Move the box along its velocity for the time elapsed since it was last seen.
+            elapsed_time = current_time - last_timed
+
+            bounding_boxes.append([int(x + velocity_x * elapsed_time), int(y + velocity_y * elapsed_time), w, h, detection_ID, self.threat_engine.level(detection_ID)])
+
+        return bounding_boxes
+
+
+    def prediction_confidence(self) -> float:
+
+        '''
+        Confidence in the predicted positions of the detections in view, decaying with the time since they were seen and with their speed.
+
+        :return: float - Confidence of the least certain prediction between 0 and 1, 1 when nothing is in view.
+        '''
+
+        current_time : float = time.time()
+
+        confidence = 1.0
+
+        for detection_ID in self.latest_IDs:
+
+            if detection_ID not in self.last_detected:
+                continue
+
+            elapsed_time = current_time - self.last_detected[detection_ID][0]
+            speed = math.hypot(*self.track_velocities.get(detection_ID, (0.0, 0.0)))
+
+            # Faster detections drift further from their predictions, so confidence decays quicker.
+            confidence = min(confidence, math.exp(-elapsed_time * (1 + speed / self.SPEED_REFERENCE) / self.PREDICTION_HORIZON))
+
+        return confidence
     
 
     def kf_predict(self, x, y):
@@ -191,7 +341,7 @@ class ObjectTracking(object):
 
         prediction = self.kf_filter.predict()
 
-        x, y = int(prediction[0]), int(prediction[1])
+        x, y = int(prediction[0][0]), int(prediction[1][0])
 
         return x, y
     
\ No newline at end of file
@@ -0,0 +1,159 @@
+from typing import Any, Callable, Dict, Optional
+from contextlib import contextmanager
+
+from ObjectTracking import ObjectTracking
+from ObjectDetection import ObjectDetection
+from FileHandling import FileHandling
+from Database import CaptureDatabase
+from Alerts import AlertDispatcher
+from Camera import Camera
+
+import threading, time
+
+
+class Services(object):
+
+    '''
+    Creates the applications shared services on first use and hands every caller the same instance, so the capture device is opened exactly
+    once and nothing is built that is never used. The time each service and startup phase takes is recorded and can be reported.
+    '''
+
+    def __init__(self, SOURCE = 0, SETTINGS_PATH : Optional[str] = './settings.json', DATABASE_PATH : str = './captures.db', BACKGROUND_SNAPSHOT_PATH : Optional[str] = './background.png', ZONES_PATH : Optional[str] = './zones.json', ALERTS_PATH : Optional[str] = './alerts.json') -> None:
+
+        # Capture device or footage the camera reads from.
+        self.SOURCE = SOURCE
+
+        # File the settings are persisted to.
+        self.SETTINGS_PATH = SETTINGS_PATH
+
+        # File the capture database is stored in.
+        self.DATABASE_PATH = DATABASE_PATH
+
+        # Image the learnt background is saved to, restoring it after a restart.
+        self.BACKGROUND_SNAPSHOT_PATH = BACKGROUND_SNAPSHOT_PATH
+
+        # File the tripwires and zones are persisted to.
+        self.ZONES_PATH = ZONES_PATH
+
+        # File describing where alerts are delivered, alerts are disabled without it.
+        self.ALERTS_PATH = ALERTS_PATH
+
+        # Services created so far, keyed by name.
+        self.instances : Dict[str, Any] = {}
+
+        # Seconds taken by each service and startup phase, in the order they finished.
+        self.phase_times : Dict[str, float] = {}
+
+        # Lock ensuring a service requested from two threads at once is only created once.
+        self.lock = threading.RLock()
+
+
+    @contextmanager
+    def phase(self, name : str):
+
+        '''
+        Time a startup phase.
+
+        :param: name - Name the phase is reported under.
+        '''
+
+        start_time = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            self.phase_times[name] = time.perf_counter() - start_time
+
+
+    def provide(self, name : str, factory : Callable[[], Any]) -> Any:
+
+        '''
+        Return the named service, creating it with the factory on first use. Dependencies should be resolved before calling so that each
+        services time only covers its own construction.
+
+        :param: name - Name of the service.
+        :param: factory - Function creating the service.
+        :return: Shared instance of the service.
+        '''
+
+        with self.lock:
+
+            if name not in self.instances:
+                with self.phase(name):
+                    self.instances[name] = factory()
+
+            return self.instances[name]
+
+
+    @property
+    def camera(self) -> Camera:
+
+        return self.provide('camera', lambda: Camera(self.SOURCE, self.SETTINGS_PATH))
+
+
+    @property
+    def database(self) -> CaptureDatabase:
+
+        return self.provide('database', lambda: CaptureDatabase(self.DATABASE_PATH))
+
+
+    @property
+    def alert_dispatcher(self) -> AlertDispatcher:
+
+        return self.provide('alert_dispatcher', lambda: AlertDispatcher.from_file(self.ALERTS_PATH))
+
+
+    @property
+    def file_handling(self) -> FileHandling:
+
+        database = self.database
+
+        return self.provide('file_handling', lambda: FileHandling(database = database))
+
+
+    @property
+    def object_tracking(self) -> ObjectTracking:
+
+        camera = self.camera
+
+        def create() -> ObjectTracking:
+
+            object_tracking = ObjectTracking(ZONES_PATH = self.ZONES_PATH)
+
+            # Keep the threat policy in line with the settings.
+            camera.settings_store.subscribe(object_tracking.apply_settings, ObjectTracking.SETTINGS_KEYS)
+
+            return object_tracking
+
+        return self.provide('object_tracking', create)
+
+
+    @property
+    def object_detection(self) -> ObjectDetection:
+
+        camera, object_tracking, file_handling = self.camera, self.object_tracking, self.file_handling
+
+        def create() -> ObjectDetection:
+
+            object_detection = ObjectDetection(object_tracking = object_tracking, file_handling = file_handling, BACKGROUND_SNAPSHOT_PATH = self.BACKGROUND_SNAPSHOT_PATH)
+
+            # Rebuild the background model only when the settings it depends on change.
+            camera.settings_store.subscribe(object_detection.apply_settings, ObjectDetection.SETTINGS_KEYS)
+
+            return object_detection
+
+        return self.provide('object_detection', create)
+
+
+    def report(self) -> None:
+
+        '''
+        Print how long each service and startup phase took.
+
+        :return: N/A
+        '''
+
+        print('Startup times:')
+
+        for name, elapsed_time in self.phase_times.items():
+            print(f'  {name:<18}{1000 * elapsed_time:.1f}ms')
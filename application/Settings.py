@@ -0,0 +1,181 @@
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Mapping, Optional, Tuple
+from types import MappingProxyType
+import json, os, threading
+
+
+class SettingsStore(object):
+
+    '''
+    Holds the device settings as immutable snapshots. Readers take the current snapshot once and use it for a whole frame, while updates
+    validate the changes, build a new snapshot and swap it in with a single assignment, so a reader never sees a half applied update.
+    Snapshots are persisted to a JSON file with an atomic write and reloaded on startup. Pipeline stages subscribe to the keys they derive
+    state from and are only notified when one of those keys changes.
+    '''
+
+    def __init__(self, defaults : Dict[str, Any], limits : Dict[str, Tuple[int, int]], SETTINGS_PATH : Optional[str] = None) -> None:
+
+        # Default value of every setting, also fixing each settings type.
+        self.defaults = dict(defaults)
+
+        # Inclusive range each numeric setting must fall within. {name : (minimum, maximum)}
+        self.limits = limits
+
+        # File the settings are persisted to, None to keep them in memory only.
+        self.SETTINGS_PATH = SETTINGS_PATH
+
+        # Functions notified when the keys they watch change. [(keys, callback)]
+        self.subscribers : List[Tuple[Optional[FrozenSet[str]], Callable[[Mapping[str, Any]], None]]] = []
+
+        # Lock serialising updates, reads never take it. Reentrant so toggles can read and update as one step.
+        self.lock = threading.RLock()
+
+        # Current settings, replaced as a whole on every update.
+        self.snapshot : Mapping[str, Any] = MappingProxyType(self.load())
+
+
+    def validate(self, name : str, value : Any) -> Any:
+
+        '''
+        Check a setting exists and convert its value to the settings type, enforcing its limits.
+
+        :param: name - Name of the setting.
+        :param: value - New value, strings are accepted as submitted by forms.
+        :return: value - Value converted to the settings type.
+        '''
+
+        if name not in self.defaults:
+            raise KeyError(f'Unknown setting {name}!')
+
+        # Toggles are booleans, everything else an integer.
+        if isinstance(self.defaults[name], bool):
+            if isinstance(value, str):
+                return value.lower() in ('1', 'true', 'on')
+            return bool(value)
+
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            raise ValueError(f'{name} must be a whole number!')
+
+        minimum, maximum = self.limits.get(name, (None, None))
+
+        if (minimum is not None and value < minimum) or (maximum is not None and value > maximum):
+            raise ValueError(f'{name} must be between {minimum} and {maximum}!')
+
+        return value
+
+
+    def load(self) -> Dict[str, Any]:
+
+        '''
+        Read persisted settings over the defaults. Unknown settings and invalid values are skipped, keeping the default.
+
+        :return: dict - Settings to start with.
+        '''
+
+        settings = dict(self.defaults)
+
+        if self.SETTINGS_PATH is None or not os.path.exists(self.SETTINGS_PATH):
+            return settings
+
+        try:
+            with open(self.SETTINGS_PATH) as settings_file:
+                stored_settings = json.load(settings_file)
+        except (OSError, ValueError) as error:
+            print(f'Could not read {self.SETTINGS_PATH}, using default settings!\n {error}')
+            return settings
+
+        for name, value in stored_settings.items():
+            try:
+                settings[name] = self.validate(name, value)
+            except (KeyError, ValueError) as error:
+                print(f'Ignoring stored setting {name}!\n {error}')
+
+        return settings
+
+
+    def persist(self, settings : Mapping[str, Any]) -> None:
+
+        '''
+        Write settings to the settings file atomically. The file is written under a temporary name, flushed to storage and moved into place,
+        so a power cut leaves either the old or the new settings, never a truncated file.
+
+        :param: settings - Settings to write.
+        '''
+
+        if self.SETTINGS_PATH is None:
+            return
+
+        temporary_path = f'{self.SETTINGS_PATH}.tmp'
+
+        with open(temporary_path, 'w') as settings_file:
+            json.dump(dict(settings), settings_file, indent=4)
+            settings_file.flush()
+            os.fsync(settings_file.fileno())
+
+        os.replace(temporary_path, self.SETTINGS_PATH)
+
+
+    def update(self, changes : Dict[str, Any]) -> Mapping[str, Any]:
+
+        '''
+        Validate and apply changes, persisting and then publishing a new snapshot and notifying subscribers watching the keys that changed.
+        Nothing is applied if any change is invalid or the settings cannot be written.
+
+        :param: changes - New values keyed by setting name.
+        :return: snapshot - Settings after the update.
+        '''
+
+        with self.lock:
+
+            validated = {name : self.validate(name, value) for name, value in changes.items()}
+
+            changed = {name for name, value in validated.items() if self.snapshot[name] != value}
+
+            if not changed:
+                return self.snapshot
+
+            settings = MappingProxyType({**self.snapshot, **validated})
+
+            # Persist before publishing, a failed write leaves the running settings matching the file.
+            self.persist(settings)
+
+            # Swap the new snapshot in, readers holding the old one finish their frame with it.
+            self.snapshot = settings
+
+            for keys, callback in self.subscribers:
+                if keys is None or keys & changed:
+                    callback(self.snapshot)
+
+            return self.snapshot
+
+
+    def toggle(self, name : str) -> Mapping[str, Any]:
+
+        '''
+        Negate a toggle setting.
+
+        :param: name - Name of the toggle, including its _toggle suffix.
+        :return: snapshot - Settings after the update.
+        '''
+
+        if not isinstance(self.defaults.get(name), bool):
+            raise KeyError(f'Unknown toggle {name}!')
+
+        with self.lock:
+            return self.update({name : not self.snapshot[name]})
+
+
+    def subscribe(self, callback : Callable[[Mapping[str, Any]], None], keys : Optional[Iterable[str]] = None) -> None:
+
+        '''
+        Notify a function whenever any of the keys given change. The function is called once straight away with the current snapshot so
+        it can build its derived state.
+
+        :param: callback - Function called with the new snapshot.
+        :param: keys - Settings the function depends on, None for every setting.
+        '''
+
+        with self.lock:
+            self.subscribers.append((None if keys is None else frozenset(keys), callback))
+            callback(self.snapshot)
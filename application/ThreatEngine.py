@@ -0,0 +1,209 @@
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+
+class ThreatPolicy(object):
+
+    '''
+    Rules deciding how far a tracks threat level rises and how quickly it falls again. Each rule adds levels on top of the minimum, the
+    sum being the level the track is escalated to. Once the rules no longer support a tracks level it decays one level at a time.
+    '''
+
+    def __init__(self, MINIMUM_LEVEL : int = 1, MAXIMUM_LEVEL : int = 3, DWELL_TIME : float = 10, SPEED_THRESHOLD : float = 0, SPEED_LEVELS : int = 1, ZONE_LEVELS : int = 1, DECAY_TIME : float = 5, UNSEEN_TIME : float = 2) -> None:
+
+        # Level new tracks start at and decay back to.
+        self.MINIMUM_LEVEL = MINIMUM_LEVEL
+
+        # Highest threat level allowed.
+        self.MAXIMUM_LEVEL = MAXIMUM_LEVEL
+
+        # Seconds in view per level raised, 0 to ignore dwell time.
+        self.DWELL_TIME = DWELL_TIME
+
+        # Speed in pixels per second above which a track is raised SPEED_LEVELS, 0 to ignore speed.
+        self.SPEED_THRESHOLD = SPEED_THRESHOLD
+        self.SPEED_LEVELS = SPEED_LEVELS
+
+        # Levels raised while a track is inside a watched zone.
+        self.ZONE_LEVELS = ZONE_LEVELS
+
+        # Seconds between each level dropped once the rules no longer support a tracks level.
+        self.DECAY_TIME = DECAY_TIME
+
+        # Seconds unseen after which a track no longer earns levels, letting it decay until it is deregistered.
+        self.UNSEEN_TIME = UNSEEN_TIME
+
+
+class ThreatEngine(object):
+
+    '''
+    Threat levels of every track, held as arrays so the policy is applied to all tracks in a single vectorised update per frame.
+    Each track owns a slot in the arrays, freed slots are recycled and the arrays double in size when they run out.
+    '''
+
+    def __init__(self, policy : Optional[ThreatPolicy] = None, CAPACITY : int = 64) -> None:
+
+        # Rules applied on every update.
+        self.policy = policy if policy is not None else ThreatPolicy()
+
+        # Slot held by each track ID.
+        self.slots : Dict[int, int] = {}
+
+        # Slots free for new tracks, popped from the end.
+        self.free_slots : List[int] = []
+
+        # Track state, one entry per slot. Free slots have a track ID of -1.
+        self.track_IDs = np.empty(0, dtype=np.int64)
+        self.levels = np.empty(0, dtype=np.int32)
+        self.first_seen = np.empty(0, dtype=np.float64)
+        self.last_seen = np.empty(0, dtype=np.float64)
+        self.supported_at = np.empty(0, dtype=np.float64)
+        self.speeds = np.empty(0, dtype=np.float32)
+        self.in_zone = np.empty(0, dtype=bool)
+
+        self.grow(CAPACITY)
+
+
+    def grow(self, capacity : int) -> None:
+
+        '''
+        Extend the state arrays to hold more tracks.
+
+        :param: capacity - New number of slots.
+        '''
+
+        previous_capacity = len(self.track_IDs)
+
+        def extend(array : np.ndarray, fill) -> np.ndarray:
+            return np.concatenate((array, np.full(capacity - previous_capacity, fill, dtype=array.dtype)))
+
+        self.track_IDs = extend(self.track_IDs, -1)
+        self.levels = extend(self.levels, 0)
+        self.first_seen = extend(self.first_seen, 0)
+        self.last_seen = extend(self.last_seen, 0)
+        self.supported_at = extend(self.supported_at, 0)
+        self.speeds = extend(self.speeds, 0)
+        self.in_zone = extend(self.in_zone, False)
+
+        # Lowest slots are handed out first.
+        self.free_slots = list(range(capacity - 1, previous_capacity - 1, -1)) + self.free_slots
+
+
+    def register(self, track_ID : int, timestamp : float) -> int:
+
+        '''
+        Start tracking the threat of a new track.
+
+        :param: track_ID - ID of the track.
+        :param: timestamp - Time the track was first seen.
+        :return: level - Starting threat level.
+        '''
+
+        if not self.free_slots:
+            self.grow(2 * len(self.track_IDs))
+
+        slot = self.free_slots.pop()
+        self.slots[track_ID] = slot
+
+        self.track_IDs[slot] = track_ID
+        self.levels[slot] = self.policy.MINIMUM_LEVEL
+        self.first_seen[slot] = self.last_seen[slot] = self.supported_at[slot] = timestamp
+        self.speeds[slot] = 0
+        self.in_zone[slot] = False
+
+        return self.policy.MINIMUM_LEVEL
+
+
+    def observe(self, track_IDs : List[int], timestamp : float, speeds : List[float], in_zone : Optional[List[bool]] = None) -> None:
+
+        '''
+        Record the tracks seen in a frame.
+
+        :param: track_IDs - IDs of the tracks seen.
+        :param: timestamp - Time they were seen.
+        :param: speeds - Speed of each track in pixels per second.
+        :param: in_zone - Whether each track is inside a watched zone, defaults to outside.
+        '''
+
+        if not track_IDs:
+            return
+
+        slots = np.fromiter((self.slots[track_ID] for track_ID in track_IDs), dtype=np.intp, count=len(track_IDs))
+
+        self.last_seen[slots] = timestamp
+        self.speeds[slots] = speeds
+        self.in_zone[slots] = False if in_zone is None else in_zone
+
+
+    def deregister(self, track_ID : int) -> None:
+
+        '''
+        Stop tracking a track, freeing its slot.
+
+        :param: track_ID - ID of the track.
+        '''
+
+        slot = self.slots.pop(track_ID, None)
+
+        if slot is not None:
+            self.track_IDs[slot] = -1
+            self.free_slots.append(slot)
+
+
+    def level(self, track_ID : int) -> int:
+
+        '''
+        Current threat level of a track.
+
+        :param: track_ID - ID of the track.
+        :return: int - Threat level.
+        '''
+
+        return int(self.levels[self.slots[track_ID]])
+
+
+    def update(self, timestamp : float) -> List[Tuple[int, int, int]]:
+
+        '''
+        Apply the policy to every track. Tracks are escalated straight to the level the rules support, and decay one level every
+        DECAY_TIME seconds while the rules support less.
+
+        :param: timestamp - Current time.
+        :return: changes - Tracks whose level changed. [(track_ID, previous_level, level)]
+        '''
+
+        policy = self.policy
+
+        active = self.track_IDs >= 0
+
+        # Level supported by each rule, summed over the minimum.
+        target_levels = np.full(len(self.levels), policy.MINIMUM_LEVEL, dtype=np.int32)
+
+        if policy.DWELL_TIME > 0:
+            target_levels += ((self.last_seen - self.first_seen) // policy.DWELL_TIME).astype(np.int32)
+
+        if policy.SPEED_THRESHOLD > 0:
+            target_levels += (self.speeds > policy.SPEED_THRESHOLD) * np.int32(policy.SPEED_LEVELS)
+
+        target_levels += self.in_zone * np.int32(policy.ZONE_LEVELS)
+
+        # Tracks out of view earn nothing.
+        target_levels[timestamp - self.last_seen > policy.UNSEEN_TIME] = policy.MINIMUM_LEVEL
+
+        np.clip(target_levels, policy.MINIMUM_LEVEL, policy.MAXIMUM_LEVEL, out=target_levels)
+
+        supported = active & (target_levels >= self.levels)
+        escalated = active & (target_levels > self.levels)
+        decayed = active & ~supported & (timestamp - self.supported_at >= policy.DECAY_TIME)
+
+        previous_levels = self.levels.copy()
+
+        self.levels[escalated] = target_levels[escalated]
+        self.levels[decayed] -= 1
+
+        # Decay is timed from when the level was last supported, each level dropped restarts the timer.
+        self.supported_at[supported | decayed] = timestamp
+
+        changed = np.flatnonzero(escalated | decayed)
+
+        return [(int(self.track_IDs[slot]), int(previous_levels[slot]), int(self.levels[slot])) for slot in changed]
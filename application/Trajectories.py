@@ -0,0 +1,177 @@
+from typing import Dict, List, Optional
+import numpy as np
+
+
+class TrajectoryStore(object):
+
+    '''
+    Path history of every track, held in one preallocated ring buffer per track slot. Each slot keeps the last HISTORY_LENGTH center
+    points, overwriting the oldest, and slots are recycled when tracks are deregistered. Memory is fixed at construction however long
+    tracks stay in view; once every slot is taken the track updated least recently is evicted.
+    '''
+
+    def __init__(self, HISTORY_LENGTH : int = 64, MAXIMUM_TRACKS : int = 128, SAMPLE_INTERVAL : float = 0.5) -> None:
+
+        # Points kept per track.
+        self.HISTORY_LENGTH = HISTORY_LENGTH
+
+        # Tracks stored at once.
+        self.MAXIMUM_TRACKS = MAXIMUM_TRACKS
+
+        # Seconds between the points recorded for a track, so the history spans HISTORY_LENGTH * SAMPLE_INTERVAL seconds at any frame rate.
+        self.SAMPLE_INTERVAL = SAMPLE_INTERVAL
+
+        # Slot held by each track ID.
+        self.slots : Dict[int, int] = {}
+
+        # Slots free for new tracks, lowest handed out first.
+        self.free_slots : List[int] = list(range(MAXIMUM_TRACKS - 1, -1, -1))
+
+        # Track ID held by each slot, -1 when free.
+        self.track_IDs = np.full(MAXIMUM_TRACKS, -1, dtype=np.int64)
+
+        # Center points and the times they were recorded. [slot, sample, (x, y)]
+        self.points = np.zeros((MAXIMUM_TRACKS, HISTORY_LENGTH, 2), dtype=np.float32)
+        self.times = np.zeros((MAXIMUM_TRACKS, HISTORY_LENGTH), dtype=np.float64)
+
+        # Index the next point of each slot is written to, and the number of points held.
+        self.heads = np.zeros(MAXIMUM_TRACKS, dtype=np.intp)
+        self.counts = np.zeros(MAXIMUM_TRACKS, dtype=np.intp)
+
+        # Time each track was first recorded, kept apart from the ring so it survives being overwritten.
+        self.first_seen = np.zeros(MAXIMUM_TRACKS, dtype=np.float64)
+
+
+    def allocate(self, track_ID : int, timestamp : float, in_use : Optional[np.ndarray] = None) -> int:
+
+        '''
+        Give a new track a slot, evicting the track updated least recently when none are free.
+
+        :param: track_ID - ID of the track.
+        :param: timestamp - Time the track was first recorded.
+        :param: in_use - Slots that must not be evicted, such as those of tracks seen in the same frame.
+        :return: slot - Slot assigned, -1 if every slot is in use.
+        '''
+
+        if not self.free_slots:
+
+            last_times = np.where(self.counts > 0, self.times[np.arange(self.MAXIMUM_TRACKS), self.heads - 1], np.inf)
+
+            if in_use is not None:
+                last_times[in_use] = np.inf
+
+            # Every slot is in use or was only just allocated, the track cannot be stored.
+            if np.isinf(last_times).all():
+                return -1
+
+            stale_slot = int(np.argmin(last_times))
+            self.deregister(int(self.track_IDs[stale_slot]))
+
+        slot = self.free_slots.pop()
+
+        self.slots[track_ID] = slot
+        self.track_IDs[slot] = track_ID
+        self.heads[slot] = self.counts[slot] = 0
+        self.first_seen[slot] = timestamp
+
+        return slot
+
+
+    def record(self, track_IDs : List[int], centers : List[List[float]], timestamp : float) -> None:
+
+        '''
+        Append the center points of the tracks seen in a frame. Tracks recorded less than SAMPLE_INTERVAL seconds ago are skipped.
+
+        :param: track_IDs - IDs of the tracks seen, new IDs are given a slot.
+        :param: centers - Center point of each track. [(x, y)]
+        :param: timestamp - Time the tracks were seen.
+        '''
+
+        if not track_IDs:
+            return
+
+        # Resolve the slots of known tracks first, so giving new tracks a slot never evicts a track seen in this frame.
+        slots = np.fromiter((self.slots.get(track_ID, -1) for track_ID in track_IDs), dtype=np.intp, count=len(track_IDs))
+
+        for index in np.flatnonzero(slots < 0):
+            slots[index] = self.allocate(track_IDs[index], timestamp, slots[slots >= 0])
+
+        centers = np.asarray(centers, dtype=np.float32).reshape(-1, 2)
+
+        # Only record tracks that have a slot and are empty or whose last point is old enough.
+        heads = self.heads[slots]
+        due = (slots >= 0) & ((self.counts[slots] == 0) | (timestamp - self.times[slots, heads - 1] >= self.SAMPLE_INTERVAL))
+
+        slots, heads, centers = slots[due], heads[due], centers[due]
+
+        self.points[slots, heads] = centers
+        self.times[slots, heads] = timestamp
+
+        self.heads[slots] = (heads + 1) % self.HISTORY_LENGTH
+        self.counts[slots] = np.minimum(self.counts[slots] + 1, self.HISTORY_LENGTH)
+
+
+    def deregister(self, track_ID : int) -> None:
+
+        '''
+        Forget a tracks history, freeing its slot.
+
+        :param: track_ID - ID of the track.
+        '''
+
+        slot = self.slots.pop(track_ID, None)
+
+        if slot is not None:
+            self.track_IDs[slot] = -1
+            self.counts[slot] = 0
+            self.free_slots.append(slot)
+
+
+    def trail(self, track_ID : int, length : Optional[int] = None) -> np.ndarray:
+
+        '''
+        Path of a track, oldest point first.
+
+        :param: track_ID - ID of the track.
+        :param: length - Most recent points to return, defaults to the whole history.
+        :return: np.ndarray - Center points. [(x, y)]
+        '''
+
+        slot = self.slots.get(track_ID)
+
+        if slot is None:
+            return np.empty((0, 2), dtype=np.float32)
+
+        count = self.counts[slot] if length is None else min(length, self.counts[slot])
+
+        # Walk back from the head, wrapping around the ring.
+        indices = (self.heads[slot] - count + np.arange(count)) % self.HISTORY_LENGTH
+
+        return self.points[slot, indices]
+
+
+    def loitering(self, timestamp : float, window : float, radius : float) -> List[int]:
+
+        '''
+        Tracks that have stayed within a radius of the same spot for a whole window, computed over every track at once.
+
+        :param: timestamp - Current time.
+        :param: window - Seconds the track must have lingered.
+        :param: radius - Furthest in pixels the track may have strayed from the center of its points within the window.
+        :return: track_IDs - IDs of the loitering tracks.
+        '''
+
+        # Points recorded within the window, and tracks old enough to have lingered for all of it.
+        sample_indices = np.arange(self.HISTORY_LENGTH)
+        in_window = (sample_indices < self.counts[:, None]) & (self.times >= timestamp - window)
+        candidates = (self.track_IDs >= 0) & (self.first_seen <= timestamp - window) & in_window.any(axis=1)
+
+        # Center of each tracks points within the window.
+        sample_counts = np.maximum(in_window.sum(axis=1), 1)
+        centers = (self.points * in_window[..., None]).sum(axis=1) / sample_counts[:, None]
+
+        # Furthest each track strayed from its center.
+        distances = np.linalg.norm(self.points - centers[:, None], axis=2)
+        furthest = np.where(in_window, distances, 0).max(axis=1)
+
+        return [int(track_ID) for track_ID in self.track_IDs[candidates & (furthest <= radius)]]
@@ -0,0 +1,312 @@
+from typing import Any, Dict, List, Optional, Tuple
+import json, os, numpy as np
+
+
+class ZoneMonitor(object):
+
+    '''
+    Watches tripwires and zones drawn over the scene. Every frame the movement of each track since the previous frame is tested against
+    every tripwire with a vectorised segment intersection, and every track is tested against each zone with a vectorised point in polygon
+    test, raising crossed, entered and exited events. Tripwires and zones are persisted to a JSON file and can be replaced at runtime.
+    '''
+
+    # Zone events, reported as '<event>:<name>' so the tripwire or zone is recorded with the event.
+    EVENT_TYPES = ('crossed', 'entered', 'exited')
+
+    def __init__(self, ZONES_PATH : Optional[str] = None) -> None:
+
+        # File the tripwires and zones are persisted to, None to keep them in memory only.
+        self.ZONES_PATH = ZONES_PATH
+
+        # Current layout, replaced as a whole so a frame never sees half a configuration. See build_layout.
+        self.layout : Dict[str, Any] = self.build_layout({'tripwires' : [], 'zones' : []})
+
+        # Last center point of every track, the start of its next movement.
+        self.last_points : Dict[int, Tuple[float, float]] = {}
+
+        # Last center point of every track that was not on a tripwire, the start of its next movement across the tripwires. A track stopping
+        # on a tripwire has not crossed it until it carries on to the other side.
+        self.line_points : Dict[int, Tuple[float, float]] = {}
+
+        self.load()
+
+
+    @staticmethod
+    def build_layout(configuration : Dict[str, Any]) -> Dict[str, Any]:
+
+        '''
+        Validate a configuration and convert it to the arrays the tests run on.
+
+        :param: configuration - {'tripwires' : [{name, start, end, direction}], 'zones' : [{name, polygon}]} in frame pixels.
+            direction is 0 to report crossings both ways, 1 for crossings onto the right of the line looking from start to end, -1 onto its left.
+        :return: layout - Configuration with the tripwires as arrays and each zone polygon as an array.
+        '''
+
+        tripwires = []
+        zones = []
+
+        for tripwire in configuration.get('tripwires', []):
+
+            start, end = np.asarray(tripwire['start'], dtype=np.float64), np.asarray(tripwire['end'], dtype=np.float64)
+
+            if start.shape != (2,) or end.shape != (2,) or np.array_equal(start, end):
+                raise ValueError(f'Tripwire {tripwire.get("name")} needs two different [x, y] points!')
+
+            if int(tripwire.get('direction', 0)) not in (-1, 0, 1):
+                raise ValueError(f'Tripwire {tripwire.get("name")} direction must be -1, 0 or 1!')
+
+            tripwires.append({'name' : str(tripwire['name']), 'start' : start.tolist(), 'end' : end.tolist(), 'direction' : int(tripwire.get('direction', 0))})
+
+        for zone in configuration.get('zones', []):
+
+            polygon = np.asarray(zone['polygon'], dtype=np.float64)
+
+            if polygon.ndim != 2 or polygon.shape[1] != 2 or len(polygon) < 3:
+                raise ValueError(f'Zone {zone.get("name")} needs at least three [x, y] points!')
+
+            zones.append({'name' : str(zone['name']), 'polygon' : polygon.tolist()})
+
+        return {
+            'tripwires' : tripwires,
+            'zones' : zones,
+            # Tripwire end points and directions. (L, 2), (L, 2), (L,)
+            'line_starts' : np.array([tripwire['start'] for tripwire in tripwires], dtype=np.float64).reshape(-1, 2),
+            'line_ends' : np.array([tripwire['end'] for tripwire in tripwires], dtype=np.float64).reshape(-1, 2),
+            'line_directions' : np.array([tripwire['direction'] for tripwire in tripwires], dtype=np.int8),
+            # Zone polygons. [(V, 2)]
+            'polygons' : [np.array(zone['polygon'], dtype=np.float64) for zone in zones],
+        }
+
+
+    def configure(self, configuration : Dict[str, Any]) -> None:
+
+        '''
+        Replace the tripwires and zones, persisting them. Nothing changes if the configuration is invalid.
+
+        :param: configuration - Tripwires and zones, see build_layout.
+        '''
+
+        layout = self.build_layout(configuration)
+
+        self.persist(self.describe(layout))
+
+        # Swap the new layout in, the frame being processed finishes with the old one.
+        self.layout = layout
+
+
+    def describe(self, layout : Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+
+        '''
+        Current configuration, as accepted by configure.
+
+        :param: layout - Layout to describe, defaults to the current one.
+        :return: dict - {'tripwires' : [...], 'zones' : [...]}
+        '''
+
+        layout = self.layout if layout is None else layout
+
+        return {'tripwires' : layout['tripwires'], 'zones' : layout['zones']}
+
+
+    def load(self) -> None:
+
+        '''
+        Read the persisted tripwires and zones, keeping none if the file is missing or invalid.
+        '''
+
+        if self.ZONES_PATH is None or not os.path.exists(self.ZONES_PATH):
+            return
+
+        try:
+            with open(self.ZONES_PATH) as zones_file:
+                self.layout = self.build_layout(json.load(zones_file))
+        except (OSError, ValueError, KeyError, TypeError) as error:
+            print(f'Could not read {self.ZONES_PATH}, no tripwires or zones loaded!\n {error}')
+
+
+    def persist(self, configuration : Dict[str, Any]) -> None:
+
+        '''
+        Write the configuration to the zones file atomically.
+
+        :param: configuration - Tripwires and zones to write.
+        '''
+
+        if self.ZONES_PATH is None:
+            return
+
+        temporary_path = f'{self.ZONES_PATH}.tmp'
+
+        with open(temporary_path, 'w') as zones_file:
+            json.dump(configuration, zones_file, indent=4)
+            zones_file.flush()
+            os.fsync(zones_file.fileno())
+
+        os.replace(temporary_path, self.ZONES_PATH)
+
+
+    @staticmethod
+    def crossings(starts : np.ndarray, ends : np.ndarray, line_starts : np.ndarray, line_ends : np.ndarray) -> np.ndarray:
+
+        '''
+        Test every movement against every tripwire at once.
+
+        :param: starts - Start point of each movement. (N, 2)
+        :param: ends - End point of each movement. (N, 2)
+        :param: line_starts - Start point of each tripwire. (L, 2)
+        :param: line_ends - End point of each tripwire. (L, 2)
+        :return: np.ndarray - (N, L) 1 where a movement crossed onto the right of a tripwire, -1 onto its left, 0 where it did not cross.
+        '''
+
+        # Broadcast movements down the rows and tripwires across the columns.
+        P, Q = starts[:, None, :], ends[:, None, :]
+        A, B = line_starts[None, :, :], line_ends[None, :, :]
+
+        # Side of the tripwire each end of the movement lies on, y grows down the frame so a positive cross product is the right.
+        # Points on the line are on neither side, so movements onto or off the line cross nothing.
+        start_sides = np.sign(ZoneMonitor.cross(A, B - A, P))
+        end_sides = np.sign(ZoneMonitor.cross(A, B - A, Q))
+
+        # Whether the tripwires end points lie on opposite sides of the movement, limiting crossings to the tripwires length.
+        straddles = ZoneMonitor.cross(P, Q - P, A) * ZoneMonitor.cross(P, Q - P, B) <= 0
+
+        crossed = (start_sides * end_sides < 0) & straddles
+
+        return np.where(crossed, end_sides, 0).astype(np.int8)
+
+
+    @staticmethod
+    def on_tripwires(points : np.ndarray, line_starts : np.ndarray, line_ends : np.ndarray) -> np.ndarray:
+
+        '''
+        Test every point against every tripwire at once for lying on the tripwire itself.
+
+        :param: points - Points to test. (N, 2)
+        :param: line_starts - Start point of each tripwire. (L, 2)
+        :param: line_ends - End point of each tripwire. (L, 2)
+        :return: np.ndarray - (N,) True for points on any tripwire.
+        '''
+
+        P = points[:, None, :]
+        A, B = line_starts[None, :, :], line_ends[None, :, :]
+
+        # On the line through the tripwire, and projecting onto it between its end points.
+        projections = ((P - A) * (B - A)).sum(axis=2)
+        on_line = (ZoneMonitor.cross(A, B - A, P) == 0) & (projections >= 0) & (projections <= ((B - A) ** 2).sum(axis=2))
+
+        return on_line.any(axis=1)
+
+
+    @staticmethod
+    def cross(origins : np.ndarray, vectors : np.ndarray, points : np.ndarray) -> np.ndarray:
+
+        '''
+        z component of the cross product between each vector and each point relative to its origin, broadcast over the inputs.
+
+        :param: origins - Origin of each vector. (..., 2)
+        :param: vectors - Vectors. (..., 2)
+        :param: points - Points. (..., 2)
+        :return: np.ndarray - Cross products, positive for points to the right of the vector as y grows down the frame.
+        '''
+
+        return vectors[..., 0] * (points[..., 1] - origins[..., 1]) - vectors[..., 1] * (points[..., 0] - origins[..., 0])
+
+
+    @staticmethod
+    def contains(polygon : np.ndarray, points : np.ndarray) -> np.ndarray:
+
+        '''
+        Test every point against a polygon at once, by counting the polygon edges a ray cast to the right of each point crosses.
+
+        :param: polygon - Polygon vertices. (V, 2)
+        :param: points - Points to test. (N, 2)
+        :return: np.ndarray - (N,) True for points inside the polygon.
+        '''
+
+        # Each edge runs from a vertex to the next, broadcast across the points.
+        x1, y1 = polygon[:, 0], polygon[:, 1]
+        x2, y2 = np.roll(x1, -1), np.roll(y1, -1)
+        px, py = points[:, 0:1], points[:, 1:2]
+
+        # Edges spanning the points height, horizontal edges never do so their division is never used.
+        spans = (y1 > py) != (y2 > py)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            intersection_x = x1 + (py - y1) * (x2 - x1) / (y2 - y1)
+
+        return ((spans & (px < intersection_x)).sum(axis=1) % 2) == 1
+
+
+    def update(self, track_IDs : List[int], centers : List[Tuple[float, float]]) -> Tuple[List[Tuple[str, int]], np.ndarray]:
+
+        '''
+        Test the tracks seen in a frame against every tripwire and zone.
+
+        :param: track_IDs - IDs of the tracks seen.
+        :param: centers - Center point of each track. [(x, y)]
+        :return: events - Zone events raised. [('<event>:<name>', track_ID)]
+        :return: in_zone - (N,) True for tracks inside any zone.
+        '''
+
+        layout = self.layout
+
+        events : List[Tuple[str, int]] = []
+
+        if not track_IDs:
+            return events, np.zeros(0, dtype=bool)
+
+        ends = np.asarray(centers, dtype=np.float64).reshape(-1, 2)
+
+        # Tracks seen for the first time have not moved, and start outside every zone.
+        is_new = np.fromiter((track_ID not in self.last_points for track_ID in track_IDs), dtype=bool, count=len(track_IDs))
+        starts = np.array([self.last_points.get(track_ID, center) for track_ID, center in zip(track_IDs, ends.tolist())], dtype=np.float64)
+
+        if len(layout['tripwires']):
+
+            # Movements across the tripwires start from the last point each track had off them.
+            line_points = np.array([self.line_points.get(track_ID, center) for track_ID, center in zip(track_IDs, ends.tolist())], dtype=np.float64)
+
+            crossings = self.crossings(line_points, ends, layout['line_starts'], layout['line_ends'])
+
+            # Only report crossings in the direction each tripwire watches.
+            directions = layout['line_directions'][None, :]
+            crossings[(directions != 0) & (crossings != directions)] = 0
+
+            for track_index, line_index in zip(*np.nonzero(crossings)):
+                events.append((f'crossed:{layout["tripwires"][line_index]["name"]}', track_IDs[track_index]))
+
+            # Tracks stopped on a tripwire keep the point they had before it.
+            off_tripwires = ~self.on_tripwires(ends, layout['line_starts'], layout['line_ends'])
+
+            self.line_points.update((track_IDs[track_index], tuple(ends[track_index].tolist())) for track_index in np.flatnonzero(off_tripwires))
+
+        in_zone = np.zeros(len(track_IDs), dtype=bool)
+
+        for zone, polygon in zip(layout['zones'], layout['polygons']):
+
+            inside = self.contains(polygon, ends)
+            was_inside = self.contains(polygon, starts) & ~is_new
+
+            for track_index in np.flatnonzero(inside & ~was_inside):
+                events.append((f'entered:{zone["name"]}', track_IDs[track_index]))
+
+            for track_index in np.flatnonzero(was_inside & ~inside):
+                events.append((f'exited:{zone["name"]}', track_IDs[track_index]))
+
+            in_zone |= inside
+
+        self.last_points.update(zip(track_IDs, map(tuple, ends.tolist())))
+
+        return events, in_zone
+
+
+    def forget(self, track_ID : int) -> None:
+
+        '''
+        Drop the last points of a deregistered track.
+
+        :param: track_ID - ID of the track.
+        '''
+
+        self.last_points.pop(track_ID, None)
+        self.line_points.pop(track_ID, None)
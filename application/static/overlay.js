@@ -0,0 +1,62 @@
+// Draws detection overlays onto a canvas layered above the raw video stream, using the metadata published by /detections.
+
+// Threat level colours, matching the server side overlay.
+const THREAT_COLOURS = {
+    1 : 'rgb(0, 255, 0)',
+    2 : 'rgb(255, 165, 0)',
+    3 : 'rgb(255, 0, 0)',
+};
+
+// Threat level labels, matching the server side overlay.
+const THREAT_TEXT = {
+    1 : 'Low',
+    2 : 'Medium',
+    3 : 'High',
+};
+
+function drawClock(context) {
+
+    // Background for the text.
+    context.fillStyle = 'rgb(50, 50, 50)';
+    context.fillRect(0, 0, 225, 50);
+
+    // Current time in the same format as the server clock.
+    const time = new Date().toLocaleTimeString('en-GB', { hour : '2-digit', minute : '2-digit', second : '2-digit', hour12 : true });
+    context.fillStyle = 'rgb(5, 100, 5)';
+    context.font = '24px sans-serif';
+    context.fillText(time.toUpperCase().replace(' ', ''), 15, 30);
+}
+
+function drawDetections(canvas, metadata) {
+
+    // Match the canvas resolution to the stream so boxes line up with the frame.
+    canvas.width = metadata.width;
+    canvas.height = metadata.height;
+
+    const context = canvas.getContext('2d');
+    context.clearRect(0, 0, canvas.width, canvas.height);
+    context.lineWidth = 2;
+    context.font = '20px monospace';
+
+    for (const detection of metadata.detections) {
+
+        const colour = THREAT_COLOURS[detection.threat_level] || 'rgb(0, 0, 0)';
+        const [x, y, w, h] = detection.predicted_box;
+
+        context.strokeStyle = colour;
+        context.fillStyle = colour;
+        context.strokeRect(x, y, w, h);
+        context.fillText(`#${detection.id} Threat Level: ${THREAT_TEXT[detection.threat_level] || 'N/A'}`, x, Math.max(y - 8, 20));
+    }
+
+    drawClock(context);
+}
+
+function attachOverlay(canvasId, sourceUrl) {
+
+    const canvas = document.getElementById(canvasId);
+    const events = new EventSource(sourceUrl);
+
+    // Redraw the overlay every time a frames metadata arrives.
+    events.onmessage = (event) => drawDetections(canvas, JSON.parse(event.data));
+}
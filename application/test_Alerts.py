@@ -0,0 +1,141 @@
+from typing import Any, Dict, List
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from Alerts import AlertDispatcher, WebhookSink
+
+import json, threading, time, unittest
+
+
+class WebhookReceiver(object):
+
+    '''
+    HTTP endpoint on an ephemeral port recording the batches posted to it, answering the first FAILURES posts with a 503.
+    '''
+
+    def __init__(self, FAILURES : int = 0) -> None:
+
+        # Posts still to be refused.
+        self.FAILURES = FAILURES
+
+        # Batches accepted, in the order they arrived.
+        self.batches : List[List[Dict[str, Any]]] = []
+
+        # Status returned for every post.
+        self.statuses : List[int] = []
+
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_POST(self) -> None:
+
+                alerts = json.loads(self.rfile.read(int(self.headers['Content-Length'])))['alerts']
+
+                if receiver.FAILURES > 0:
+                    receiver.FAILURES -= 1
+                    status = 503
+                else:
+                    receiver.batches.append(alerts)
+                    status = 204
+
+                receiver.statuses.append(status)
+
+                self.send_response(status)
+                self.end_headers()
+
+            def log_message(self, *arguments) -> None:
+                # Keep the test output quiet.
+                pass
+
+        # Port 0 lets the system pick a free port.
+        self.server = HTTPServer(('127.0.0.1', 0), Handler)
+
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+
+    @property
+    def URL(self) -> str:
+        return f'http://127.0.0.1:{self.server.server_port}/alerts'
+
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class TestWebhookDelivery(unittest.TestCase):
+
+    '''
+    Delivers alerts through the dispatcher to a local webhook, checking coalescing, batching and retries on server errors.
+    '''
+
+    def setUp(self) -> None:
+
+        self.receiver = WebhookReceiver(FAILURES = 2)
+
+        self.dispatcher = AlertDispatcher(
+            [WebhookSink(self.receiver.URL, TIMEOUT = 2)],
+            COALESCE_SECONDS = 1,
+            BATCH_SIZE = 20,
+            BATCH_INTERVAL = 0.2,
+            RETRY_BACKOFF = 0.1,
+        )
+
+
+    def tearDown(self) -> None:
+        self.receiver.close()
+
+
+    def wait_for_sent(self, count : int, timeout : float = 10) -> None:
+
+        '''
+        Wait until the dispatcher has delivered count alerts.
+
+        :param: count - Alerts expected to be sent.
+        :param: timeout - Seconds to wait before failing.
+        '''
+
+        deadline = time.monotonic() + timeout
+
+        while self.dispatcher.stats()['sent'] < count:
+            if time.monotonic() > deadline:
+                self.fail(f'Only {self.dispatcher.stats()["sent"]} of {count} alerts delivered! {self.dispatcher.stats()}')
+            time.sleep(0.05)
+
+
+    def test_delivery(self) -> None:
+
+        # Repeated alerts for one track and one tripwire, and a distinct capture for each of 25 tracks.
+        for index in range(50):
+            self.dispatcher.submit('escalated', 7, 3, (1, 2, 3, 4))
+            self.dispatcher.submit('crossed:fence', index, 2, (1, 2, 3, 4))
+
+        for track_ID in range(25):
+            self.dispatcher.submit('capture', track_ID, 3, (1, 2, 3, 4), f'{track_ID}.jpg')
+
+        # 27 alerts go out straight away, then one summary for each coalesced key when its window closes.
+        self.wait_for_sent(29)
+
+        stats = self.dispatcher.stats()
+        alerts = [alert for batch in self.receiver.batches for alert in batch]
+
+        # Coalescing, the first alert of each key is sent and the other 49 summarised by the latest of them.
+        self.assertEqual(stats['coalesced'], 98)
+        self.assertEqual([(alert['track_id'], alert['coalesced']) for alert in alerts if alert['type'] == 'escalated'], [(7, 0), (7, 49)])
+        self.assertEqual([(alert['track_id'], alert['coalesced']) for alert in alerts if alert['type'] == 'crossed:fence'], [(0, 0), (49, 49)])
+        self.assertEqual(sorted(alert['track_id'] for alert in alerts if alert['type'] == 'capture'), list(range(25)))
+
+        # Batching, alerts are sent together and no batch exceeds the batch size.
+        self.assertEqual(max(len(batch) for batch in self.receiver.batches), 20)
+        self.assertLess(len(self.receiver.batches), len(alerts))
+
+        # Retries, both refused posts were sent again and nothing was lost.
+        self.assertEqual(self.receiver.statuses[:2], [503, 503])
+        self.assertEqual(stats['retried'], 2)
+        self.assertEqual(stats['failed'], 0)
+        self.assertEqual(stats['pending_retries'], 0)
+        self.assertEqual(len(alerts), 29)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,210 @@
+from ObjectDetection import ObjectDetection
+from MotionHeatmap import MotionHeatmap
+
+import unittest, cv2, numpy as np
+
+
+class TestExtractionEngines(unittest.TestCase):
+
+    '''
+    Runs the contour and connected components engines over synthetic masks, checking both register exactly the same boxes.
+    '''
+
+    def setUp(self) -> None:
+        self.object_detection = ObjectDetection()
+
+
+    def extract(self, mask : np.ndarray, minimum_area : int) -> list:
+
+        '''
+        Extract blobs with both engines, asserting they agree.
+
+        :param: mask - Binary foreground mask.
+        :param: minimum_area - Pixels a blob must exceed to be registered.
+        :return: detections - Sorted bounding boxes. [(x, y, w, h)]
+        '''
+
+        contours = sorted(map(tuple, self.object_detection.extract_contours(mask, minimum_area)))
+        components = sorted(map(tuple, self.object_detection.extract_components(mask, minimum_area)))
+
+        self.assertEqual(contours, components)
+
+        return contours
+
+
+    def test_solid_blobs(self) -> None:
+
+        mask = np.zeros((120, 160), dtype=np.uint8)
+        mask[10:50, 20:60] = 255
+        cv2.circle(mask, (110, 80), 20, 255, -1)
+
+        self.assertEqual(self.extract(mask, 100), [(20, 10, 40, 40), (90, 60, 41, 41)])
+
+
+    def test_blobs_with_holes(self) -> None:
+
+        # Ring whose hole would pass the threshold on its own, with a small blob inside the hole.
+        mask = np.zeros((120, 160), dtype=np.uint8)
+        mask[10:90, 10:90] = 255
+        mask[20:80, 20:80] = 0
+        mask[45:55, 45:55] = 255
+
+        # The hole counts towards the rings area, so a thin ring passes a threshold its own pixels do not.
+        ring = np.zeros((60, 60), dtype=np.uint8)
+        cv2.rectangle(ring, (5, 5), (54, 54), 255, 1)
+
+        self.assertEqual(self.extract(mask, 1000), [(10, 10, 80, 80)])
+        self.assertEqual(self.extract(ring, 1000), [(5, 5, 50, 50)])
+
+
+    def test_blobs_at_the_threshold(self) -> None:
+
+        # 10 x 10 blob of exactly 100 pixels, and the same blob with one more pixel.
+        mask = np.zeros((40, 60), dtype=np.uint8)
+        mask[5:15, 5:15] = 255
+        mask[5:15, 30:40] = 255
+        mask[15, 30] = 255
+
+        self.assertEqual(self.extract(mask, 100), [(30, 5, 10, 11)])
+        self.assertEqual(self.extract(mask, 99), [(5, 5, 10, 10), (30, 5, 10, 11)])
+
+
+    def test_diagonal_neighbours(self) -> None:
+
+        # Squares touching only at a corner, and a diagonal line of single pixels, are each one 8-connected blob.
+        mask = np.zeros((60, 60), dtype=np.uint8)
+        mask[5:15, 5:15] = 255
+        mask[15:25, 15:25] = 255
+        mask[np.arange(30, 55), np.arange(30, 55)] = 255
+
+        self.assertEqual(self.extract(mask, 20), [(5, 5, 20, 20), (30, 30, 25, 25)])
+
+
+    def test_random_masks(self) -> None:
+
+        random = np.random.default_rng(0)
+
+        for _ in range(50):
+            mask = (random.random((48, 64)) < 0.45).astype(np.uint8) * 255
+            self.extract(mask, int(random.integers(0, 30)))
+
+
+
+class TestMergeDetections(unittest.TestCase):
+
+    '''
+    Merges fragmented boxes, checking transitive grouping, the merge distance boundary and boxes grown into new neighbours.
+    '''
+
+    def setUp(self) -> None:
+        self.object_detection = ObjectDetection()
+
+
+    def merge(self, detections : list, merge_distance : int) -> list:
+        return sorted(map(tuple, self.object_detection.merge_detections(detections, merge_distance)))
+
+
+    def test_nothing_to_merge(self) -> None:
+
+        self.assertEqual(self.object_detection.merge_detections([], 10), [])
+        self.assertEqual(self.object_detection.merge_detections([[1, 2, 3, 4]], 10), [[1, 2, 3, 4]])
+
+
+    def test_transitive_chain(self) -> None:
+
+        # Each box is within the distance of the next, the ends are not within it of each other.
+        chain = [[28, 0, 10, 10], [0, 0, 10, 10], [14, 0, 10, 10]]
+
+        self.assertEqual(self.merge(chain, 4), [(0, 0, 38, 10)])
+        self.assertEqual(self.merge(chain, 3), [(0, 0, 10, 10), (14, 0, 10, 10), (28, 0, 10, 10)])
+
+
+    def test_merge_distance_boundary(self) -> None:
+
+        # Gaps of exactly the merge distance are merged on either axis, one pixel more is not.
+        self.assertEqual(self.merge([[0, 0, 10, 10], [15, 0, 10, 10]], 5), [(0, 0, 25, 10)])
+        self.assertEqual(self.merge([[0, 0, 10, 10], [16, 0, 10, 10]], 5), [(0, 0, 10, 10), (16, 0, 10, 10)])
+        self.assertEqual(self.merge([[0, 0, 10, 10], [0, 15, 10, 10]], 5), [(0, 0, 10, 25)])
+        self.assertEqual(self.merge([[0, 0, 10, 10], [0, 16, 10, 10]], 5), [(0, 0, 10, 10), (0, 16, 10, 10)])
+
+        # Touching boxes merge with no distance, boxes near on one axis but apart on the other do not.
+        self.assertEqual(self.merge([[0, 0, 10, 10], [10, 0, 5, 5]], 0), [(0, 0, 15, 10)])
+        self.assertEqual(self.merge([[0, 0, 10, 10], [12, 40, 10, 10]], 5), [(0, 0, 10, 10), (12, 40, 10, 10)])
+
+
+    def test_nested_boxes(self) -> None:
+
+        self.assertEqual(self.merge([[10, 10, 5, 5], [0, 0, 100, 100], [40, 40, 20, 20]], 0), [(0, 0, 100, 100)])
+
+
+    def test_merged_box_reaches_new_neighbour(self) -> None:
+
+        # The union of the first two boxes comes within the distance of the third, which neither box was on its own.
+        self.assertEqual(self.merge([[0, 0, 10, 10], [13, 0, 10, 30], [0, 33, 5, 5]], 3), [(0, 0, 23, 38)])
+
+
+class TestStaticTiles(unittest.TestCase):
+
+    '''
+    Clears the foreground in tiles without recent motion, checking tiles in motion, recently warm tiles and tracked tiles are kept.
+    '''
+
+    def setUp(self) -> None:
+
+        self.object_detection = ObjectDetection()
+
+        # 2x2 grid of 40x40 tiles over a mask with a blob in every tile.
+        self.object_detection.motion_heatmap = MotionHeatmap(GRID_SIZE = (2, 2), DECAY = 0.5, STATIC_HEAT = 0.01)
+
+        self.mask = np.zeros((80, 80), dtype=np.uint8)
+        for y, x in ((10, 10), (10, 50), (50, 10), (50, 50)):
+            self.mask[y:y + 20, x:x + 20] = 255
+
+
+    def extract(self) -> list:
+        return sorted(map(tuple, self.object_detection.extract_contours(self.object_detection.mask_static_tiles(self.mask), 100)))
+
+
+    def test_unknown_frame_size(self) -> None:
+
+        # Heatmap has not been updated, every tile is searched.
+        self.assertEqual(len(self.extract()), 4)
+
+
+    def test_only_active_tiles_are_searched(self) -> None:
+
+        heatmap = self.object_detection.motion_heatmap
+
+        # Motion in the top left tile, then the top right.
+        difference = np.zeros((80, 80), dtype=np.uint8)
+        difference[15:25, 15:25] = 255
+        heatmap.update(difference)
+
+        difference[:] = 0
+        difference[15:25, 55:65] = 255
+        heatmap.update(difference)
+
+        # Top right moves now, top left is still warm from the previous frame.
+        self.assertEqual(self.extract(), [(10, 10, 20, 20), (50, 10, 20, 20)])
+
+        # Once the top left cools below the static heat only the top right is left.
+        for _ in range(4):
+            heatmap.update(difference)
+
+        self.assertEqual(self.extract(), [(50, 10, 20, 20)])
+
+        # Tracks keep every tile they cover, even the bottom ones that never moved.
+        self.object_detection.learning_schedule.frozen_boxes = [[45, 45, 10, 10]]
+        self.assertEqual(self.extract(), [(50, 10, 20, 20), (50, 50, 20, 20)])
+
+        # Without motion or tracks nothing is searched.
+        self.object_detection.learning_schedule.frozen_boxes = []
+        difference[:] = 0
+        for _ in range(10):
+            heatmap.update(difference)
+
+        self.assertEqual(self.extract(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
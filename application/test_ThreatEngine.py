@@ -0,0 +1,102 @@
+from ThreatEngine import ThreatEngine, ThreatPolicy
+
+import unittest
+
+
+class TestThreatEngine(unittest.TestCase):
+
+    '''
+    Applies threat policies to tracks over time, checking escalation by dwell time, speed and zones, decay and slot recycling.
+    '''
+
+    def test_escalation_by_dwell(self) -> None:
+
+        engine = ThreatEngine(ThreatPolicy(DWELL_TIME = 10, DECAY_TIME = 5))
+        self.assertEqual(engine.register(7, 0), 1)
+
+        engine.observe([7], 9, [0])
+        self.assertEqual(engine.update(9), [])
+
+        engine.observe([7], 10, [0])
+        self.assertEqual(engine.update(10), [(7, 1, 2)])
+
+        # Levels are capped at the maximum however long the track stays.
+        engine.observe([7], 60, [0])
+        self.assertEqual(engine.update(60), [(7, 2, 3)])
+        self.assertEqual(engine.level(7), 3)
+
+
+    def test_escalates_straight_to_supported_level(self) -> None:
+
+        engine = ThreatEngine(ThreatPolicy(DWELL_TIME = 10))
+        engine.register(7, 0)
+
+        # Not updated while the dwell time passed two levels, the track jumps both at once.
+        engine.observe([7], 25, [0])
+        self.assertEqual(engine.update(25), [(7, 1, 3)])
+
+
+    def test_escalation_by_speed_and_zone(self) -> None:
+
+        engine = ThreatEngine(ThreatPolicy(DWELL_TIME = 0, SPEED_THRESHOLD = 100, DECAY_TIME = 5))
+        engine.register(1, 0)
+        engine.register(2, 0)
+        engine.register(3, 0)
+
+        engine.observe([1, 2, 3], 1, [150, 100, 150], [False, False, True])
+
+        # Speeds must exceed the threshold, a zone adds its own level on top.
+        self.assertEqual(sorted(engine.update(1)), [(1, 1, 2), (3, 1, 3)])
+        self.assertEqual(engine.level(2), 1)
+
+
+    def test_decay_over_time(self) -> None:
+
+        engine = ThreatEngine(ThreatPolicy(DWELL_TIME = 10, DECAY_TIME = 5, UNSEEN_TIME = 2))
+        engine.register(7, 0)
+
+        engine.observe([7], 20, [0])
+        self.assertEqual(engine.update(20), [(7, 1, 3)])
+
+        # The level is still supported until the track has been unseen for UNSEEN_TIME.
+        self.assertEqual(engine.update(22), [])
+
+        # Then the track earns nothing and falls one level per DECAY_TIME, timed from when the level was last supported.
+        self.assertEqual(engine.update(26.9), [])
+        self.assertEqual(engine.update(27), [(7, 3, 2)])
+        self.assertEqual(engine.update(31.9), [])
+        self.assertEqual(engine.update(32), [(7, 2, 1)])
+        self.assertEqual(engine.update(60), [])
+        self.assertEqual(engine.level(7), 1)
+
+
+    def test_slot_recycling(self) -> None:
+
+        engine = ThreatEngine(ThreatPolicy(DWELL_TIME = 10), CAPACITY = 2)
+        engine.register(1, 0)
+        engine.register(2, 0)
+
+        engine.observe([2], 30, [0])
+        engine.update(30)
+        self.assertEqual(engine.level(2), 3)
+
+        # A freed slot is handed to the next track, starting again from the minimum level.
+        freed_slot = engine.slots[2]
+        engine.deregister(2)
+        engine.register(3, 30)
+
+        self.assertEqual(engine.slots[3], freed_slot)
+        self.assertEqual(engine.level(3), 1)
+        self.assertNotIn(2, engine.slots)
+
+        # Running out of slots grows the arrays rather than refusing tracks.
+        engine.register(4, 30)
+        self.assertEqual(len(engine.track_IDs), 4)
+        self.assertEqual(len(set(engine.slots.values())), 3)
+
+        engine.observe([3, 4], 40, [0, 0])
+        self.assertEqual(sorted(engine.update(40)), [(3, 1, 2), (4, 1, 2)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+from Trajectories import TrajectoryStore
+
+import unittest
+
+
+class TestTrajectoryStore(unittest.TestCase):
+
+    '''
+    Records track paths, checking slot eviction, the ring buffer wrapping and loitering detection.
+    '''
+
+    def test_eviction_spares_tracks_in_the_same_frame(self) -> None:
+
+        store = TrajectoryStore(HISTORY_LENGTH = 4, MAXIMUM_TRACKS = 3, SAMPLE_INTERVAL = 0)
+
+        store.record([1, 2, 3], [[0, 0], [1, 1], [2, 2]], 0)
+        store.record([1], [[0, 1]], 1)
+
+        # Track 2 is the least recently updated, but it is seen in this frame so tracks 3 and then 1 are evicted instead.
+        store.record([2, 4, 5], [[5, 5], [6, 6], [7, 7]], 2)
+
+        self.assertEqual(sorted(store.slots), [2, 4, 5])
+        self.assertEqual(store.trail(2).tolist(), [[1, 1], [5, 5]])
+        self.assertEqual(store.trail(4).tolist(), [[6, 6]])
+        self.assertEqual(store.trail(5).tolist(), [[7, 7]])
+
+        # More new tracks than slots in one frame, the extra track is not stored rather than evicting one just given a slot.
+        store.record([7, 8, 9, 10], [[1, 1], [2, 2], [3, 3], [4, 4]], 3)
+
+        self.assertEqual(sorted(store.slots), [7, 8, 9])
+        self.assertEqual(store.trail(10).tolist(), [])
+        self.assertEqual(store.trail(9).tolist(), [[3, 3]])
+
+
+    def test_trail_wraps_around_the_ring(self) -> None:
+
+        store = TrajectoryStore(HISTORY_LENGTH = 4, MAXIMUM_TRACKS = 2, SAMPLE_INTERVAL = 1)
+
+        for step in range(6):
+            store.record([1], [[step, 10 * step]], step)
+
+        # Points closer together than the sample interval are skipped.
+        store.record([1], [[99, 99]], 5.5)
+
+        self.assertEqual(store.trail(1).tolist(), [[2, 20], [3, 30], [4, 40], [5, 50]])
+        self.assertEqual(store.trail(1, 2).tolist(), [[4, 40], [5, 50]])
+
+        # Deregistered tracks have no trail and free their slot.
+        store.deregister(1)
+        self.assertEqual(store.trail(1).tolist(), [])
+        self.assertEqual(len(store.free_slots), 2)
+
+
+    def test_loitering(self) -> None:
+
+        store = TrajectoryStore(HISTORY_LENGTH = 32, MAXIMUM_TRACKS = 8, SAMPLE_INTERVAL = 0)
+
+        for step in range(21):
+            # Track 1 lingers around one spot, track 2 walks away, track 3 lingers but only appeared recently.
+            store.record([1, 2], [[100 + step % 2, 100], [10 * step, 50]], step)
+
+            if step >= 15:
+                store.record([3], [[300, 300]], step)
+
+        self.assertEqual(store.loitering(20, window = 10, radius = 5), [1])
+
+        # Track 2 stayed within a radius wide enough to cover its walk over the window.
+        self.assertEqual(sorted(store.loitering(20, window = 10, radius = 60)), [1, 2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+from Zones import ZoneMonitor
+
+import unittest, numpy as np
+
+
+class TestZoneMonitor(unittest.TestCase):
+
+    '''
+    Moves tracks across tripwires and zones, checking crossings and their direction, points on the line and zone entry and exit.
+    '''
+
+    def monitor(self, direction : int = 0) -> ZoneMonitor:
+
+        '''
+        Monitor with a vertical tripwire running down the frame at x = 100, from y = 0 to 200, and a concave U shaped zone.
+
+        :param: direction - Direction the tripwire watches.
+        :return: ZoneMonitor - Monitor kept in memory only.
+        '''
+
+        monitor = ZoneMonitor()
+        monitor.configure({
+            'tripwires' : [{'name' : 'fence', 'start' : [100, 0], 'end' : [100, 200], 'direction' : direction}],
+            'zones' : [{'name' : 'yard', 'polygon' : [[300, 0], [330, 0], [330, 30], [320, 30], [320, 10], [310, 10], [310, 30], [300, 30]]}],
+        })
+
+        return monitor
+
+
+    def events(self, monitor : ZoneMonitor, path : list, track_ID : int = 1) -> list:
+
+        '''
+        Move a track along a path, collecting the events raised.
+
+        :param: monitor - Monitor to update.
+        :param: path - Center points the track is seen at, one per frame.
+        :param: track_ID - ID of the track.
+        :return: events - Events raised. [(event, track_ID)]
+        '''
+
+        events = []
+
+        for center in path:
+            events += monitor.update([track_ID], [center])[0]
+
+        return events
+
+
+    def test_crossings_in_both_directions(self) -> None:
+
+        # Looking from the start of the tripwire to its end, down the frame, its right is the left of the frame.
+        for direction, leftwards, rightwards in ((0, 1, 1), (1, 1, 0), (-1, 0, 1)):
+
+            monitor = self.monitor(direction)
+
+            self.assertEqual(len(self.events(monitor, [(150, 100), (50, 100)], 1)), leftwards)
+            self.assertEqual(len(self.events(monitor, [(50, 100), (150, 100)], 2)), rightwards)
+
+        self.assertEqual(ZoneMonitor.crossings(
+            np.array([[150, 100], [50, 100], [150, 100], [150, 300]], dtype=np.float64),
+            np.array([[50, 100], [150, 100], [160, 100], [50, 300]], dtype=np.float64),
+            np.array([[100, 0]], dtype=np.float64),
+            np.array([[100, 200]], dtype=np.float64),
+        ).ravel().tolist(), [1, -1, 0, 0])
+
+
+    def test_center_on_the_tripwire(self) -> None:
+
+        monitor = self.monitor()
+
+        # Stopping on the line and carrying on raises a single crossing, whichever side the track came from.
+        self.assertEqual(self.events(monitor, [(150, 50), (100, 50), (50, 50)], 1), [('crossed:fence', 1)])
+        self.assertEqual(self.events(monitor, [(50, 50), (100, 50), (150, 50)], 2), [('crossed:fence', 2)])
+
+        # Touching the line and turning back crosses nothing, from either side.
+        self.assertEqual(self.events(monitor, [(50, 150), (100, 150), (50, 150)], 3), [])
+        self.assertEqual(self.events(monitor, [(150, 150), (100, 150), (150, 150)], 4), [])
+
+        # Tracks first seen on the line have no side to cross from.
+        self.assertEqual(self.events(monitor, [(100, 120), (50, 120)], 5), [])
+
+        # Movements onto or off the line cross nothing on their own.
+        self.assertEqual(ZoneMonitor.crossings(
+            np.array([[150, 100], [100, 100]], dtype=np.float64),
+            np.array([[100, 100], [50, 100]], dtype=np.float64),
+            np.array([[100, 0]], dtype=np.float64),
+            np.array([[100, 200]], dtype=np.float64),
+        ).ravel().tolist(), [0, 0])
+
+        # Points on the lines extension beyond the tripwire are not on it.
+        self.assertEqual(ZoneMonitor.on_tripwires(
+            np.array([[100, 0], [100, 200], [100, 250], [101, 100]], dtype=np.float64),
+            np.array([[100, 0]], dtype=np.float64),
+            np.array([[100, 200]], dtype=np.float64),
+        ).tolist(), [True, True, False, False])
+
+
+    def test_zone_entry_and_exit(self) -> None:
+
+        monitor = self.monitor()
+
+        path = [(290, 5), (305, 5), (325, 5), (325, 40)]
+        self.assertEqual(self.events(monitor, path, 1), [('entered:yard', 1), ('exited:yard', 1)])
+
+        # Tracks first seen inside a zone count as having entered it.
+        self.assertEqual(self.events(monitor, [(305, 20)], 2), [('entered:yard', 2)])
+
+        # Forgotten tracks start over outside every zone.
+        monitor.forget(2)
+        self.assertEqual(self.events(monitor, [(305, 20)], 2), [('entered:yard', 2)])
+
+        _, in_zone = monitor.update([1, 2], [(325, 40), (305, 20)])
+        self.assertEqual(in_zone.tolist(), [False, True])
+
+
+    def test_concave_polygon(self) -> None:
+
+        monitor = self.monitor()
+        polygon = monitor.layout['polygons'][0]
+
+        # Arms and base of the U are inside, the notch between the arms and everything around it is not.
+        points = np.array([[305, 20], [325, 20], [315, 5], [315, 20], [315, 35], [295, 20], [335, 5]], dtype=np.float64)
+        self.assertEqual(ZoneMonitor.contains(polygon, points).tolist(), [True, True, True, False, False, False, False])
+
+        # Walking from one arm into the notch and over to the other arm leaves and enters the zone again.
+        path = [(305, 20), (315, 20), (325, 20)]
+        self.assertEqual(self.events(monitor, path), [('entered:yard', 1), ('exited:yard', 1), ('entered:yard', 1)])
+
+
+    def test_invalid_configuration(self) -> None:
+
+        monitor = self.monitor()
+
+        with self.assertRaises(ValueError):
+            monitor.configure({'tripwires' : [{'name' : 'point', 'start' : [1, 1], 'end' : [1, 1]}]})
+
+        with self.assertRaises(ValueError):
+            monitor.configure({'zones' : [{'name' : 'line', 'polygon' : [[0, 0], [1, 1]]}]})
+
+        # Nothing changes when the configuration is rejected.
+        self.assertEqual([tripwire['name'] for tripwire in monitor.describe()['tripwires']], ['fence'])
+
+
+if __name__ == '__main__':
+    unittest.main()